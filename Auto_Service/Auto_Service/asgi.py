@@ -3,6 +3,11 @@ ASGI config for Auto_Service project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The async ASGI profile, Auto_Service/settings_asgi.py (async JSON endpoints and
+the live event stream), is experimental: it benchmarked slower than the WSGI
+profile on SQLite (see ``manage.py bench_concurrency``), so it is opt-in with
+DJANGO_SETTINGS_MODULE=Auto_Service.settings_asgi.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'service.query_budget.QueryBudgetMiddleware',
+    'service.audit.EventLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -140,6 +142,94 @@ if os.path.isdir(project_static_dir):
 # Where collectstatic will gather files for production
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Per-request query count / DB time response headers (see service/query_budget.py)
+QUERY_BUDGET_HEADERS = DEBUG
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'service.query_budget': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Process-local cache; use a shared backend (Redis / Memcached) when running several workers so that
+# slot invalidations reach every process.
+# 'shared' holds the small version stamps every process must agree on (the cached RepairShop, the technician
+# assignment index): a file cache is seen by all web and run_worker processes on this host; point it at
+# Redis / Memcached as well when they run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'auto-service',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+}
+
+# Free appointment slots (see service/slots.py): start-time granularity and cache lifetime per facility-day
+APPOINTMENT_SLOT_MINUTES = 15
+SLOT_CACHE_SECONDS = 300
+
+# Serve the small JSON endpoints from service/async_views.py (on in the ASGI profile, settings_asgi.py)
+ASYNC_API_VIEWS = False
+
+# Rows per page of the keyset-paginated lists (see service/pagination.py); the JSON APIs accept ?limit= up to 100
+LIST_PAGE_SIZE = 20
+
+# Rows fetched per round trip by the streaming CSV / JSONL exports (see service/exports.py)
+EXPORT_CHUNK_SIZE = 2000
+
+# Background jobs (see service/jobs.py; run with `manage.py run_worker`)
+JOB_WORKER_PROCESSES = 2
+JOB_LEASE_SECONDS = 300
+JOB_RETRY_BASE_SECONDS = 30
+JOB_RETRY_MAX_SECONDS = 3600
+# Recurring jobs: name -> task, interval in seconds and optional payload
+JOB_SCHEDULES = {
+    'assign-technicians': {'task': 'assign_technicians', 'interval': 15 * 60},
+    'rebuild-analytics': {'task': 'rebuild_analytics', 'interval': 24 * 3600},
+    'cleanup-blobs': {'task': 'cleanup_blobs', 'interval': 24 * 3600},
+    'maintenance-due': {'task': 'compute_maintenance_due', 'interval': 24 * 3600},
+    'appointment-reminders': {'task': 'send_appointment_reminders', 'interval': 5 * 60},
+    'purge-jobs': {'task': 'purge_jobs', 'interval': 24 * 3600, 'payload': {'days': 7}},
+    'archive-events': {'task': 'archive_events', 'interval': 24 * 3600},
+}
+
+# Days ahead of a service's maintenance due date that the owner gets a MAINTENANCE_DUE reminder
+MAINTENANCE_REMINDER_DAYS = 14
+
+# Appointment reminders (see service/reminders.py): window name -> minutes before the appointment
+APPOINTMENT_REMINDER_WINDOWS = {'24h': 24 * 60, '2h': 2 * 60}
+
+# Audit log (see service/audit.py): 'sync' writes each request's / job's events in one INSERT after the
+# response is sent, 'background' hands them to a writer thread (fire-and-forget), 'off' drops them
+EVENT_LOG_MODE = 'sync'
+EVENT_LOG_BATCH_SIZE = 500
+EVENT_LOG_FLUSH_SECONDS = 5
+# Months of events kept in the EventLog table (the current one included); older months are moved to gzip JSONL
+# archives under EVENT_LOG_ARCHIVE_ROOT (see service/retention.py)
+EVENT_LOG_RETENTION_MONTHS = 6
+EVENT_LOG_ARCHIVE_ROOT = os.path.join(BASE_DIR, 'archive', 'eventlog')
+
+# Live event stream (see service/events.py): database check for other processes' events, keep-alive comment
+# interval, and how long one connection lasts before the browser reconnects
+SSE_POLL_SECONDS = 10
+SSE_HEARTBEAT_SECONDS = 15
+SSE_MAX_SECONDS = 300
+# Have every page open the stream; under WSGI each open stream holds a worker thread, so only the ASGI profile
+# (settings_asgi.py) turns this on and WSGI pages keep the unread count rendered with the page
+LIVE_EVENTS_STREAM = False
+
+# Widths of the resized variants served by {% responsive_image %} (see service/images.py)
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024, 1600)
+
 # Media (user-uploaded) files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -0,0 +1,21 @@
+"""
+Experimental ASGI deployment profile, opted into explicitly, e.g.
+
+    DJANGO_SETTINGS_MODULE=Auto_Service.settings_asgi uvicorn Auto_Service.asgi:application --workers 4
+
+Same as settings.py, except that the JSON endpoints polled by the frontend
+are served by the async views in service/async_views.py, that pages open the
+live event stream (service/events.py), and that the middleware stack is kept
+fully async-capable: QueryBudgetMiddleware is sync-only (it hooks the request
+thread's database connection), and a single sync middleware would make Django
+run every async view in a thread again.
+Measure queries under the WSGI profile (runserver / gunicorn) instead.
+Compare the two with ``manage.py bench_concurrency``.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import MIDDLEWARE
+
+ASYNC_API_VIEWS = True
+LIVE_EVENTS_STREAM = True
+
+MIDDLEWARE = [name for name in MIDDLEWARE if name != 'service.query_budget.QueryBudgetMiddleware']
@@ -1,9 +1,12 @@
 from django.contrib import admin
+from django.utils import timezone
+from .jobs import enqueue
 from .models import (
     BaseUser, Employee, Customer, Vehicle, 
     Facility, ServiceType, Appointment, Review,
     Schedule, RepairShop, Analytics, Notification,
-    EventLog, Message, FacilityClosure, TechnicianAvailability
+    EventLog, Message, FacilityClosure, TechnicianAvailability, TechnicianStats, ContentBlob,
+    Job, JobSchedule, ReminderLog, MaintenanceReminderLog, FacilityDayLoad, EventLogArchive
 )
 
 class BaseModelAdmin(admin.ModelAdmin):
@@ -128,9 +131,9 @@ class AnalyticsAdmin(BaseModelAdmin):
     actions = ['update_statistics']
 
     def update_statistics(self, request, queryset):
-        for analytics in queryset:
-            analytics.update_statistics()
-        self.message_user(request, "Statistics updated successfully.")
+        # A full rebuild scans every appointment; run it on a worker instead of inside the request
+        enqueue('rebuild_analytics', priority=10)
+        self.message_user(request, "Statistics rebuild queued; the figures update once a worker has run it.")
     update_statistics.short_description = "Update statistics for selected analytics"
 
 @admin.register(Notification)
@@ -146,6 +149,8 @@ class EventLogAdmin(BaseModelAdmin):
     list_filter = ('event_type',)
     search_fields = ('description', 'user__user__username')
     raw_id_fields = ('user', 'facility', 'appointment')
+    # the table holds every event of the retention window; skip the unfiltered COUNT(*) on filtered pages
+    show_full_result_count = False
 
 @admin.register(Message)
 class MessageAdmin(BaseModelAdmin):
@@ -168,3 +173,58 @@ class TechnicianAvailabilityAdmin(BaseModelAdmin):
     list_filter = ('is_available', 'date')
     search_fields = ('technician__base_user__user__username', 'reason')
     raw_id_fields = ('technician',)
+
+@admin.register(TechnicianStats)
+class TechnicianStatsAdmin(BaseModelAdmin):
+    list_display = ('technician', 'total_assigned', 'completed_count', 'on_time_count', 'rating_sum', 'rating_count')
+    search_fields = ('technician__base_user__user__username',)
+    raw_id_fields = ('technician',)
+
+@admin.register(ContentBlob)
+class ContentBlobAdmin(BaseModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('name', 'size', 'ref_count', 'created_at', 'updated_at')
+
+@admin.register(Job)
+class JobAdmin(BaseModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'task')
+    search_fields = ('task', 'locked_by', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'locked_by', 'locked_until', 'finished_at', 'last_error')
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status='FAILED').update(status='QUEUED', run_at=timezone.now(), attempts=0,
+                                                           finished_at=None)
+        self.message_user(request, f"{updated} failed job(s) queued again.")
+    retry_jobs.short_description = "Retry selected failed jobs"
+
+@admin.register(JobSchedule)
+class JobScheduleAdmin(BaseModelAdmin):
+    list_display = ('name', 'task', 'interval_seconds', 'next_run_at', 'is_active')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'task')
+
+@admin.register(ReminderLog)
+class ReminderLogAdmin(BaseModelAdmin):
+    list_display = ('appointment', 'window', 'notified', 'created_at')
+    list_filter = ('window', 'notified')
+    readonly_fields = ('appointment', 'window', 'batch', 'notified', 'created_at', 'updated_at')
+
+@admin.register(MaintenanceReminderLog)
+class MaintenanceReminderLogAdmin(BaseModelAdmin):
+    list_display = ('appointment', 'due_date', 'created_at')
+    readonly_fields = ('appointment', 'due_date', 'batch', 'created_at', 'updated_at')
+
+@admin.register(FacilityDayLoad)
+class FacilityDayLoadAdmin(BaseModelAdmin):
+    list_display = ('facility', 'date', 'booked', 'updated_at')
+    list_filter = ('facility',)
+    readonly_fields = ('facility', 'date', 'booked', 'created_at', 'updated_at')
+
+@admin.register(EventLogArchive)
+class EventLogArchiveAdmin(BaseModelAdmin):
+    list_display = ('month', 'part', 'rows', 'size', 'purged', 'name', 'created_at')
+    readonly_fields = ('month', 'part', 'name', 'rows', 'size', 'first_event_at', 'last_event_at', 'purged',
+                       'created_at', 'updated_at')
@@ -0,0 +1,434 @@
+"""
+Incremental maintenance of the repair shop Analytics row and TechnicianStats.
+
+Every Appointment/Review save or delete is turned into a delta of running
+totals (counts, revenue, rating sums, per-facility/technician/service figures)
+which is applied to the singleton Analytics row and the per-technician stats
+rows, so keeping them current costs O(changes). ``rebuild`` and
+``rebuild_technician_stats`` recompute everything in bulk and back the admin
+action and the ``rebuild_analytics`` / ``rebuild_technician_stats`` commands.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+
+from .models import (
+    Analytics, Appointment, Customer, Employee, Facility, Review, ServiceType, TechnicianStats, Vehicle,
+    finished_on_time,
+)
+
+APPOINTMENT_FIELDS = (
+    'id', 'status', 'final_cost', 'service_type_id', 'assigned_technician_id',
+    'scheduled_date', 'scheduled_time', 'actual_end_time',
+)
+REVIEW_FIELDS = ('appointment_id', 'rating')
+
+TWO_PLACES = Decimal('0.01')
+
+# Delta keys on the technician side and the TechnicianStats columns they feed
+TECHNICIAN_STATS_COLUMNS = {
+    'total_appointments': 'total_assigned',
+    'completed_appointments': 'completed_count',
+    'on_time_appointments': 'on_time_count',
+    'rating_sum': 'rating_sum',
+    'rating_count': 'rating_count',
+}
+
+
+class AnalyticsDelta:
+    """Signed changes to the running totals, accumulated before being written in one go"""
+
+    def __init__(self):
+        self.appointments = 0
+        self.completed = 0
+        self.revenue = Decimal('0')
+        self.rating_sum = 0
+        self.reviews = 0
+        self.services = defaultdict(lambda: defaultdict(int))
+        self.technicians = defaultdict(lambda: defaultdict(int))
+
+    def add_appointment(self, state, sign):
+        if state is None:
+            return
+        completed = state['status'] == 'COMPLETED'
+        revenue = Decimal(state['final_cost'] or 0) * sign if completed else Decimal('0')
+        self.appointments += sign
+        self.completed += sign if completed else 0
+        self.revenue += revenue
+
+        service = self.services[state['service_type_id']]
+        service['total_appointments'] += sign
+        service['completed_appointments'] += sign if completed else 0
+        service['total_revenue'] += revenue
+
+        if state['assigned_technician_id']:
+            tech = self.technicians[state['assigned_technician_id']]
+            tech['total_appointments'] += sign
+            tech['completed_appointments'] += sign if completed else 0
+
+    def add_rating(self, technician_id, rating, sign):
+        rating = int(rating)
+        self.rating_sum += rating * sign
+        self.reviews += sign
+        self.add_technician_rating(technician_id, rating, sign)
+
+    def add_technician_rating(self, technician_id, rating, sign):
+        if technician_id:
+            tech = self.technicians[technician_id]
+            tech['rating_sum'] += int(rating) * sign
+            tech['rating_count'] += sign
+
+    def is_empty(self):
+        return not (
+            self.appointments or self.completed or self.revenue or self.rating_sum or self.reviews
+            or any(any(v.values()) for v in self.services.values())
+            or any(any(v.values()) for v in self.technicians.values())
+        )
+
+
+def _changed(old, new, fields):
+    return old is None or new is None or any(old[f] != new[f] for f in fields)
+
+
+def record_appointment_changes(changes, service_types=None):
+    """Apply a list of ``(old_state, new_state)`` pairs; either side may be None (create/delete).
+
+    ``service_types``: ``{id: ServiceType}`` (``duration_minutes`` and ``facility_id`` loaded) covering every
+    state, when the caller already read them; spares the two service type lookups.
+    """
+    delta = AnalyticsDelta()
+    moved = {}
+    finished = []
+    for old, new in changes:
+        if not _changed(old, new, APPOINTMENT_FIELDS[1:]):
+            continue
+        delta.add_appointment(old, -1)
+        delta.add_appointment(new, +1)
+        if old and new and old['assigned_technician_id'] != new['assigned_technician_id']:
+            moved[new['id']] = (old['assigned_technician_id'], new['assigned_technician_id'])
+        for state, sign in ((old, -1), (new, +1)):
+            if state and state['status'] == 'COMPLETED' and state['assigned_technician_id'] \
+                    and state['actual_end_time'] and state['scheduled_time']:
+                finished.append((state, sign))
+
+    if finished:
+        if service_types is not None:
+            durations = {pk: service.duration_minutes for pk, service in service_types.items()}
+        else:
+            durations = dict(ServiceType.objects.filter(
+                id__in={state['service_type_id'] for state, _ in finished}
+            ).values_list('id', 'duration_minutes'))
+        for state, sign in finished:
+            duration = durations.get(state['service_type_id'])
+            if duration is not None and finished_on_time(state['scheduled_date'], state['scheduled_time'],
+                                                          state['actual_end_time'], duration):
+                delta.technicians[state['assigned_technician_id']]['on_time_appointments'] += sign
+
+    if moved:
+        # A reviewed appointment handed to another technician takes its rating along
+        ratings = Review.objects.filter(appointment_id__in=moved).values_list('appointment_id', 'rating')
+        for appointment_id, rating in ratings:
+            old_tech, new_tech = moved[appointment_id]
+            delta.add_technician_rating(old_tech, rating, -1)
+            delta.add_technician_rating(new_tech, rating, +1)
+
+    apply_delta(delta, service_types)
+
+
+def record_appointment_change(old, new):
+    record_appointment_changes([(old, new)])
+
+
+def record_review_change(old, new):
+    if not _changed(old, new, REVIEW_FIELDS):
+        return
+    appointment_ids = {state['appointment_id'] for state in (old, new) if state}
+    technicians = dict(
+        Appointment.objects.filter(id__in=appointment_ids).values_list('id', 'assigned_technician_id')
+    )
+    delta = AnalyticsDelta()
+    if old:
+        delta.add_rating(technicians.get(old['appointment_id']), old['rating'], -1)
+    if new:
+        delta.add_rating(technicians.get(new['appointment_id']), new['rating'], +1)
+    apply_delta(delta)
+
+
+def record_count_change(customers=0, vehicles=0):
+    """Adjust the plain customer/vehicle counters with a single UPDATE"""
+    Analytics.objects.update(
+        total_customers=Greatest(F('total_customers') + customers, 0),
+        total_vehicles=Greatest(F('total_vehicles') + vehicles, 0),
+    )
+
+
+def _round(value):
+    return float(Decimal(value).quantize(TWO_PLACES))
+
+
+def _service_entry(entry):
+    entry['total_revenue'] = _round(entry['total_revenue'])
+    return entry
+
+
+def _facility_entry(entry):
+    entry['revenue'] = _round(entry['revenue'])
+    capacity = entry['capacity']
+    entry['utilization_rate'] = entry['completed_appointments'] / capacity if capacity > 0 else 0
+    return entry
+
+
+def _technician_entry(entry):
+    count = entry['rating_count']
+    total = entry['total_appointments']
+    entry['average_rating'] = entry['rating_sum'] / count if count else 0
+    entry['completion_rate'] = (entry['completed_appointments'] / total) * 100 if total else 0
+    return entry
+
+
+def _technician_name(first, last):
+    return f"{first} {last}".strip()
+
+
+def _set_averages(analytics):
+    average = Decimal(analytics.rating_sum) / analytics.review_count if analytics.review_count else Decimal('0')
+    analytics.average_rating = average.quantize(TWO_PLACES)
+    analytics.customer_satisfaction = average.quantize(TWO_PLACES)
+
+
+def _apply_technician_stats(delta):
+    """One F() UPDATE per touched technician"""
+    for technician_id, changes in delta.technicians.items():
+        updates = {
+            column: Greatest(F(column) + changes[key], 0)
+            for key, column in TECHNICIAN_STATS_COLUMNS.items() if changes.get(key)
+        }
+        if not updates:
+            continue
+        if not TechnicianStats.objects.filter(technician_id=technician_id).update(**updates):
+            TechnicianStats.objects.get_or_create(technician_id=technician_id)
+            TechnicianStats.objects.filter(technician_id=technician_id).update(**updates)
+
+
+def apply_delta(delta, service_types=None):
+    if delta.is_empty():
+        return
+
+    if service_types is not None:
+        service_facilities = {pk: service.facility_id for pk, service in service_types.items()}
+    else:
+        service_facilities = dict(
+            ServiceType.objects.filter(id__in=delta.services).values_list('id', 'facility_id')
+        ) if delta.services else {}
+    facilities = defaultdict(lambda: defaultdict(int))
+    for service_id, changes in delta.services.items():
+        facility = facilities[service_facilities.get(service_id)]
+        facility['total_appointments'] += changes['total_appointments']
+        facility['completed_appointments'] += changes['completed_appointments']
+        facility['revenue'] += changes['total_revenue']
+    facilities.pop(None, None)
+
+    # no savepoint: a failure here aborts the caller's transaction (the transition, the save) as a whole
+    with transaction.atomic(savepoint=False):
+        _apply_technician_stats(delta)
+        analytics = Analytics.objects.select_for_update().first()
+        if analytics is None:
+            return
+
+        analytics.total_appointments = max(0, analytics.total_appointments + delta.appointments)
+        analytics.completed_appointments = max(0, analytics.completed_appointments + delta.completed)
+        analytics.total_revenue = analytics.total_revenue + delta.revenue
+        analytics.rating_sum = max(0, analytics.rating_sum + delta.rating_sum)
+        analytics.review_count = max(0, analytics.review_count + delta.reviews)
+        _set_averages(analytics)
+
+        services = analytics.revenue_by_service
+        missing = [pk for pk in delta.services if str(pk) not in services]
+        for pk, name in ServiceType.objects.filter(id__in=missing).values_list('id', 'name'):
+            services[str(pk)] = {'name': name, 'total_appointments': 0, 'completed_appointments': 0,
+                                 'total_revenue': 0}
+        for pk, changes in delta.services.items():
+            entry = services.get(str(pk))
+            if entry is not None:
+                for key, value in changes.items():
+                    entry[key] = Decimal(str(entry.get(key, 0))) + value if key == 'total_revenue' else entry.get(key, 0) + value
+                _service_entry(entry)
+
+        utilization = analytics.facility_utilization
+        missing = [pk for pk in facilities if str(pk) not in utilization]
+        for pk, name, capacity in Facility.objects.filter(id__in=missing).values_list('id', 'name', 'capacity'):
+            utilization[str(pk)] = {'name': name, 'capacity': capacity, 'total_appointments': 0,
+                                    'completed_appointments': 0, 'revenue': 0}
+        for pk, changes in facilities.items():
+            entry = utilization.get(str(pk))
+            if entry is not None:
+                for key, value in changes.items():
+                    entry[key] = Decimal(str(entry.get(key, 0))) + value if key == 'revenue' else entry.get(key, 0) + value
+                entry.setdefault('capacity', 0)
+                _facility_entry(entry)
+
+        performance = analytics.technician_performance
+        missing = [pk for pk in delta.technicians if str(pk) not in performance]
+        names = Employee.objects.filter(id__in=missing).values_list(
+            'id', 'base_user__user__first_name', 'base_user__user__last_name'
+        )
+        for pk, first, last in names:
+            performance[str(pk)] = {'name': _technician_name(first, last), 'total_appointments': 0,
+                                    'completed_appointments': 0, 'rating_sum': 0, 'rating_count': 0}
+        for pk, changes in delta.technicians.items():
+            entry = performance.get(str(pk))
+            if entry is not None:
+                for key, value in changes.items():
+                    if key != 'on_time_appointments':
+                        entry[key] = entry.get(key, 0) + value
+                _technician_entry(entry)
+
+        analytics.save(update_fields=[
+            'total_appointments', 'completed_appointments', 'total_revenue', 'rating_sum', 'review_count',
+            'average_rating', 'customer_satisfaction', 'revenue_by_service', 'facility_utilization',
+            'technician_performance', 'updated_at', 'last_updated',
+        ])
+
+
+def rebuild(analytics=None):
+    """Recompute every running total from grouped aggregates (a fixed number of queries)"""
+    if analytics is None:
+        analytics = Analytics.objects.first()
+        if analytics is None:
+            return None
+
+    completed = Q(status='COMPLETED')
+    per_service = Appointment.objects.order_by().values('service_type_id').annotate(
+        total=Count('id'), completed=Count('id', filter=completed), revenue=Sum('final_cost', filter=completed),
+    )
+    per_technician = Appointment.objects.order_by().exclude(assigned_technician__isnull=True).values(
+        'assigned_technician_id'
+    ).annotate(total=Count('id'), completed=Count('id', filter=completed))
+    ratings = Review.objects.order_by().values('appointment__assigned_technician_id').annotate(
+        rating_sum=Sum('rating'), rating_count=Count('id'),
+    )
+
+    services = {
+        str(pk): {'name': name, 'facility_id': str(facility_id), 'total_appointments': 0,
+                  'completed_appointments': 0, 'total_revenue': Decimal('0')}
+        for pk, name, facility_id in ServiceType.objects.values_list('id', 'name', 'facility_id')
+    }
+    facilities = {
+        str(pk): {'name': name, 'capacity': capacity, 'total_appointments': 0,
+                  'completed_appointments': 0, 'revenue': Decimal('0')}
+        for pk, name, capacity in Facility.objects.values_list('id', 'name', 'capacity')
+    }
+    technicians = {
+        str(pk): {'name': _technician_name(first, last), 'total_appointments': 0,
+                  'completed_appointments': 0, 'rating_sum': 0, 'rating_count': 0}
+        for pk, first, last in Employee.objects.filter(base_user__user_type='TECHNICIAN').values_list(
+            'id', 'base_user__user__first_name', 'base_user__user__last_name'
+        )
+    }
+
+    total_appointments = total_completed = 0
+    total_revenue = Decimal('0')
+    for row in per_service:
+        revenue = row['revenue'] or Decimal('0')
+        total_appointments += row['total']
+        total_completed += row['completed']
+        total_revenue += revenue
+        service = services.get(str(row['service_type_id']))
+        if service is None:
+            continue
+        service['total_appointments'] = row['total']
+        service['completed_appointments'] = row['completed']
+        service['total_revenue'] = revenue
+        facility = facilities.get(service['facility_id'])
+        if facility is not None:
+            facility['total_appointments'] += row['total']
+            facility['completed_appointments'] += row['completed']
+            facility['revenue'] += revenue
+
+    for row in per_technician:
+        tech = technicians.get(str(row['assigned_technician_id']))
+        if tech is not None:
+            tech['total_appointments'] = row['total']
+            tech['completed_appointments'] = row['completed']
+
+    rating_sum = review_count = 0
+    for row in ratings:
+        rating_sum += row['rating_sum']
+        review_count += row['rating_count']
+        tech = technicians.get(str(row['appointment__assigned_technician_id']))
+        if tech is not None:
+            tech['rating_sum'] = row['rating_sum']
+            tech['rating_count'] = row['rating_count']
+
+    for service in services.values():
+        del service['facility_id']
+        _service_entry(service)
+
+    analytics.total_customers = Customer.objects.count()
+    analytics.total_vehicles = Vehicle.objects.count()
+    analytics.total_appointments = total_appointments
+    analytics.completed_appointments = total_completed
+    analytics.total_revenue = total_revenue
+    analytics.rating_sum = rating_sum
+    analytics.review_count = review_count
+    _set_averages(analytics)
+    analytics.revenue_by_service = services
+    analytics.facility_utilization = {pk: _facility_entry(entry) for pk, entry in facilities.items()}
+    analytics.technician_performance = {pk: _technician_entry(entry) for pk, entry in technicians.items()}
+    analytics.save()
+    return analytics
+
+
+def rebuild_technician_stats(batch_size=2000):
+    """Recompute every TechnicianStats row in bulk; returns the number of rows written"""
+    stats = defaultdict(lambda: dict.fromkeys(TECHNICIAN_STATS_COLUMNS.values(), 0))
+    for employee_id in Employee.objects.values_list('id', flat=True):
+        stats[employee_id]  # every employee gets a row, even without assignments
+
+    completed = Q(status='COMPLETED')
+    totals = Appointment.objects.order_by().exclude(assigned_technician__isnull=True).values(
+        'assigned_technician_id'
+    ).annotate(total=Count('id'), completed=Count('id', filter=completed))
+    for row in totals:
+        entry = stats[row['assigned_technician_id']]
+        entry['total_assigned'] = row['total']
+        entry['completed_count'] = row['completed']
+
+    ratings = Review.objects.order_by().exclude(appointment__assigned_technician__isnull=True).values(
+        'appointment__assigned_technician_id'
+    ).annotate(rating_sum=Sum('rating'), rating_count=Count('id'))
+    for row in ratings:
+        entry = stats[row['appointment__assigned_technician_id']]
+        entry['rating_sum'] = row['rating_sum']
+        entry['rating_count'] = row['rating_count']
+
+    # On-time is a datetime comparison the ORM cannot express portably, so stream the few columns needed
+    finished = Appointment.objects.order_by().filter(
+        completed, assigned_technician__isnull=False, actual_end_time__isnull=False
+    ).values_list(
+        'assigned_technician_id', 'scheduled_date', 'scheduled_time', 'actual_end_time',
+        'service_type__duration_minutes',
+    )
+    for technician_id, day, start, end, duration in finished.iterator(chunk_size=batch_size):
+        if finished_on_time(day, start, end, duration):
+            stats[technician_id]['on_time_count'] += 1
+
+    existing = {row.technician_id: row for row in TechnicianStats.objects.all()}
+    columns = list(TECHNICIAN_STATS_COLUMNS.values())
+    to_update, to_create = [], []
+    for technician_id, values in stats.items():
+        row = existing.get(technician_id)
+        if row is None:
+            to_create.append(TechnicianStats(technician_id=technician_id, **values))
+        elif any(getattr(row, column) != value for column, value in values.items()):
+            for column, value in values.items():
+                setattr(row, column, value)
+            to_update.append(row)
+
+    with transaction.atomic():
+        TechnicianStats.objects.bulk_create(to_create, batch_size=batch_size)
+        TechnicianStats.objects.bulk_update(to_update, columns, batch_size=batch_size)
+    return len(to_create) + len(to_update)
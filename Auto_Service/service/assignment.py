@@ -0,0 +1,179 @@
+"""
+Automatic technician assignment.
+
+A booking goes to a technician of the service's facility who specialises in
+the service (``Employee.specializations``; every technician of the facility
+when nobody does), is working for the whole job according to
+``TechnicianAvailability``, has no overlapping active appointment, and has
+the fewest appointments that day. Which technicians may do which service is
+kept in an eligibility index that is cached and rebuilt only when staff or
+services change (see the receivers in models.py), so a booking costs three
+small queries however many technicians there are. Each process caches its
+own copy under a version stamp kept in the 'shared' cache, so a change made
+in one process retires the copies of all the others; copies also expire
+after ``INDEX_TIMEOUT`` in case a change bypassed the receivers. ``assign_unassigned``
+plans thousands of open appointments in memory and writes them with one
+bulk update (``manage.py assign_technicians``).
+"""
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+
+from .slots import minutes, working_intervals
+
+INDEX_KEY = 'assignment:index'
+INDEX_VERSION_KEY = 'assignment:version'
+# rebuild at least this often, for changes made with queryset updates (which send no signals)
+INDEX_TIMEOUT = 3600
+
+
+def _load_index():
+    from .models import Employee, ServiceType
+
+    technicians = dict(Employee.objects.filter(
+        is_active=True, base_user__user_type='TECHNICIAN', facility__isnull=False,
+    ).values_list('id', 'facility_id'))
+    specialists = defaultdict(set)
+    for technician_id, service_type_id in Employee.specializations.through.objects.filter(
+        employee_id__in=technicians
+    ).values_list('employee_id', 'servicetype_id'):
+        specialists[service_type_id].add(technician_id)
+    by_facility = defaultdict(list)
+    for technician_id, facility_id in technicians.items():
+        by_facility[facility_id].append(technician_id)
+
+    services = {}
+    for service_type_id, facility_id in ServiceType.objects.values_list('id', 'facility_id'):
+        staff = by_facility.get(facility_id, [])
+        experts = [technician_id for technician_id in staff if technician_id in specialists[service_type_id]]
+        services[service_type_id] = tuple(sorted(experts or staff, key=str))
+    return {'services': services, 'facilities': technicians}
+
+
+def eligibility_index():
+    """``{'services': {service_type_id: technician ids}, 'facilities': {technician_id: facility_id}}``"""
+    stamps = caches['shared']
+    version = stamps.get(INDEX_VERSION_KEY)
+    if version is None:
+        # first process after a cache flush: start a new epoch (add() keeps a concurrent bump)
+        stamps.add(INDEX_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = stamps.get(INDEX_VERSION_KEY)
+    key = f'{INDEX_KEY}:{version}'
+    index = cache.get(key)
+    if index is None:
+        index = _load_index()
+        cache.set(key, index, timeout=INDEX_TIMEOUT)
+    return index
+
+
+def _bump_version():
+    caches['shared'].set(INDEX_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_index():
+    """Retire every process's copy now and again on commit (a rebuild in between may have read old rows)"""
+    _bump_version()
+    transaction.on_commit(_bump_version)
+
+
+class Planner:
+    """Technician calendars for a date range, updated in memory as appointments are placed"""
+
+    def __init__(self, index, first, last, technicians):
+        from .models import Appointment, Schedule, TechnicianAvailability
+
+        self.index = index
+        technicians = set(technicians)
+        facilities = {index['facilities'][technician_id] for technician_id in technicians}
+        self.hours = {
+            facility_id: (minutes(opening), minutes(closing))
+            for facility_id, opening, closing in Schedule.objects.filter(facility_id__in=facilities)
+            .values_list('facility_id', 'opening_time', 'closing_time')
+        }
+        self.availability = defaultdict(list)
+        for technician_id, day, start, end, ok in TechnicianAvailability.objects.filter(
+            technician_id__in=technicians, date__range=(first, last),
+        ).values_list('technician_id', 'date', 'start_time', 'end_time', 'is_available'):
+            self.availability[technician_id, day].append((minutes(start), minutes(end), ok))
+        self.busy = defaultdict(list)
+        for technician_id, day, start, duration in Appointment.objects.filter(
+            assigned_technician_id__in=technicians, status__in=Appointment.ACTIVE_STATUSES,
+            scheduled_date__range=(first, last),
+        ).values_list('assigned_technician_id', 'scheduled_date', 'scheduled_time', 'service_type__duration_minutes'):
+            self.busy[technician_id, day].append((minutes(start), minutes(start) + duration))
+
+    def _is_free(self, technician_id, day, start, end):
+        hours = self.hours.get(self.index['facilities'][technician_id])
+        if hours is None:
+            return False
+        if not any(s <= start and end <= e for s, e in
+                   working_intervals(self.availability[technician_id, day], *hours)):
+            return False
+        return not any(s < end and start < e for s, e in self.busy[technician_id, day])
+
+    def choose(self, service_type_id, day, start_time, duration):
+        """The least loaded eligible technician free for the whole job (booked in memory), or None"""
+        start = minutes(start_time)
+        end = start + duration
+        free = [technician_id for technician_id in self.index['services'].get(service_type_id, ())
+                if self._is_free(technician_id, day, start, end)]
+        if not free:
+            return None
+        technician_id = min(free, key=lambda t: len(self.busy[t, day]))
+        self.busy[technician_id, day].append((start, end))
+        return technician_id
+
+
+def assign(appointment):
+    """Set ``appointment.assigned_technician`` (unsaved) to the best free technician; returns the id or None"""
+    index = eligibility_index()
+    candidates = index['services'].get(appointment.service_type_id, ())
+    if not candidates:
+        return None
+    day = appointment.scheduled_date
+    planner = Planner(index, day, day, candidates)
+    technician_id = planner.choose(appointment.service_type_id, day, appointment.scheduled_time,
+                                   appointment.service_type.duration_minutes)
+    if technician_id is not None:
+        appointment.assigned_technician_id = technician_id
+    return technician_id
+
+
+def assign_unassigned(appointments=None, batch_size=1000, dry_run=False):
+    """Assign the unassigned scheduled appointments from today on (or of ``appointments``) in one pass.
+
+    Returns ``(assigned, left unassigned)``. Rows are locked while planning and written with a single
+    bulk update, which skips signals, so stats and analytics get the before/after states explicitly.
+    """
+    from .analytics import APPOINTMENT_FIELDS, record_appointment_changes
+    from .models import Appointment
+
+    if appointments is None:
+        appointments = Appointment.objects.filter(scheduled_date__gte=timezone.localdate())
+    with transaction.atomic():
+        rows = list(appointments.filter(assigned_technician__isnull=True, status='SCHEDULED')
+                    .select_for_update(of=('self',)).order_by('scheduled_date', 'scheduled_time')
+                    .values(*APPOINTMENT_FIELDS, 'service_type__duration_minutes'))
+        if not rows:
+            return 0, 0
+        index = eligibility_index()
+        technicians = {t for row in rows for t in index['services'].get(row['service_type_id'], ())}
+        planner = Planner(index, rows[0]['scheduled_date'], rows[-1]['scheduled_date'], technicians)
+
+        changes, updated = [], []
+        now = timezone.now()
+        for row in rows:
+            duration = row.pop('service_type__duration_minutes')
+            technician_id = planner.choose(row['service_type_id'], row['scheduled_date'],
+                                           row['scheduled_time'], duration)
+            if technician_id is None:
+                continue
+            changes.append((row, dict(row, assigned_technician_id=technician_id)))
+            updated.append(Appointment(id=row['id'], assigned_technician_id=technician_id, updated_at=now))
+        if not dry_run:
+            Appointment.objects.bulk_update(updated, ['assigned_technician', 'updated_at'], batch_size=batch_size)
+            record_appointment_changes(changes)
+    return len(updated), len(rows) - len(updated)
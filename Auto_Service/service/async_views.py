@@ -0,0 +1,95 @@
+"""
+Async versions of the small, high-frequency JSON endpoints polled by main.js.
+
+Served instead of their counterparts in views.py when ``ASYNC_API_VIEWS`` is
+on (the ASGI profile, Auto_Service/settings_asgi.py). Reads use the async ORM
+interface, so a request waiting on the database does not hold a worker
+thread; writes that need a transaction (status transitions, ``mark_read``)
+still run as one sync call in a thread. Responses and status codes match
+the sync views.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+from . import events
+from .models import BaseUser, Employee, Notification, Schedule, TechnicianAvailability
+from .notifications import mark_read
+from .transitions import transition
+from .views import json_body, transition_response
+
+
+async def _base_user(request):
+    user = await request.auser()
+    return await BaseUser.objects.aget(user=user)
+
+
+@login_required
+async def api_facility_schedule(request, facility_id):
+    """API endpoint for facility schedule"""
+    schedule = await aget_object_or_404(Schedule, facility_id=facility_id)
+    return JsonResponse({
+        'opening_time': schedule.opening_time.strftime('%H:%M'),
+        'closing_time': schedule.closing_time.strftime('%H:%M'),
+        'is_open_weekends': schedule.is_open_weekends,
+    })
+
+
+@login_required
+async def api_technician_schedule(request, technician_id):
+    """API endpoint for technician schedule"""
+    technician = await aget_object_or_404(Employee.objects.only('id'), id=technician_id,
+                                          base_user__user_type='TECHNICIAN')
+    data = [{
+        'date': av.date.isoformat(),
+        'start_time': av.start_time.strftime('%H:%M'),
+        'end_time': av.end_time.strftime('%H:%M'),
+        'is_available': av.is_available,
+    } async for av in TechnicianAvailability.objects.filter(technician=technician, date__gte=timezone.now().date())]
+    return JsonResponse({'availability': data})
+
+
+@login_required
+async def api_mark_notification_read(request, notification_id):
+    """API endpoint to mark a notification as read"""
+    base_user = await _base_user(request)
+    if not await sync_to_async(mark_read)(base_user, [notification_id]):
+        # already read, or not this user's notification
+        await aget_object_or_404(Notification.objects.only('id'), id=notification_id, user=base_user)
+    return JsonResponse({'status': 'success'})
+
+
+@login_required
+@require_POST
+async def api_appointment_start(request, appointment_id):
+    """Technician starts an appointment (moves to IN_PROGRESS)"""
+    base_user = await _base_user(request)
+    if base_user.user_type != 'TECHNICIAN':
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    result, = await sync_to_async(transition)(base_user, [(appointment_id, 'IN_PROGRESS', '')])
+    return transition_response(result)
+
+
+@login_required
+@require_POST
+async def api_appointment_complete(request, appointment_id):
+    """Technician completes an appointment (moves to COMPLETED); an optional comment is kept as its notes"""
+    base_user = await _base_user(request)
+    if base_user.user_type != 'TECHNICIAN':
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    comment = str(json_body(request).get('comment') or '')
+    result, = await sync_to_async(transition)(base_user, [(appointment_id, 'COMPLETED', comment)])
+    return transition_response(result)
+
+
+@login_required
+async def events_stream(request):
+    """Server-sent events: the user's new notifications and appointment status changes"""
+    base_user = await _base_user(request)
+    listener = await sync_to_async(events.Listener)(base_user, request.headers.get('Last-Event-ID'))
+    return events.event_stream_response(events.astream(listener, sync_to_async(listener.poll)))
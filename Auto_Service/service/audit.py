@@ -0,0 +1,191 @@
+"""
+Buffered audit log (EventLog).
+
+``log_event`` records an EventLog row without writing it on the spot. While
+a request (``EventLogMiddleware``) or a job (``jobs.execute``) is running,
+events collect in an in-memory ``EventBatch`` and are written with one
+``bulk_create``:
+
+* for requests, once the response has been sent (on ``request_finished``,
+  which Django sends when the server closes the delivered response), so
+  logging adds no database round trip to the response time of the write
+  paths in views.py;
+* for jobs, when the job ends;
+* earlier when ``EVENT_LOG_BATCH_SIZE`` events are waiting or the oldest has
+  waited ``EVENT_LOG_FLUSH_SECONDS`` (long jobs, bulk operations).
+
+Events logged outside a request or job (shell, management commands) are
+written immediately. ``EVENT_LOG_MODE`` chooses how batches are written:
+``'sync'`` (the default) inserts them in the thread that flushes, while
+``'background'`` hands them to a daemon thread and never waits on the
+database; that is fire-and-forget, so events still queued when the process
+dies are lost. ``'off'`` drops events. A failing insert is logged and never
+breaks the request that recorded the events.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import DatabaseError, connection, transaction
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_SECONDS = 5
+
+_current = ContextVar('event_batch', default=None)
+
+
+def _mode():
+    return getattr(settings, 'EVENT_LOG_MODE', 'sync')
+
+
+def _pk(value):
+    return getattr(value, 'pk', value)
+
+
+def _insert(events):
+    from .models import EventLog
+
+    try:
+        # a savepoint when called inside a transaction: a failed insert must not break the caller's work
+        with transaction.atomic():
+            EventLog.objects.bulk_create(events, batch_size=getattr(settings, 'EVENT_LOG_BATCH_SIZE',
+                                                                    DEFAULT_BATCH_SIZE))
+    except DatabaseError:
+        logger.exception('Could not write %d audit events', len(events))
+
+
+class _Writer(threading.Thread):
+    """Daemon thread inserting the batches handed to it (``EVENT_LOG_MODE = 'background'``)"""
+
+    def __init__(self):
+        super().__init__(name='event-log-writer', daemon=True)
+        self.batches = queue.SimpleQueue()
+
+    def run(self):
+        while (events := self.batches.get()) is not None:
+            _insert(events)
+            connection.close()
+
+    def stop(self, timeout=5):
+        self.batches.put(None)
+        self.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _background():
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = _Writer()
+            _writer.start()
+            atexit.register(_writer.stop)
+        return _writer
+
+
+def write(events):
+    """Write ``events`` (unsaved EventLog instances) now, or hand them to the background writer"""
+    if not events:
+        return
+    if _mode() == 'background':
+        _background().batches.put(events)
+    else:
+        _insert(events)
+
+
+class EventBatch:
+    """Events of one request or job, written together"""
+
+    def __init__(self):
+        self.events = []
+        self.started = None
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        if not self.events:
+            self.started = time.monotonic()
+        self.events.append(event)
+        if (len(self.events) >= getattr(settings, 'EVENT_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE) or
+                time.monotonic() - self.started >= getattr(settings, 'EVENT_LOG_FLUSH_SECONDS',
+                                                           DEFAULT_FLUSH_SECONDS)):
+            self.flush()
+
+    def flush(self):
+        events, self.events = self.events, []
+        write(events)
+
+
+@contextmanager
+def event_batch():
+    """Collect the events logged inside the block and write them when it exits"""
+    batch = EventBatch()
+    token = _current.set(batch)
+    try:
+        yield batch
+    finally:
+        _current.reset(token)
+        batch.flush()
+
+
+def log_event(event_type, description, user=None, facility=None, appointment=None, **metadata):
+    """Record an EventLog entry; ``user`` / ``facility`` / ``appointment`` may be instances or ids.
+
+    Call it once the change being logged is saved (after its transaction block): events are buffered,
+    so one logged inside a transaction that later rolls back would still be written.
+    """
+    from .models import EventLog
+
+    if _mode() == 'off':
+        return
+    event = EventLog(event_type=event_type, description=description, user_id=_pk(user),
+                     facility_id=_pk(facility), appointment_id=_pk(appointment), metadata=metadata)
+    batch = _current.get()
+    if batch is None:
+        write([event])
+    else:
+        batch.add(event)
+
+
+class EventLogMiddleware:
+    """Buffer the events of each request; ``flush_request_events`` writes them after the response has been sent"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        # left in place past the view: the response is closed (and request_finished sent) in the same context
+        _current.set(EventBatch())
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        _current.set(EventBatch())
+        return await self.get_response(request)
+
+
+@receiver(request_finished)
+def flush_request_events(sender, **kwargs):
+    """Write the events of the request whose response the server just closed, streaming responses included"""
+    batch = _current.get()
+    if batch is not None:
+        _current.set(None)
+        batch.flush()
@@ -0,0 +1,114 @@
+"""
+Per facility-day booking counters.
+
+``FacilityDayLoad.booked`` is the number of appointments a facility has on
+a day that were not cancelled: scheduled, in progress and completed ones all
+count against ``Schedule.max_daily_appointments``. ``claim`` books one more with
+a single conditional UPDATE, ``booked = booked + 1 WHERE booked <
+max_daily_appointments``, inside the booking transaction: the statement is
+the whole capacity check, and because it writes the counter row it also
+serialises concurrent bookings of the same facility-day (a row lock on
+PostgreSQL, the write lock on SQLite) until the booking commits or rolls
+back. The per-minute bay check (``slots.is_free``) then runs against data
+no other booking of that day can change underneath it. Other days and
+facilities are not blocked.
+
+Counter rows are created on a day's first claim, seeded from the
+appointments table. Only cancellations, reschedules, deletions and admin
+edits of the date, service or status change them afterwards (completing an
+appointment keeps its place), with F() UPDATEs from the Appointment receiver
+in models.py; the start / complete transitions of service/transitions.py
+never move a count. ``reconcile_loads`` (``manage.py reconcile_day_loads``)
+repairs drift.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Appointment, FacilityDayLoad, Schedule, ServiceType
+
+
+def _booked(facility_id, day):
+    return Appointment.objects.filter(service_type__facility_id=facility_id,
+                                      scheduled_date=day).exclude(status='CANCELLED')
+
+
+def claim(facility_id, day):
+    """Count one more booking on the facility-day unless it is full; True when claimed.
+
+    Call inside the booking transaction: rolling it back returns the claim.
+    """
+    limit = Schedule.objects.filter(facility_id=OuterRef('facility_id')).values('max_daily_appointments')[:1]
+    day_load = FacilityDayLoad.objects.filter(facility_id=facility_id, date=day)
+    free = day_load.filter(booked__lt=Subquery(limit))
+    if free.update(booked=F('booked') + 1, updated_at=timezone.now()):
+        return True
+    if day_load.exists():
+        return False
+    # first booking of the day: seed the counter from the appointments already there
+    FacilityDayLoad.objects.bulk_create(
+        [FacilityDayLoad(facility_id=facility_id, date=day, booked=_booked(facility_id, day).count())],
+        ignore_conflicts=True,
+    )
+    return bool(free.update(booked=F('booked') + 1, updated_at=timezone.now()))
+
+
+def adjust_loads(deltas):
+    """Apply ``{(facility_id, date): delta}``; days without a counter row yet are seeded on their first claim"""
+    by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(key)
+    now = timezone.now()
+    for delta, keys in by_delta.items():
+        days = Q()
+        for facility_id, day in keys:
+            days |= Q(facility_id=facility_id, date=day)
+        FacilityDayLoad.objects.filter(days).update(booked=Greatest(F('booked') + delta, 0), updated_at=now)
+
+
+def record_load_changes(changes, facilities=None):
+    """Counter deltas for ``(old, new)`` LOAD_FIELDS states (either may be None); ``facilities`` maps known
+    service type ids to their facility ids"""
+    def booking(state):
+        if state and state['status'] != 'CANCELLED':
+            return state['service_type_id'], state['scheduled_date']
+        return None
+
+    deltas = Counter()
+    for old, new in changes:
+        old, new = booking(old), booking(new)
+        if old != new:
+            deltas[old] -= 1
+            deltas[new] += 1
+    deltas.pop(None, None)
+    if not any(deltas.values()):
+        return
+    facilities = dict(facilities or {})
+    unknown = {service_type_id for service_type_id, _ in deltas} - set(facilities)
+    if unknown:
+        facilities.update(ServiceType.objects.filter(pk__in=unknown).values_list('id', 'facility_id'))
+    by_day = Counter()
+    for (service_type_id, day), delta in deltas.items():
+        if service_type_id in facilities:
+            by_day[facilities[service_type_id], day] += delta
+    adjust_loads(by_day)
+
+
+def reconcile_loads(dry_run=False):
+    """Reset every drifted counter to the real booked count; returns the ``(facility, date, stored, actual)`` fixes"""
+    actual = Appointment.objects.filter(
+        service_type__facility_id=OuterRef('facility_id'), scheduled_date=OuterRef('date'),
+    ).exclude(status='CANCELLED').order_by().values('scheduled_date').annotate(n=Count('pk')).values('n')[:1]
+    drifted = [
+        (facility_id, day, stored, count or 0)
+        for facility_id, day, stored, count in FacilityDayLoad.objects.annotate(actual=Subquery(actual))
+        .values_list('facility_id', 'date', 'booked', 'actual')
+        if stored != (count or 0)
+    ]
+    if not dry_run:
+        for facility_id, day, _, count in drifted:
+            FacilityDayLoad.objects.filter(facility_id=facility_id, date=day).update(booked=count)
+    return drifted
@@ -0,0 +1,222 @@
+"""
+Synthetic, production-sized datasets for the performance tooling.
+
+``build_scaled_dataset`` inserts customers, technicians, vehicles,
+appointments, reviews, notifications and messages with ``bulk_create``
+(the shared password is hashed once), then rebuilds the derived tables that
+the per-row signals would normally maintain. It is used by the index
+advisor, the query-budget tests and the view benchmarks.
+"""
+import random
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from .models import (
+    Appointment, BaseUser, Customer, Employee, Facility, Message, Notification, RepairShop, Review,
+    ServiceType, TechnicianStats, Vehicle
+)
+from .notifications import bulk_notify
+
+DEFAULT_PASSWORD = 'pass@1234'
+
+ROLES = ('CUSTOMER', 'TECHNICIAN', 'SECRETARY', 'MANAGER')
+
+MAKES = ['Audi', 'BMW', 'Mercedes', 'Volkswagen', 'Toyota', 'Skoda']
+COLORS = ['Black', 'White', 'Blue', 'Red', 'Silver']
+SLOT_TIMES = [time(hour, minute) for hour in range(9, 17) for minute in (0, 30)]
+
+
+class ScaledDataset:
+    """Summary of a generated dataset: one login per role plus row counts"""
+
+    def __init__(self, prefix, password):
+        self.prefix = prefix
+        self.password = password
+        self.usernames = {}
+        self.counts = {}
+
+    def username(self, role):
+        return self.usernames[role]
+
+    def as_dict(self):
+        return {'prefix': self.prefix, 'usernames': self.usernames, 'counts': self.counts}
+
+
+def _ensure_shop(password):
+    shop = RepairShop.objects.first()
+    if shop is not None:
+        return shop
+    user, _ = User.objects.get_or_create(username='owner', defaults={'password': make_password(password)})
+    owner = BaseUser.objects.create(user=user, user_type='OWNER', phone_number='0000', address='-')
+    return RepairShop.objects.create(name='Auto Service', address='-', email='info@example.com',
+                                     tax_id='AT000000000', owner=owner)
+
+
+def _ensure_catalogue(shop):
+    facilities = list(Facility.objects.filter(is_active=True))
+    if not facilities:
+        for code, label in Facility.FACILITY_TYPES:
+            facilities.append(Facility.objects.create(
+                name=label, facility_type=code, description=label, repair_shop=shop, capacity=4,
+            ))
+    services = list(ServiceType.objects.filter(facility__in=facilities))
+    if not services:
+        services = ServiceType.objects.bulk_create([
+            ServiceType(name=f'{facility.name} service {i + 1}', description='-', facility=facility,
+                        duration_minutes=(30, 60, 90)[i], price=Decimal(60 + 40 * i))
+            for facility in facilities for i in range(3)
+        ])
+    return facilities, services
+
+
+def _batched(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_scaled_dataset(customers=100, technicians=10, vehicles_per_customer=2, appointments_per_vehicle=5,
+                         notifications_per_customer=5, prefix='scale', password=DEFAULT_PASSWORD,
+                         batch_size=1000, seed=0, log=None):
+    """Insert a dataset of the requested size and return a ``ScaledDataset`` describing it"""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    dataset = ScaledDataset(prefix, password)
+    today = timezone.localdate()
+    tz = timezone.get_current_timezone()
+
+    with transaction.atomic():
+        shop = _ensure_shop(password)
+        facilities, services = _ensure_catalogue(shop)
+
+        # ---- users: one PBKDF2 hash shared by every account ----
+        hashed = make_password(password)
+        roles = (
+            [('CUSTOMER', i) for i in range(customers)]
+            + [('TECHNICIAN', i) for i in range(technicians)]
+            + [('SECRETARY', 0), ('MANAGER', 0)]
+        )
+        names = {(role, i): f'{prefix}-{role.lower()}{i + 1}' for role, i in roles}
+        for batch in _batched(names.values(), batch_size):
+            User.objects.bulk_create([
+                User(username=username, password=hashed, first_name=username.split('-')[-1].title(),
+                     last_name=prefix.title(), email=f'{username}@example.com')
+                for username in batch
+            ])
+        user_ids = dict(User.objects.filter(username__startswith=f'{prefix}-').values_list('username', 'id'))
+        base_users = {
+            key: BaseUser(user_id=user_ids[username], user_type=key[0], phone_number='0660000000', address='-')
+            for key, username in names.items()
+        }
+        BaseUser.objects.bulk_create(base_users.values(), batch_size=batch_size)
+        for role in ROLES:
+            dataset.usernames[role] = names[(role, 0)]
+        log(f'{len(base_users)} users')
+
+        # ---- staff ----
+        employees = [
+            Employee(base_user=base_users[('TECHNICIAN', i)], facility=facilities[i % len(facilities)],
+                     hire_date=today - timedelta(days=365), salary=Decimal('40000'))
+            for i in range(technicians)
+        ] + [Employee(base_user=base_users[('MANAGER', 0)], facility=facilities[0],
+                      hire_date=today - timedelta(days=365), salary=Decimal('60000'))]
+        Employee.objects.bulk_create(employees, batch_size=batch_size)
+        TechnicianStats.objects.bulk_create([TechnicianStats(technician=e) for e in employees], batch_size=batch_size)
+        techs_by_facility = {}
+        for employee in employees[:technicians]:
+            techs_by_facility.setdefault(employee.facility_id, []).append(employee)
+
+        # ---- customers & vehicles ----
+        customer_rows = [Customer(base_user=base_users[('CUSTOMER', i)]) for i in range(customers)]
+        Customer.objects.bulk_create(customer_rows, batch_size=batch_size)
+        vehicles = []
+        for customer in customer_rows:
+            for _ in range(vehicles_per_customer):
+                vehicles.append(Vehicle(
+                    owner=customer, vin=f'{rng.getrandbits(68):017X}', make=rng.choice(MAKES), model='Model',
+                    year=rng.randint(2005, today.year), color=rng.choice(COLORS),
+                    license_plate=f'W-{len(vehicles) + 1}', mileage=rng.randint(1000, 200000),
+                ))
+        Vehicle.objects.bulk_create(vehicles, batch_size=batch_size)
+        log(f'{len(customer_rows)} customers, {len(vehicles)} vehicles')
+
+        # ---- appointments & reviews, streamed in batches ----
+        def appointments():
+            for vehicle in vehicles:
+                for _ in range(appointments_per_vehicle):
+                    service = rng.choice(services)
+                    techs = techs_by_facility.get(service.facility_id)
+                    offset = rng.randint(-365, 60)
+                    day = today + timedelta(days=offset)
+                    start = rng.choice(SLOT_TIMES)
+                    if offset < 0:
+                        status = 'COMPLETED' if rng.random() < 0.8 else 'CANCELLED'
+                    elif offset == 0:
+                        status = rng.choice(Appointment.ACTIVE_STATUSES)
+                    else:
+                        status = 'SCHEDULED'
+                    appointment = Appointment(
+                        customer_id=vehicle.owner_id, vehicle=vehicle, service_type=service,
+                        assigned_technician=rng.choice(techs) if techs else None,
+                        scheduled_date=day, scheduled_time=start, status=status,
+                        estimated_cost=service.price,
+                    )
+                    if status == 'COMPLETED':
+                        begin = datetime.combine(day, start, tzinfo=tz)
+                        appointment.actual_start_time = begin
+                        appointment.actual_end_time = begin + timedelta(minutes=service.duration_minutes
+                                                                        + rng.choice((-10, 0, 20)))
+                        appointment.final_cost = service.price
+                    yield appointment
+
+        appointment_count = review_count = 0
+        for batch in _batched(appointments(), batch_size):
+            Appointment.objects.bulk_create(batch)
+            reviews = [
+                Review(appointment=a, rating=rng.randint(3, 5), comment='Good service',
+                       technician_rating=rng.randint(3, 5))
+                for a in batch if a.status == 'COMPLETED' and rng.random() < 0.5
+            ]
+            Review.objects.bulk_create(reviews)
+            appointment_count += len(batch)
+            review_count += len(reviews)
+        log(f'{appointment_count} appointments, {review_count} reviews')
+
+        # ---- notifications & messages ----
+        notifications = (
+            Notification(user_id=customer.base_user_id, type='STATUS_UPDATE', title='Status update',
+                         message='Your appointment status changed.', is_read=rng.random() < 0.7)
+            for customer in customer_rows for _ in range(notifications_per_customer)
+        )
+        notification_count = 0
+        for batch in _batched(notifications, batch_size):
+            bulk_notify(batch)
+            notification_count += len(batch)
+        secretary = base_users[('SECRETARY', 0)]
+        Message.objects.bulk_create([
+            Message(sender_id=customer.base_user_id, recipient=secretary, subject='Question',
+                    content='Can you confirm my appointment?')
+            for customer in customer_rows[:batch_size]
+        ])
+
+        # bulk_create skips the signals that keep the derived tables current
+        from .analytics import rebuild, rebuild_technician_stats
+        rebuild()
+        rebuild_technician_stats(batch_size=batch_size)
+
+    dataset.counts = {
+        'users': len(base_users), 'customers': len(customer_rows), 'technicians': technicians,
+        'vehicles': len(vehicles), 'appointments': appointment_count, 'reviews': review_count,
+        'notifications': notification_count,
+    }
+    return dataset
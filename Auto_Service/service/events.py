@@ -0,0 +1,322 @@
+"""
+Live notification and appointment-status events (server-sent events).
+
+``GET /service/api/events/`` keeps a ``text/event-stream`` open and pushes the
+signed-in user's new notifications (``event: notification``) and the status
+transitions of their appointments (``event: appointment``), so pages update
+in place instead of being reloaded to poll.
+
+Events reach a stream two ways:
+
+* the in-process ``hub``: the Notification / Appointment receivers in
+  models.py (and ``bulk_notify``) publish once the transaction commits, and
+  every stream of this process subscribed to the affected user, customer or
+  technician gets the event immediately;
+* a database fallback for changes made by other processes (other web
+  workers, ``run_worker``): every ``SSE_POLL_SECONDS`` a stream runs two
+  small indexed queries for rows newer than the last event it sent.
+
+Both paths feed the same ``Listener``, which drops events it already sent,
+so overlapping deliveries are harmless. The database only says that an
+appointment row changed, so the listener remembers the status each open
+appointment had when the stream began and sends a polled row only when that
+status changed (or the appointment was booked since). Event ids are
+timestamps: a browser reconnecting with ``Last-Event-ID`` gets what it
+missed from the database.
+
+Streams end after ``SSE_MAX_SECONDS`` (the browser reconnects on its own).
+Under WSGI each open stream still holds a worker thread for that long, so
+pages only open one when ``LIVE_EVENTS_STREAM`` is on, as in the ASGI profile
+(settings_asgi.py), which serves it from an async view that holds no thread
+while idle; otherwise they show the unread count rendered with the page.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_POLL_SECONDS = 10
+DEFAULT_HEARTBEAT_SECONDS = 15
+DEFAULT_MAX_SECONDS = 300
+RETRY_MILLISECONDS = 3000
+# how far back a database poll looks past the newest event sent; covers rows committed after a later timestamp
+POLL_OVERLAP = timedelta(seconds=30)
+SEEN_LIMIT = 1000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Hub:
+    """In-process fan-out: ``publish(keys, event)`` delivers to every subscription listening on one of ``keys``"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                self._subscribers[key].add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                self._subscribers[key].discard(subscription)
+                if not self._subscribers[key]:
+                    del self._subscribers[key]
+
+    def has_subscribers(self, keys):
+        return any(key in self._subscribers for key in keys)
+
+    def publish(self, keys, event):
+        with self._lock:
+            targets = {subscription for key in keys for subscription in self._subscribers.get(key, ())}
+        for subscription in targets:
+            subscription.deliver(event)
+
+
+hub = Hub()
+
+
+class Subscription:
+    """A thread-safe inbox for one stream; async streams are woken on their own event loop"""
+
+    def __init__(self, keys, loop=None):
+        self.keys = frozenset(keys)
+        self.loop = loop
+        self.inbox = asyncio.Queue() if loop else queue.SimpleQueue()
+
+    def deliver(self, event):
+        if self.loop is None:
+            self.inbox.put(event)
+        else:
+            try:
+                self.loop.call_soon_threadsafe(self.inbox.put_nowait, event)
+            except RuntimeError:
+                pass  # the stream's loop already closed
+
+    def get(self, timeout):
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+# ---- events ----
+
+def notification_event(notification):
+    return {
+        'event': 'notification',
+        'at': notification['created_at'],
+        'key': ('notification', notification['id']),
+        'data': {
+            'id': str(notification['id']),
+            'type': notification['type'],
+            'title': notification['title'],
+            'message': notification['message'],
+            'related_appointment_id': notification['related_appointment_id'] and
+                                      str(notification['related_appointment_id']),
+        },
+    }
+
+
+def appointment_event(appointment):
+    from .models import Appointment
+
+    return {
+        'event': 'appointment',
+        'at': appointment['updated_at'],
+        'key': ('appointment', appointment['id'], appointment['status']),
+        'data': {
+            'id': str(appointment['id']),
+            'status': appointment['status'],
+            'status_display': dict(Appointment.STATUS_CHOICES).get(appointment['status'], appointment['status']),
+            'scheduled_date': appointment['scheduled_date'].isoformat(),
+            'scheduled_time': appointment['scheduled_time'].strftime('%H:%M'),
+        },
+    }
+
+
+NOTIFICATION_FIELDS = ('id', 'user_id', 'type', 'title', 'message', 'related_appointment_id', 'created_at')
+APPOINTMENT_EVENT_FIELDS = ('id', 'status', 'scheduled_date', 'scheduled_time', 'updated_at')
+APPOINTMENT_POLL_FIELDS = APPOINTMENT_EVENT_FIELDS + ('created_at',)
+
+
+def publish_notifications(notifications):
+    """Queue ``event: notification`` for the owners of ``notifications`` (model instances) after commit"""
+    events = [(('user', n.user_id), notification_event({f: getattr(n, f) for f in NOTIFICATION_FIELDS}))
+              for n in notifications if hub.has_subscribers([('user', n.user_id)])]
+    if events:
+        transaction.on_commit(lambda: [hub.publish([key], event) for key, event in events])
+
+
+def publish_appointment(appointment):
+    """Queue ``event: appointment`` for the appointment's customer and technician after commit"""
+    keys = [('customer', appointment.customer_id)]
+    if appointment.assigned_technician_id:
+        keys.append(('technician', appointment.assigned_technician_id))
+    if hub.has_subscribers(keys):
+        event = appointment_event({f: getattr(appointment, f) for f in APPOINTMENT_EVENT_FIELDS})
+        transaction.on_commit(lambda: hub.publish(keys, event))
+
+
+def encode(event):
+    payload = json.dumps(event['data'], separators=(',', ':'))
+    return f"id: {event['at'].isoformat()}\nevent: {event['event']}\ndata: {payload}\n\n"
+
+
+# ---- streams ----
+
+class Listener:
+    """What one stream has sent so far, and the database fallback for events from other processes"""
+
+    def __init__(self, base_user, last_event_id=None):
+        from .models import Appointment, Customer, Employee
+
+        self.user_id = base_user.pk
+        self.customer_id = Customer.objects.filter(base_user=base_user).values_list('id', flat=True).first()
+        self.technician_id = Employee.objects.filter(base_user=base_user).values_list('id', flat=True).first()
+        self.keys = [('user', self.user_id)]
+        if self.customer_id:
+            self.keys.append(('customer', self.customer_id))
+        if self.technician_id:
+            self.keys.append(('technician', self.technician_id))
+        resume = parse_datetime(last_event_id) if last_event_id else None
+        # events at or before the connection (or the browser's Last-Event-ID) are never sent
+        self.floor = resume if resume and timezone.is_aware(resume) else timezone.now()
+        self.cursor = self.floor
+        self.seen = OrderedDict()
+        self.mine = Q(customer_id=self.customer_id) if self.customer_id else Q()
+        if self.technician_id:
+            self.mine |= Q(assigned_technician_id=self.technician_id)
+        # appointment id -> status last shown: the open appointments as of the floor, None for rows changed after
+        # it (a resumed stream sends their current status once); appointments closed by then are left out
+        self.statuses = {}
+        if self.mine:
+            rows = Appointment.objects.filter(
+                self.mine, Q(status__in=Appointment.ACTIVE_STATUSES) | Q(updated_at__gt=self.floor))
+            for pk, status, updated_at in rows.values_list('id', 'status', 'updated_at'):
+                self.statuses[str(pk)] = status if updated_at <= self.floor else None
+
+    def accept(self, event):
+        """True the first time an event is offered; advances the resume cursor"""
+        if event['at'] <= self.floor or event['key'] in self.seen:
+            return False
+        self.seen[event['key']] = True
+        if len(self.seen) > SEEN_LIMIT:
+            self.seen.popitem(last=False)
+        self.cursor = max(self.cursor, event['at'])
+        if event['event'] == 'appointment':
+            self.statuses[event['data']['id']] = event['data']['status']
+        return True
+
+    def status_changed(self, row):
+        """Whether a polled appointment row carries a status this stream has not sent"""
+        pk = str(row['id'])
+        if pk in self.statuses:
+            return self.statuses[pk] != row['status']
+        return row['created_at'] > self.floor  # booked since; otherwise it was closed before the stream began
+
+    def poll(self):
+        """Events newer than the cursor (minus an overlap) from the database, oldest first"""
+        from .models import Appointment, Notification
+
+        since = max(self.cursor - POLL_OVERLAP, self.floor)
+        events = [notification_event(row) for row in Notification.objects.filter(
+            user_id=self.user_id, created_at__gt=since).order_by('created_at').values(*NOTIFICATION_FIELDS)[:100]]
+        if self.mine:
+            # other updates (notes, costs, reassignment) move updated_at too; only status changes are events
+            events += [appointment_event(row) for row in Appointment.objects.filter(
+                self.mine, updated_at__gt=since).order_by('updated_at').values(*APPOINTMENT_POLL_FIELDS)[:100]
+                if self.status_changed(row)]
+        events.sort(key=lambda event: event['at'])
+        return [event for event in events if self.accept(event)]
+
+
+def event_stream_response(chunks):
+    response = StreamingHttpResponse(chunks, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through instead of buffering them
+    return response
+
+
+def stream(listener):
+    """Sync event-stream generator (WSGI): blocks its worker thread between events"""
+    poll_every = _setting('SSE_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+    heartbeat = _setting('SSE_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    ends = time.monotonic() + _setting('SSE_MAX_SECONDS', DEFAULT_MAX_SECONDS)
+    subscription = Subscription(listener.keys)
+    hub.subscribe(subscription)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        for event in listener.poll():
+            yield encode(event)
+        next_poll = time.monotonic() + poll_every if poll_every else None
+        while (now := time.monotonic()) < ends:
+            wait = min(heartbeat, ends - now, *([max(next_poll - now, 0)] if next_poll else []))
+            event = subscription.get(timeout=wait)
+            if event is not None:
+                if listener.accept(event):
+                    yield encode(event)
+                continue
+            if next_poll and time.monotonic() >= next_poll:
+                events = listener.poll()
+                # a stream lives for minutes: do not keep its connection open (or stale) in between
+                close_old_connections()
+                next_poll = time.monotonic() + poll_every
+                for event in events:
+                    yield encode(event)
+                if events:
+                    continue
+            yield ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def astream(listener, poll):
+    """Async event-stream generator (ASGI); ``poll`` is ``listener.poll`` wrapped for async use"""
+    poll_every = _setting('SSE_POLL_SECONDS', DEFAULT_POLL_SECONDS)
+    heartbeat = _setting('SSE_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    ends = time.monotonic() + _setting('SSE_MAX_SECONDS', DEFAULT_MAX_SECONDS)
+    subscription = Subscription(listener.keys, loop=asyncio.get_running_loop())
+    hub.subscribe(subscription)
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        for event in await poll():
+            yield encode(event)
+        next_poll = time.monotonic() + poll_every if poll_every else None
+        while (now := time.monotonic()) < ends:
+            wait = min(heartbeat, ends - now, *([max(next_poll - now, 0)] if next_poll else []))
+            event = await subscription.aget(timeout=wait)
+            if event is not None:
+                if listener.accept(event):
+                    yield encode(event)
+                continue
+            if next_poll and time.monotonic() >= next_poll:
+                events = await poll()
+                next_poll = time.monotonic() + poll_every
+                for event in events:
+                    yield encode(event)
+                if events:
+                    continue
+            yield ': keep-alive\n\n'
+    finally:
+        hub.unsubscribe(subscription)
@@ -0,0 +1,183 @@
+"""
+Streaming CSV / JSONL exports of appointments, revenue and reviews.
+
+Each export is a single ``values_list`` query: the related service type,
+facility, vehicle, customer and technician columns come from JOINs, not from
+per-row lookups or model instances. Rows are fetched with
+``iterator(chunk_size=EXPORT_CHUNK_SIZE)`` (a server-side cursor on
+PostgreSQL) and encoded one at a time, so the manager endpoints
+(``StreamingHttpResponse``) and ``manage.py export_data`` use the same flat
+amount of memory for a hundred rows or millions.
+
+Filters: an inclusive date range (the appointment's scheduled date, the
+completion date for revenue, the submission date for reviews), a facility
+and one or more statuses (the appointment status, or the payment status for
+revenue).
+
+CSV cells holding user text that starts like a formula (``=``, ``+``, ``-``,
+``@``) are prefixed with ``'`` so spreadsheets show them as text; JSONL keeps
+the values as stored.
+"""
+import csv
+import uuid
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Appointment, Payment, Review
+
+DEFAULT_CHUNK_SIZE = 2000
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+# queryset: the rows exported; columns: (header, lookup); date_field: filtered by the date range (is_datetime when
+# it is a DateTimeField); facility_field / status_field: None when the export cannot be filtered that way
+Export = namedtuple('Export', ['queryset', 'columns', 'ordering', 'date_field', 'is_datetime', 'facility_field',
+                               'status_field', 'statuses'])
+
+EXPORTS = {
+    'appointments': Export(
+        queryset=lambda: Appointment.objects.all(),
+        columns=(
+            ('id', 'id'), ('scheduled_date', 'scheduled_date'), ('scheduled_time', 'scheduled_time'),
+            ('status', 'status'), ('facility', 'service_type__facility__name'), ('service', 'service_type__name'),
+            ('duration_minutes', 'service_type__duration_minutes'), ('price', 'service_type__price'),
+            ('customer', 'customer__base_user__user__username'), ('customer_email', 'customer__base_user__user__email'),
+            ('vin', 'vehicle__vin'), ('license_plate', 'vehicle__license_plate'), ('make', 'vehicle__make'),
+            ('model', 'vehicle__model'), ('technician', 'assigned_technician__base_user__user__username'),
+            ('actual_start_time', 'actual_start_time'), ('actual_end_time', 'actual_end_time'),
+            ('estimated_cost', 'estimated_cost'), ('final_cost', 'final_cost'),
+        ),
+        ordering=('scheduled_date', 'scheduled_time', 'id'),
+        date_field='scheduled_date', is_datetime=False, facility_field='service_type__facility_id',
+        status_field='status', statuses=[code for code, _ in Appointment.STATUS_CHOICES],
+    ),
+    'revenue': Export(
+        queryset=lambda: Appointment.objects.filter(status='COMPLETED'),
+        columns=(
+            ('appointment_id', 'id'), ('completed_at', 'actual_end_time'), ('facility', 'service_type__facility__name'),
+            ('service', 'service_type__name'), ('customer', 'customer__base_user__user__username'),
+            ('vin', 'vehicle__vin'), ('technician', 'assigned_technician__base_user__user__username'),
+            ('list_price', 'service_type__price'), ('final_cost', 'final_cost'), ('payment_amount', 'payment__amount'),
+            ('payment_method', 'payment__payment_method'), ('payment_status', 'payment__status'),
+            ('paid_at', 'payment__payment_date'),
+        ),
+        ordering=('actual_end_time', 'id'),
+        date_field='actual_end_time', is_datetime=True, facility_field='service_type__facility_id',
+        status_field='payment__status', statuses=[code for code, _ in Payment.PAYMENT_STATUS],
+    ),
+    'reviews': Export(
+        queryset=lambda: Review.objects.all(),
+        columns=(
+            ('id', 'id'), ('submitted_at', 'created_at'), ('appointment_id', 'appointment_id'),
+            ('scheduled_date', 'appointment__scheduled_date'),
+            ('facility', 'appointment__service_type__facility__name'), ('service', 'appointment__service_type__name'),
+            ('customer', 'appointment__customer__base_user__user__username'),
+            ('technician', 'appointment__assigned_technician__base_user__user__username'), ('rating', 'rating'),
+            ('comment', 'comment'), ('technician_rating', 'technician_rating'),
+            ('technician_comment', 'technician_comment'),
+        ),
+        ordering=('created_at', 'id'),
+        date_field='created_at', is_datetime=True, facility_field='appointment__service_type__facility_id',
+        status_field=None, statuses=[],
+    ),
+}
+
+
+class ExportError(ValueError):
+    """Invalid export request; the message is meant for the user"""
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def _day(value, name):
+    if isinstance(value, date) or not value:
+        return value or None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f'{name} must be a date (YYYY-MM-DD).')
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
+
+
+def export_queryset(kind, start=None, end=None, facility=None, statuses=None):
+    """The ``values_list`` rows of export ``kind`` filtered by an inclusive date range, facility and statuses"""
+    if kind not in EXPORTS:
+        raise ExportError(f'Unknown export {kind!r}; choose one of {", ".join(EXPORTS)}.')
+    export = EXPORTS[kind]
+    start, end = _day(start, 'from'), _day(end, 'to')
+    rows = export.queryset()
+    if start and end and start > end:
+        raise ExportError('from must not be after to.')
+    if export.is_datetime:
+        # whole local days as a datetime range, which an index on the column can serve
+        if start:
+            rows = rows.filter(**{f'{export.date_field}__gte': _midnight(start)})
+        if end:
+            rows = rows.filter(**{f'{export.date_field}__lt': _midnight(end + timedelta(days=1))})
+    else:
+        if start:
+            rows = rows.filter(**{f'{export.date_field}__gte': start})
+        if end:
+            rows = rows.filter(**{f'{export.date_field}__lte': end})
+    if facility:
+        try:
+            rows = rows.filter(**{export.facility_field: uuid.UUID(str(facility))})
+        except ValueError:
+            raise ExportError('facility must be a facility id.')
+    statuses = [status for status in statuses or [] if status]
+    if statuses:
+        if export.status_field is None:
+            raise ExportError(f'The {kind} export cannot be filtered by status.')
+        unknown = set(statuses) - set(export.statuses)
+        if unknown:
+            raise ExportError(f'Unknown status {", ".join(sorted(unknown))}; choose from {", ".join(export.statuses)}.')
+        rows = rows.filter(**{f'{export.status_field}__in': statuses})
+    return rows.order_by(*export.ordering).values_list(*(lookup for _, lookup in export.columns))
+
+
+class _Echo:
+    """File-like object whose write() returns the line, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+def _localize(value):
+    return timezone.localtime(value) if isinstance(value, datetime) and timezone.is_aware(value) else value
+
+
+def _csv_cell(value):
+    """Text a spreadsheet would evaluate as a formula, quoted; numbers and dates stay as they are"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return _localize(value)
+
+
+def csv_lines(kind, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in EXPORTS[kind].columns])
+    for row in rows.iterator(chunk_size=chunk_size()):
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def jsonl_lines(kind, rows):
+    headers = [header for header, _ in EXPORTS[kind].columns]
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows.iterator(chunk_size=chunk_size()):
+        yield encoder.encode(dict(zip(headers, map(_localize, row)))) + '\n'
+
+
+def export_lines(kind, rows, fmt):
+    """Encoded lines of ``rows`` (from ``export_queryset``) in ``fmt`` ('csv' or 'jsonl')"""
+    if fmt not in FORMATS:
+        raise ExportError(f'format must be one of {", ".join(FORMATS)}.')
+    return csv_lines(kind, rows) if fmt == 'csv' else jsonl_lines(kind, rows)
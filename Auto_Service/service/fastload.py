@@ -0,0 +1,253 @@
+"""
+Bulk fixture loading (``manage.py fast_loaddata``).
+
+``loaddata`` saves every object on its own: one or two statements per row,
+plus a pre_save / post_save round through the signal handlers in models.py.
+``load_fixtures`` reads the same JSON (or JSON lines, optionally gzipped)
+fixtures and:
+
+* parses the file incrementally, so a multi-hundred-megabyte snapshot is never
+  held in memory as a whole;
+* buffers objects per model and writes them with one ``bulk_create`` per
+  model and batch, in dependency order (foreign keys first), upserting rows
+  whose primary key already exists the way ``loaddata`` overwrites them;
+* sends no model signals, like ``loaddata``'s raw saves: the receivers in
+  models.py skip raw saves, so derived rows (schedules, analytics, counters)
+  come from the fixture itself; ``--rebuild`` recomputes the aggregates;
+* still validates the models whose ``save()`` runs ``full_clean`` (schedules,
+  closures, technician availability), a whole batch at a time and without the
+  per-row queries: fields column by column, then ``clean()``; uniqueness and
+  foreign keys are checked by the database constraints when the single
+  transaction commits.
+
+Natural foreign keys must point at rows that already exist or were written by
+an earlier batch; use ``loaddata`` for fixtures that forward-reference them.
+"""
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.core.serializers import base
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+DEFAULT_BATCH_SIZE = 5000
+READ_CHUNK = 1 << 20
+# models whose save() runs full_clean(); loaddata's raw saves skip it, these loads keep the check
+VALIDATED_MODELS = {'service.Schedule', 'service.FacilityClosure', 'service.TechnicianAvailability'}
+
+
+class FixtureError(Exception):
+    """The fixture cannot be loaded; nothing has been written"""
+
+
+def fixture_path(label):
+    """Resolve a path or a fixture name (``populate``) the way loaddata looks in the apps' fixtures/ dirs"""
+    if os.path.isfile(label):
+        return label
+    directories = [str(d) for d in settings.FIXTURE_DIRS]
+    directories += [os.path.join(config.path, 'fixtures') for config in apps.get_app_configs()]
+    for directory in directories:
+        for suffix in ('', '.json', '.jsonl', '.json.gz', '.jsonl.gz'):
+            path = os.path.join(directory, label + suffix)
+            if os.path.isfile(path):
+                return path
+    raise FixtureError(f'No fixture named {label!r} found.')
+
+
+def iter_objects(stream):
+    """Objects of a JSON array or of JSON lines, decoded ``READ_CHUNK`` characters at a time"""
+    decoder = json.JSONDecoder()
+    buffer, pos, in_array, started = '', 0, False, False
+    while True:
+        while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ',')):
+            pos += 1
+        if pos < len(buffer):
+            char = buffer[pos]
+            if char == '[' and not started:
+                in_array, started, pos = True, True, pos + 1
+                continue
+            if char == ']' and in_array:
+                return
+            if char != '{':
+                raise FixtureError(f'Unexpected {char!r} in fixture.')
+            started = True
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                pass  # the object runs past the buffer
+            else:
+                yield obj
+                continue
+        more = stream.read(READ_CHUNK)
+        if not more:
+            if buffer[pos:].strip():
+                raise FixtureError('Fixture is not valid JSON or ends in the middle of an object.')
+            return
+        buffer, pos = buffer[pos:] + more, 0
+
+
+def _open(path):
+    return gzip.open(path, 'rt', encoding='utf-8') if path.endswith('.gz') else open(path, encoding='utf-8')
+
+
+def dependency_order():
+    """Every installed model, each after the models its foreign keys point to (cycles broken by name)"""
+    all_models = sorted(apps.get_models(include_auto_created=True), key=lambda m: m._meta.label)
+    depends = {
+        model: {field.related_model for field in model._meta.concrete_fields
+                if field.is_relation and field.related_model not in (None, model)}
+        for model in all_models
+    }
+    ordered, placed = [], set()
+    while len(ordered) < len(all_models):
+        ready = [m for m in all_models if m not in placed and depends[m] <= placed]
+        for model in ready or [next(m for m in all_models if m not in placed)]:
+            ordered.append(model)
+            placed.add(model)
+    return {model: rank for rank, model in enumerate(ordered)}
+
+
+def check_rows(model, instances):
+    """``[(pk, message)]`` for the rows ``full_clean`` would reject, without its per-row queries.
+
+    Field by field over the batch: nullability, choices, length and validators, then the model's
+    ``clean()``. Uniqueness and foreign keys are left to the database constraints.
+    """
+    errors = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        choices = {value for value, _ in field.flatchoices} if field.choices else None
+        for obj in instances:
+            value = getattr(obj, field.attname)
+            if value is None:
+                if not field.null:
+                    errors.append((obj.pk, f'{field.name} may not be null'))
+                continue
+            if choices is not None and value not in choices:
+                errors.append((obj.pk, f'{field.name}: {value!r} is not a valid choice'))
+                continue
+            try:
+                field.run_validators(value)
+            except ValidationError as exc:
+                errors.append((obj.pk, f'{field.name}: {"; ".join(exc.messages)}'))
+    for obj in instances:
+        try:
+            obj.clean()
+        except ValidationError as exc:
+            errors.append((obj.pk, '; '.join(exc.messages)))
+    return errors
+
+
+@contextmanager
+def _fixture_timestamps(model):
+    """Insert auto_now / auto_now_add fields as given in the fixture, as raw saves do"""
+    fields = [f for f in model._meta.concrete_fields
+              if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _write(model, objects, using, batch_size):
+    instances = [obj.object for obj in objects]
+    errors = check_rows(model, instances) if model._meta.label in VALIDATED_MODELS else []
+    if errors:
+        shown = '\n'.join(f'  {model._meta.label} {pk}: {message}' for pk, message in errors[:20])
+        raise FixtureError(f'{len(errors)} invalid row(s):\n{shown}')
+    pk = model._meta.pk
+    update_fields = [f.name for f in model._meta.local_concrete_fields if not f.primary_key]
+    with _fixture_timestamps(model):
+        if update_fields:
+            model._base_manager.using(using).bulk_create(instances, batch_size=batch_size, update_conflicts=True,
+                                                         unique_fields=[pk.name], update_fields=update_fields)
+        else:
+            model._base_manager.using(using).bulk_create(instances, batch_size=batch_size, ignore_conflicts=True)
+
+    # many-to-many values replace the current ones, as loaddata's save does
+    m2m = defaultdict(list)
+    for obj in objects:
+        for name, values in (obj.m2m_data or {}).items():
+            m2m[name].append((obj.object.pk, values))
+    for name, rows in m2m.items():
+        field = model._meta.get_field(name)
+        through = field.remote_field.through
+        source, target = f'{field.m2m_field_name()}_id', f'{field.m2m_reverse_field_name()}_id'
+        through._base_manager.using(using).filter(**{f'{source}__in': [pk for pk, _ in rows]}).delete()
+        through._base_manager.using(using).bulk_create(
+            [through(**{source: pk, target: value}) for pk, values in rows for value in values],
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+
+
+def load_fixtures(paths, using=DEFAULT_DB_ALIAS, batch_size=DEFAULT_BATCH_SIZE, ignorenonexistent=False):
+    """Load every fixture file in one transaction; returns ``Counter({model: rows})``"""
+    connection = connections[using]
+    rank = dependency_order()
+    loaded = Counter()
+    buffers, buffered = defaultdict(list), 0
+
+    def flush():
+        for model in sorted(buffers, key=rank.get):
+            _write(model, buffers[model], using, batch_size)
+            loaded[model] += len(buffers[model])
+        buffers.clear()
+
+    try:
+        with transaction.atomic(using=using):
+            with connection.constraint_checks_disabled():
+                for path in paths:
+                    with _open(path) as stream:
+                        for obj in PythonDeserializer(iter_objects(stream), using=using,
+                                                      ignorenonexistent=ignorenonexistent):
+                            buffers[type(obj.object)].append(obj)
+                            buffered += 1
+                            if buffered >= batch_size:
+                                flush()
+                                buffered = 0
+                flush()
+            connection.check_constraints(table_names=[model._meta.db_table for model in loaded])
+            sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(loaded))
+            if sequence_sql:
+                with connection.cursor() as cursor:
+                    for line in sequence_sql:
+                        cursor.execute(line)
+            _check_tables(loaded, using)
+    except (base.DeserializationError, ValidationError, IntegrityError) as exc:
+        raise FixtureError(str(exc)) from exc
+    _after_load(loaded)
+    return loaded
+
+
+def _check_tables(loaded, using):
+    """Rules the models' save() enforce across rows"""
+    from .models import RepairShop
+
+    if RepairShop in loaded and RepairShop._base_manager.using(using).count() > 1:
+        raise FixtureError('Only one repair shop instance can exist.')
+
+
+def _after_load(loaded):
+    """Retire the caches the skipped signal handlers would have invalidated"""
+    from . import assignment, slots
+    from .models import Appointment, BaseUser, Employee, Facility, FacilityClosure, RepairShop, Schedule, ServiceType
+
+    if RepairShop in loaded:
+        RepairShop.clear_cache()
+    if loaded.keys() & {BaseUser, ServiceType, Employee, Employee.specializations.through}:
+        assignment.invalidate_index()
+    if loaded.keys() & {Appointment, Facility, FacilityClosure, Schedule, ServiceType}:
+        for facility_id in Facility.objects.values_list('pk', flat=True):
+            slots.invalidate_facility(facility_id)
@@ -35,7 +35,7 @@ class AppointmentForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Only show active services
-        self.fields['service_type'].queryset = ServiceType.objects.all()
+        self.fields['service_type'].queryset = ServiceType.objects.select_related('facility')
         # Add Bootstrap classes
         for field in self.fields:
             self.fields[field].widget.attrs['class'] = 'form-control'
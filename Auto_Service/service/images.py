@@ -0,0 +1,174 @@
+"""
+Resized WebP/JPEG derivatives of static images and uploads.
+
+Pages used to ship multi-megabyte originals (hero-bg.png, Audi_*.png,
+uploaded vehicle photos) into slots a few hundred pixels wide. For a source
+image ``derivatives_for`` returns variants at ``IMAGE_DERIVATIVE_WIDTHS``
+(never upscaled), generating them on first use and caching them under
+``MEDIA_ROOT/derivatives/``. Derivative names are keyed by the source's
+content hash (content-addressed uploads) or path/mtime/size (static and
+legacy files), so a changed source never serves stale variants.
+``{% responsive_image %}`` and ``{% derivative_url %}`` in service_extras
+render the result; ``manage.py build_image_derivatives`` pre-builds them.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .storage import is_blob
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_DIR = 'derivatives'
+# EXIF orientations that rotate the picture by 90 degrees
+ROTATED = {5, 6, 7, 8}
+DEFAULT_WIDTHS = (320, 640, 1024, 1600)
+# extension -> (Pillow format, MIME type, save options)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# (source path, media root) -> (mtime, size, Derivatives); avoids re-reading headers on every render
+_cache = {}
+
+
+class Derivatives:
+    """The variants of one source image, per format, smallest first"""
+
+    def __init__(self, key, width, height, widths):
+        self.key = key
+        self.width = width
+        self.height = height
+        self.widths = widths
+
+    def name(self, width, ext):
+        return f'{DERIVATIVE_DIR}/{self.key[:2]}/{self.key}-{width}w.{ext}'
+
+    def storage_path(self, width, ext):
+        return default_storage.path(self.name(width, ext))
+
+    def url(self, width, ext):
+        return default_storage.url(self.name(width, ext))
+
+    def srcset(self, ext):
+        return ', '.join(f'{self.url(width, ext)} {width}w' for width in self.widths)
+
+    def closest(self, width):
+        """The smallest variant at least ``width`` pixels wide (or the largest one)"""
+        return next((w for w in self.widths if w >= width), self.widths[-1])
+
+    def missing(self):
+        return [(width, ext) for width in self.widths for ext in FORMATS
+                if not os.path.exists(self.storage_path(width, ext))]
+
+
+def derivative_widths(width):
+    configured = sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', DEFAULT_WIDTHS))
+    widths = [w for w in configured if w < width]
+    # the source itself (capped at the largest configured width) is always the top variant
+    widths.append(min(width, configured[-1]))
+    return widths
+
+
+def source_path(source):
+    """Absolute path of a static path string or a FieldFile; None when it cannot be found"""
+    if not source:
+        return None
+    if isinstance(source, str):
+        return finders.find(source)
+    try:
+        return source.path
+    except (NotImplementedError, ValueError):
+        return None
+
+
+def _source_key(source, path, stat):
+    name = getattr(source, 'name', None)
+    if is_blob(name):
+        # content-addressed upload: the file name already is the SHA-256 of its bytes
+        return os.path.splitext(os.path.basename(name))[0]
+    return hashlib.sha256(f'{path}:{stat.st_mtime_ns}:{stat.st_size}'.encode()).hexdigest()
+
+
+def _write(image, path, ext):
+    fmt, _, options = FORMATS[ext]
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            image.save(fh, fmt, **options)
+        # mkstemp creates 0600 files; match what the storage gives uploads
+        os.chmod(tmp_path, default_storage.file_permissions_mode or 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def build(derivatives, path, missing=None):
+    """Generate the missing variants of ``derivatives`` from the source at ``path``"""
+    missing = derivatives.missing() if missing is None else missing
+    if not missing:
+        return 0
+    with Image.open(path) as opened:
+        original = ImageOps.exif_transpose(opened)
+        for width in sorted({w for w, _ in missing}, reverse=True):
+            height = max(1, round(original.height * width / original.width))
+            resized = original if width == original.width else original.resize((width, height), Image.LANCZOS)
+            for w, ext in missing:
+                if w == width:
+                    _write(resized, derivatives.storage_path(width, ext), ext)
+    return len(missing)
+
+
+def derivatives_for(source, create=True):
+    """``Derivatives`` for a static path or FieldFile, building missing files unless ``create`` is False.
+
+    Returns None when the source is missing or is not a readable image.
+    """
+    path = source_path(source)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+        cache_key = (path, default_storage.location)
+        cached = _cache.get(cache_key)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        with Image.open(path) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in ROTATED:
+                width, height = height, width
+        derivatives = Derivatives(_source_key(source, path, stat), width, height, derivative_widths(width))
+        if not create:
+            return derivatives
+        build(derivatives, path)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        logger.warning('Cannot build image derivatives for %s: %s', path, exc)
+        return None
+    _cache[cache_key] = (stat.st_mtime_ns, stat.st_size, derivatives)
+    return derivatives
+
+
+def delete_derivatives(blob_name):
+    """Remove the cached variants of a content-addressed blob"""
+    key = os.path.splitext(os.path.basename(blob_name))[0]
+    directory = default_storage.path(f'{DERIVATIVE_DIR}/{key[:2]}')
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if filename.startswith(f'{key}-'):
+            os.remove(os.path.join(directory, filename))
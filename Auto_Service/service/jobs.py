@@ -0,0 +1,208 @@
+"""
+Background jobs stored in the application database.
+
+``enqueue`` inserts a ``Job`` row naming a task registered with ``@task``
+(service/tasks.py). ``manage.py run_worker`` claims due jobs with a lease:
+candidates are read, then taken with one conditional UPDATE that only
+matches rows still unclaimed (or whose lease expired, i.e. a worker died),
+so several workers can poll the same table without a broker and without
+running a job twice. Claimed jobs run in a process pool; the worker renews
+their leases every third of a lease while they run, so a long task (an
+analytics rebuild, a maintenance scan, an archive run) is not claimed again
+by another worker. Failures are retried with exponential backoff until
+``max_attempts``. ``JobSchedule`` rows
+(synced from ``settings.JOB_SCHEDULES``) enqueue recurring jobs, and the same
+conditional-UPDATE trick lets exactly one worker fire each occurrence.
+"""
+import logging
+import random
+import threading
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .audit import event_batch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_RETRY_BASE_SECONDS = 30
+DEFAULT_RETRY_MAX_SECONDS = 3600
+
+TASKS = {}
+
+
+def task(name):
+    """Register a function as a job task; its payload is passed as keyword arguments"""
+    def register(func):
+        TASKS[name] = func
+        return func
+    return register
+
+
+def get_task(name):
+    from . import tasks  # noqa: F401 (registers the built-in tasks)
+    return TASKS[name]
+
+
+def enqueue(task_name, payload=None, run_at=None, delay=None, priority=0, max_attempts=5):
+    """Queue ``task_name``; the row commits with the surrounding transaction, so workers never see it early"""
+    from .models import Job
+
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(task=task_name, payload=payload or {}, run_at=run_at, priority=priority,
+                              max_attempts=max_attempts)
+
+
+def retry_delay(attempts):
+    """Seconds before retry number ``attempts``: exponential, capped, with jitter against thundering herds"""
+    base = getattr(settings, 'JOB_RETRY_BASE_SECONDS', DEFAULT_RETRY_BASE_SECONDS)
+    cap = getattr(settings, 'JOB_RETRY_MAX_SECONDS', DEFAULT_RETRY_MAX_SECONDS)
+    return min(base * 2 ** max(attempts - 1, 0), cap) * random.uniform(0.8, 1.2)
+
+
+def lease_length(value=None):
+    """``value`` (e.g. ``--lease-seconds``) or the configured lease length"""
+    return value or getattr(settings, 'JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+
+
+def _claimable(now):
+    return Q(status='QUEUED', run_at__lte=now) | Q(status='RUNNING', locked_until__lt=now)
+
+
+def claim(worker, limit, lease_seconds=None):
+    """Lease up to ``limit`` due jobs to ``worker``; returns the claimed ``Job`` rows"""
+    from .models import Job
+
+    now = timezone.now()
+    lease = lease_length(lease_seconds)
+    candidates = list(Job.objects.filter(_claimable(now)).order_by('-priority', 'run_at')
+                      .values_list('id', flat=True)[:limit])
+    if not candidates:
+        return []
+    token = f'{worker}:{uuid.uuid4().hex[:12]}'
+    # The WHERE clause repeats the claimable test, so rows another worker took in between are skipped
+    Job.objects.filter(_claimable(now), id__in=candidates).update(
+        status='RUNNING', locked_by=token, locked_until=now + timedelta(seconds=lease),
+        attempts=F('attempts') + 1, updated_at=now,
+    )
+    return list(Job.objects.filter(locked_by=token, status='RUNNING').order_by('-priority', 'run_at'))
+
+
+def renew(claimed, lease=None):
+    """Push the leases of the ``claimed`` jobs this worker still holds a full lease ahead; returns how many.
+
+    A job another worker took over (its lease had expired) carries a new token and is left alone.
+    """
+    from .models import Job
+
+    claimed = list(claimed)
+    if not claimed:
+        return 0
+    now = timezone.now()
+    renewed = Job.objects.filter(
+        id__in=[job.id for job in claimed], locked_by__in={job.locked_by for job in claimed}, status='RUNNING',
+    ).update(locked_until=now + timedelta(seconds=lease_length(lease)), updated_at=now)
+    if renewed < len(claimed):
+        logger.warning('%d running job(s) lost their lease to another worker', len(claimed) - renewed)
+    return renewed
+
+
+@contextmanager
+def heartbeat(claimed, lease=None):
+    """Renew the leases of ``claimed`` from a background thread while the block runs the jobs inline"""
+    interval = lease_length(lease) / 3
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(interval):
+                renew(claimed, lease)
+        finally:
+            connection.close()  # the thread's own connection
+
+    thread = threading.Thread(target=beat, name='job-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def execute(task_name, payload):
+    """Run one task (in a pool process or inline); returns None or the formatted traceback"""
+    close_old_connections()
+    try:
+        with event_batch():
+            get_task(task_name)(**payload)
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        close_old_connections()
+    return None
+
+
+def finish(job, error=None):
+    """Record the outcome of a claimed job; a worker that lost its lease does not overwrite the new owner"""
+    from .models import Job
+
+    now = timezone.now()
+    owned = Job.objects.filter(id=job.id, locked_by=job.locked_by, status='RUNNING')
+    if error is None:
+        updated = owned.update(status='SUCCEEDED', finished_at=now, locked_until=None, last_error='',
+                               updated_at=now)
+    elif job.attempts >= job.max_attempts:
+        logger.error('Job %s (%s) failed permanently after %d attempts', job.id, job.task, job.attempts)
+        updated = owned.update(status='FAILED', finished_at=now, locked_until=None, last_error=error,
+                               updated_at=now)
+    else:
+        run_at = now + timedelta(seconds=retry_delay(job.attempts))
+        logger.warning('Job %s (%s) failed, retrying at %s', job.id, job.task, run_at)
+        updated = owned.update(status='QUEUED', run_at=run_at, locked_until=None, last_error=error,
+                               updated_at=now)
+    return bool(updated)
+
+
+def sync_schedules():
+    """Create / update / deactivate ``JobSchedule`` rows to match ``settings.JOB_SCHEDULES``"""
+    from .models import JobSchedule
+
+    configured = getattr(settings, 'JOB_SCHEDULES', {})
+    existing = {schedule.name: schedule for schedule in JobSchedule.objects.all()}
+    for name, spec in configured.items():
+        values = {'task': spec['task'], 'payload': spec.get('payload', {}),
+                  'interval_seconds': spec['interval'], 'is_active': True}
+        schedule = existing.get(name)
+        if schedule is None:
+            JobSchedule.objects.create(name=name, **values)
+        elif any(getattr(schedule, field) != value for field, value in values.items()):
+            JobSchedule.objects.filter(pk=schedule.pk).update(updated_at=timezone.now(), **values)
+    JobSchedule.objects.exclude(name__in=configured).filter(is_active=True).update(is_active=False)
+
+
+def enqueue_due_schedules():
+    """Enqueue one job per due schedule; returns how many were enqueued"""
+    from .models import JobSchedule
+
+    now = timezone.now()
+    enqueued = 0
+    for schedule in JobSchedule.objects.filter(is_active=True, next_run_at__lte=now):
+        next_run = schedule.next_run_at + timedelta(seconds=schedule.interval_seconds)
+        if next_run <= now:
+            # skip occurrences missed while no worker was running instead of replaying them all
+            next_run = now + timedelta(seconds=schedule.interval_seconds)
+        with transaction.atomic():
+            advanced = JobSchedule.objects.filter(pk=schedule.pk, next_run_at=schedule.next_run_at).update(
+                next_run_at=next_run, updated_at=now)
+            if advanced:
+                enqueue(schedule.task, schedule.payload)
+                enqueued += 1
+    return enqueued
@@ -0,0 +1,128 @@
+"""
+Maintenance-due dates and reminders.
+
+A service type with ``maintenance_interval_months`` is due again that many
+months after a vehicle last had it (its latest completed appointment).
+``compute_maintenance_due`` streams the whole fleet in chunks of vehicles with
+``iterator()`` so memory stays bounded however many vehicles there are; per
+chunk it reads the completed interval-bearing appointments with one query,
+writes the changed ``Vehicle.next_maintenance_date`` values (the earliest due
+service) with one UPDATE per distinct date and sends MAINTENANCE_DUE notifications for the
+services due within ``MAINTENANCE_REMINDER_DAYS``. A reminder points at the
+appointment whose interval ran out. Handled (appointment, due date) pairs are
+recorded in ``MaintenanceReminderLog`` (unique on the pair, inserted with
+``ignore_conflicts`` like ``ReminderLog``), so each service visit is reminded
+about at most once however often the job runs, even after the owner dismisses
+the notification. Runs daily from the job queue (``JOB_SCHEDULES``) or via
+``manage.py compute_maintenance_due``.
+"""
+import calendar
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+DEFAULT_REMINDER_DAYS = 14
+
+
+def add_months(day, months):
+    """``day`` moved ``months`` calendar months ahead, clamped to the end of shorter months"""
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def due_services(vehicle_ids):
+    """``{vehicle_id: [(due date, service name, appointment id), ...]}`` from the latest visit per service"""
+    from .models import Appointment
+
+    latest = {}
+    for vehicle_id, service_type_id, appointment_id, served, name, interval in (
+        Appointment.objects.filter(vehicle_id__in=vehicle_ids, status='COMPLETED',
+                                   service_type__maintenance_interval_months__isnull=False)
+        .annotate(served=Coalesce(TruncDate('actual_end_time'), 'scheduled_date'))
+        .order_by('served', 'id')
+        .values_list('vehicle_id', 'service_type_id', 'id', 'served', 'service_type__name',
+                     'service_type__maintenance_interval_months')
+    ):
+        # ascending order: the last row seen per vehicle and service is the latest visit
+        latest[vehicle_id, service_type_id] = (add_months(served, interval), name, appointment_id)
+    due = {}
+    for (vehicle_id, _), service in latest.items():
+        due.setdefault(vehicle_id, []).append(service)
+    return due
+
+
+def compute_maintenance_due(batch_size=1000, today=None, dry_run=False):
+    """Refresh every vehicle's next maintenance date and notify owners; returns ``(dates changed, notified)``"""
+    from .models import MaintenanceReminderLog, Notification, Vehicle
+    from .notifications import bulk_notify
+
+    today = today or timezone.localdate()
+    horizon = today + timedelta(days=getattr(settings, 'MAINTENANCE_REMINDER_DAYS', DEFAULT_REMINDER_DAYS))
+    vehicles = Vehicle.objects.order_by('pk').values_list(
+        'id', 'owner__base_user_id', 'next_maintenance_date', 'make', 'model', 'license_plate',
+    ).iterator(chunk_size=batch_size)
+
+    changed = notified = 0
+    for chunk in _chunks(vehicles, batch_size):
+        due = due_services([row[0] for row in chunk])
+        reminders = {}
+        updates = defaultdict(list)
+        for vehicle_id, user_id, current, make, model, plate in chunk:
+            services = due.get(vehicle_id, [])
+            next_date = min((date for date, _, _ in services), default=None)
+            if next_date != current:
+                updates[next_date].append(vehicle_id)
+            for date, name, appointment_id in services:
+                if date <= horizon:
+                    reminders[appointment_id] = (date, Notification(
+                        user_id=user_id, type='MAINTENANCE_DUE', title=f'{name} due',
+                        message=(f'{name} for your {make} {model} ({plate}) is due on '
+                                 f'{date:%B} {date.day}, {date.year}.'),
+                        related_appointment_id=appointment_id,
+                    ))
+        if reminders:
+            for appointment_id, due_date in MaintenanceReminderLog.objects.filter(
+                appointment_id__in=reminders,
+            ).values_list('appointment_id', 'due_date'):
+                if reminders.get(appointment_id, (None,))[0] == due_date:
+                    del reminders[appointment_id]
+        changed += sum(len(ids) for ids in updates.values())
+        if dry_run:
+            notified += len(reminders)
+            continue
+        now = timezone.now()
+        with transaction.atomic():
+            # one UPDATE per distinct date: far cheaper to build and run than a per-row CASE bulk_update
+            for next_date, ids in updates.items():
+                Vehicle.objects.filter(id__in=ids).update(next_maintenance_date=next_date, updated_at=now)
+            if reminders:
+                claimed = _claim(reminders, batch_size)
+                notified += len(claimed)
+                bulk_notify([reminders[appointment_id][1] for appointment_id in claimed], batch_size=batch_size)
+    return changed, notified
+
+
+def _claim(reminders, batch_size):
+    """Log ``{appointment_id: (due date, notification)}``; returns the appointments this call logged first"""
+    from .models import MaintenanceReminderLog
+
+    batch = uuid.uuid4()
+    MaintenanceReminderLog.objects.bulk_create(
+        [MaintenanceReminderLog(appointment_id=appointment_id, due_date=due_date, batch=batch)
+         for appointment_id, (due_date, _) in reminders.items()],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+    return list(MaintenanceReminderLog.objects.filter(batch=batch).values_list('appointment_id', flat=True))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from service.retention import DEFAULT_CHUNK_SIZE, archive_expired, archive_root, expired_months
+
+
+class Command(BaseCommand):
+    help = ("Move EventLog months older than EVENT_LOG_RETENTION_MONTHS into gzip-compressed JSONL archives "
+            "and delete them from the table in bounded chunks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, help='Months to keep in the table (default: the setting)')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows fetched and deleted per statement')
+        parser.add_argument('--dry-run', action='store_true', help='List the months that would be archived')
+
+    def handle(self, *args, **options):
+        if options['months'] is not None and options['months'] < 1:
+            raise CommandError('Keep at least one month.')
+        if options['dry_run']:
+            months = expired_months(options['months'])
+            for month, events in months:
+                self.stdout.write(f'  {month:%Y-%m}: {events} events')
+            self.stdout.write(self.style.SUCCESS(f'Would archive {len(months)} month(s).'))
+            return
+        archives = archive_expired(options['months'], options['chunk_size'])
+        for archive in archives:
+            self.stdout.write(f'  {archive.month:%Y-%m}: {archive.rows} events -> {archive.name} ({archive.size} bytes)')
+        self.stdout.write(self.style.SUCCESS(f'Archived {len(archives)} month(s) to {archive_root()}.'))
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from service.assignment import assign_unassigned
+from service.models import Appointment
+
+
+class Command(BaseCommand):
+    help = "Assign a technician to every unassigned scheduled appointment in one pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help='First appointment date, YYYY-MM-DD (default: today)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk UPDATE statement')
+        parser.add_argument('--dry-run', action='store_true', help='Plan the assignments without saving them')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else timezone.localdate()
+        except ValueError:
+            raise CommandError('--from must be a date in YYYY-MM-DD format.')
+        assigned, left = assign_unassigned(Appointment.objects.filter(scheduled_date__gte=start),
+                                           batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {assigned} appointment(s); {left} left without a free technician.'))
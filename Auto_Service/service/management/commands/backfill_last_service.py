@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce, TruncDate
+
+from service.models import Appointment, Vehicle
+
+
+def completed_appointments():
+    return Appointment.objects.filter(vehicle=OuterRef('pk'), status='COMPLETED')
+
+
+def last_service_subquery():
+    """Date of the vehicle's latest completed appointment (end date, else scheduled date)"""
+    return Subquery(
+        completed_appointments()
+        .annotate(service_date=Coalesce(TruncDate('actual_end_time'), 'scheduled_date'))
+        .order_by('-service_date').values('service_date')[:1]
+    )
+
+
+class Command(BaseCommand):
+    help = ("Set Vehicle.last_service_date from completed appointments, one correlated-subquery UPDATE per "
+            "chunk of vehicles.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Vehicles per UPDATE statement')
+        parser.add_argument('--recompute', action='store_true',
+                            help='Recompute every vehicle, not only those without a date')
+
+    def handle(self, *args, **options):
+        vehicles = Vehicle.objects.all()
+        if not options['recompute']:
+            vehicles = vehicles.filter(last_service_date__isnull=True)
+
+        updated = 0
+        last_pk = None
+        while True:
+            # keyset pagination over the primary key keeps every chunk query cheap
+            chunk = vehicles.order_by('pk')
+            if last_pk is not None:
+                chunk = chunk.filter(pk__gt=last_pk)
+            ids = list(chunk.values_list('pk', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            last_pk = ids[-1]
+            target = Vehicle.objects.filter(pk__in=ids)
+            if not options['recompute']:
+                # re-check the condition: the signal may have set a date since the ids were read
+                target = target.filter(Exists(completed_appointments()), last_service_date__isnull=True)
+            updated += target.update(last_service_date=last_service_subquery())
+            self.stdout.write(f'  {updated} vehicle(s) updated so far')
+        self.stdout.write(self.style.SUCCESS(f'Back-filled last_service_date on {updated} vehicle(s).'))
@@ -0,0 +1,216 @@
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from service import urls
+from service.models import BaseUser
+from service.query_budget import QUERY_BUDGETS
+from service.replay import route_url
+
+from .bench_views import percentile
+
+# deployment profile -> settings module; each profile is measured in its own process
+PROFILES = {
+    'wsgi': 'Auto_Service.settings',
+    'asgi': 'Auto_Service.settings_asgi',
+}
+# read-only JSON endpoints, so repeated runs measure the same work (start / complete and marking notifications
+# read change state)
+DEFAULT_ROUTES = ('api_facility_schedule', 'api_technician_schedule', 'api_notifications')
+
+
+def _host():
+    return next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+
+
+def _targets(routes):
+    """``[(path, query, cookie)]``: each route as the first user of its budget role, with a fresh session"""
+    patterns = dict((pattern.name, pattern) for pattern in urls.urlpatterns)
+    sessions, targets = {}, []
+    for name in routes:
+        if name not in patterns:
+            raise CommandError(f'Unknown route {name}.')
+        role = QUERY_BUDGETS[name].role
+        base_user = BaseUser.objects.filter(user_type=role).select_related('user').first() if role else None
+        if role and base_user is None:
+            raise CommandError(f'No {role} user; load data first (seed_demo_data or bench_views --keep).')
+        url = route_url(name, patterns[name], base_user)
+        if url is None:
+            raise CommandError(f'No data to request {name} as {role}.')
+        if role and role not in sessions:
+            client = Client()
+            client.force_login(base_user.user)
+            sessions[role] = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+        path, _, query = url.partition('?')
+        targets.append((path, query, sessions.get(role, '')))
+    return targets
+
+
+def run_wsgi(targets, clients, requests, threads):
+    """Closed-loop clients against WSGIHandler; ``threads`` requests are served at a time (gthread workers)"""
+    from django.core.wsgi import get_wsgi_application
+
+    app = get_wsgi_application()
+    host = _host()
+    workers = threading.BoundedSemaphore(threads)
+    latencies, statuses = [], []
+
+    def call(path, query, cookie):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+            'SERVER_NAME': host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'HTTP_HOST': host,
+            'HTTP_COOKIE': cookie, 'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': io.BytesIO(b''),
+            'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http', 'wsgi.multithread': True,
+            'wsgi.multiprocess': False, 'wsgi.run_once': False, 'wsgi.version': (1, 0),
+        }
+        status = []
+        body = app(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+        try:
+            b''.join(body)
+        finally:
+            body.close()  # fires request_finished, which closes the thread's database connection
+        return status[0]
+
+    def client(index):
+        for n in range(index, requests, clients):
+            started = time.perf_counter()
+            with workers:
+                status = call(*targets[n % len(targets)])
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.append(status)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - started
+
+
+def run_asgi(targets, clients, requests):
+    """Closed-loop clients as tasks on one event loop, calling ASGIHandler"""
+    from django.core.asgi import get_asgi_application
+
+    app = get_asgi_application()
+    host = _host().encode()
+    latencies, statuses = [], []
+
+    async def call(path, query, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', host), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': (host.decode(), 80),
+        }
+        disconnected = asyncio.Event()
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # like a server: the client stays connected until the response is complete
+            await disconnected.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif not message.get('more_body'):
+                disconnected.set()
+
+        await app(scope, receive, send)
+        return status[0]
+
+    async def client(index):
+        for n in range(index, requests, clients):
+            started = time.perf_counter()
+            status = await call(*targets[n % len(targets)])
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses.append(status)
+
+    async def main():
+        await asyncio.gather(*(client(i) for i in range(clients)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    return latencies, statuses, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ("Compare requests per second and tail latency of the JSON endpoints under the WSGI profile (sync "
+            "views, thread pool) and the ASGI profile (async views, event loop) with many concurrent clients. "
+            "Runs against the configured database, which must contain data (e.g. seed_demo_data).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='+', choices=sorted(PROFILES), default=['wsgi', 'asgi'])
+        parser.add_argument('--clients', type=int, default=300, help='Concurrent closed-loop clients')
+        parser.add_argument('--requests', type=int, default=6000, help='Total requests per profile')
+        parser.add_argument('--threads', type=int, default=32,
+                            help='WSGI profile: requests served at a time (worker threads)')
+        parser.add_argument('--routes', nargs='+', default=list(DEFAULT_ROUTES), help='Route names to request')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--profile-worker', choices=sorted(PROFILES), help='Internal: measure one profile')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['requests'] < options['clients']:
+            raise CommandError('Need at least one client and at least one request per client.')
+        if options['profile_worker']:
+            self._worker(options)
+            return
+
+        results = {}
+        for profile in options['profiles']:
+            self.stdout.write(f"Measuring {profile} ({options['clients']} clients, {options['requests']} requests)...")
+            results[profile] = self._spawn(profile, options)
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2, sort_keys=True)
+            self.stdout.write(f"\nWrote {options['output']}")
+
+    def _spawn(self, profile, options):
+        command = [sys.executable, sys.argv[0], 'bench_concurrency', '--profile-worker', profile,
+                   '--clients', str(options['clients']), '--requests', str(options['requests']),
+                   '--threads', str(options['threads']), '--routes', *options['routes']]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=PROFILES[profile])
+        done = subprocess.run(command, env=env, capture_output=True, text=True)
+        if done.returncode:
+            raise CommandError(f'{profile} run failed:\n{done.stderr}')
+        return json.loads(done.stdout.strip().splitlines()[-1])
+
+    def _worker(self, options):
+        targets = _targets(options['routes'])
+        if options['profile_worker'] == 'wsgi':
+            run = lambda count: run_wsgi(targets, options['clients'], count, options['threads'])  # noqa: E731
+        else:
+            run = lambda count: run_asgi(targets, options['clients'], count)  # noqa: E731
+        run(options['clients'])  # warm-up: imports, URL resolver, caches
+        latencies, statuses, elapsed = run(options['requests'])
+        self.stdout.write(json.dumps({
+            'requests': len(latencies),
+            'errors': sum(status >= 400 for status in statuses),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(max(latencies), 2),
+        }))
+
+    def _report(self, results):
+        self.stdout.write(f"\n{'profile':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}"
+                          f"{'max':>9}")
+        for profile, row in results.items():
+            line = (f"{profile:<10}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10.1f}{row['p50_ms']:>9.1f}"
+                    f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['max_ms']:>9.1f}")
+            self.stdout.write(self.style.ERROR(line) if row['errors'] else line)
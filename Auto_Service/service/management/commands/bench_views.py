@@ -0,0 +1,186 @@
+import json
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from service.datasets import ROLES, build_scaled_dataset
+from service.query_budget import QueryCounter
+from service.replay import iter_route_requests, quiet_request_log
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ("Benchmark every service route as each role against a scaled dataset and report latency "
+            "percentiles, query counts and peak memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=1000, help='Customers in the generated dataset')
+        parser.add_argument('--technicians', type=int, default=50, help='Technicians in the generated dataset')
+        parser.add_argument('--vehicles-per-customer', type=int, default=2)
+        parser.add_argument('--appointments-per-vehicle', type=int, default=5)
+        parser.add_argument('--notifications-per-customer', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per route and role')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests before measuring')
+        parser.add_argument('--routes', nargs='+', help='Only benchmark these route names')
+        parser.add_argument('--roles', nargs='+', choices=('ANONYMOUS',) + ROLES,
+                            help='Only benchmark as these roles')
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Do not generate data; benchmark as the first user of each role in the database')
+        parser.add_argument('--keep', action='store_true', help='Commit the generated dataset instead of rolling back')
+        parser.add_argument('--output', default='bench_views.json', help='Where to write the JSON report')
+        parser.add_argument('--compare', help='Earlier JSON report to compare this run against')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Flag routes whose p95 grew by more than this many percent')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1.')
+        baseline = self._load(options['compare']) if options['compare'] else None
+
+        with transaction.atomic():
+            if options['use_existing']:
+                from service.models import BaseUser
+                usernames = {
+                    role: BaseUser.objects.filter(user_type=role).values_list('user__username', flat=True).first()
+                    for role in ROLES
+                }
+                counts = {}
+            else:
+                self.stdout.write('Building scaled dataset...')
+                started = time.perf_counter()
+                dataset = build_scaled_dataset(
+                    customers=options['customers'], technicians=options['technicians'],
+                    vehicles_per_customer=options['vehicles_per_customer'],
+                    appointments_per_vehicle=options['appointments_per_vehicle'],
+                    notifications_per_customer=options['notifications_per_customer'], prefix='bench',
+                    log=lambda message: self.stdout.write(f'  {message}'),
+                )
+                self.stdout.write(f'  done in {time.perf_counter() - started:.1f}s')
+                usernames, counts = dataset.usernames, dataset.counts
+
+            with quiet_request_log():
+                results = self._run(usernames, options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        report = {
+            'created': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'scale': {key: options[key] for key in ('customers', 'technicians', 'vehicles_per_customer',
+                                                   'appointments_per_vehicle', 'notifications_per_customer')},
+            'dataset': counts,
+            'results': results,
+        }
+        with open(options['output'], 'w') as fh:
+            json.dump(report, fh, indent=2, sort_keys=True)
+
+        self._report(results)
+        self.stdout.write(f"\nWrote {options['output']}")
+        if baseline is not None:
+            self._compare(baseline['results'], results, options['threshold'],
+                          partial=bool(options['routes'] or options['roles']))
+
+    def _load(self, path):
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read baseline {path}: {exc}')
+
+    def _run(self, usernames, options):
+        results = {}
+        for role in (None,) + ROLES:
+            label = role or 'ANONYMOUS'
+            if options['roles'] and label not in options['roles']:
+                continue
+            username = usernames.get(role) if role else None
+            if role and not username:
+                continue
+            for name, url, perform in iter_route_requests(username, options['routes']):
+                results[f'{label} {name}'] = self._measure(url, perform, options)
+                self.stdout.write(f'  {label:<10} {name}')
+        return results
+
+    def _measure(self, url, perform, options):
+        # Every request runs in a rolled-back savepoint so POST endpoints see the same data each time
+        def replay():
+            with transaction.atomic():
+                response = perform()
+                transaction.set_rollback(True)
+            return response
+
+        for _ in range(options['warmup']):
+            replay()
+
+        latencies, queries, db_times = [], [], []
+        for _ in range(options['iterations']):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                response = replay()
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count)
+            db_times.append(counter.milliseconds)
+
+        # tracemalloc slows allocation down, so peak memory gets its own untimed request
+        tracemalloc.start()
+        try:
+            replay()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'mean_ms': round(statistics.fmean(latencies), 2),
+            'queries': max(queries),
+            'db_ms': round(statistics.median(db_times), 2),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+    def _report(self, results):
+        self.stdout.write(f"\n{'route':<38}{'status':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}"
+                          f"{'db ms':>8}{'peak KiB':>10}")
+        for key, row in results.items():
+            line = (f"{key:<38}{row['status']:>7}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}"
+                    f"{row['queries']:>9}{row['db_ms']:>8.1f}{row['peak_kib']:>10.0f}")
+            self.stdout.write(self.style.ERROR(line) if row['status'] >= 500 else line)
+
+    def _compare(self, before, after, threshold, partial=False):
+        self.stdout.write(f'\nCompared with baseline (p95 threshold {threshold:.0f}%):')
+        regressions = 0
+        for key, row in after.items():
+            old = before.get(key)
+            if old is None:
+                self.stdout.write(f'  {key}: new route')
+                continue
+            change = (row['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+            line = (f"  {key}: p95 {old['p95_ms']:.1f} -> {row['p95_ms']:.1f} ms ({change:+.0f}%), "
+                    f"queries {old['queries']} -> {row['queries']}")
+            if change > threshold or row['queries'] > old['queries']:
+                regressions += 1
+                self.stdout.write(self.style.WARNING(line))
+            else:
+                self.stdout.write(line)
+        if not partial:
+            for key in sorted(set(before) - set(after)):
+                self.stdout.write(f'  {key}: missing from this run')
+        if regressions:
+            self.stdout.write(self.style.WARNING(f'{regressions} route(s) regressed.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions.'))
@@ -0,0 +1,60 @@
+import os
+
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand
+
+from service.images import FORMATS, build, derivatives_for, source_path
+from service.models import IMAGE_FIELDS
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+class Command(BaseCommand):
+    help = "Pre-build the resized WebP/JPEG variants of static images and uploaded vehicle/facility/shop images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--static-prefix', default='images/', help='Static directory to scan (default: images/)')
+        parser.add_argument('--skip-uploads', action='store_true', help='Only process static images')
+
+    def handle(self, *args, **options):
+        sources = self._static_sources(options['static_prefix'])
+        if not options['skip_uploads']:
+            sources += self._upload_sources()
+
+        built = failed = 0
+        original_bytes = derivative_bytes = 0
+        for label, source in sources:
+            derivatives = derivatives_for(source, create=False)
+            if derivatives is None:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f'  skipped {label}'))
+                continue
+            path = source_path(source)
+            built += build(derivatives, path)
+            original_bytes += os.path.getsize(path)
+            # the variant a typical 640px card slot would download
+            fallback = derivatives.closest(640)
+            derivative_bytes += min(os.path.getsize(derivatives.storage_path(fallback, ext)) for ext in FORMATS)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(sources) - failed} image(s) ready, {built} variant(s) written, {failed} skipped. '
+            f'Originals {original_bytes / 1024 / 1024:.1f} MB vs 640px variants {derivative_bytes / 1024 / 1024:.1f} MB.'
+        ))
+
+    def _static_sources(self, prefix):
+        sources = []
+        for finder in finders.get_finders():
+            for path, storage in finder.list([]):
+                if path.startswith(prefix) and path.lower().endswith(IMAGE_EXTENSIONS):
+                    sources.append((path, path))
+        return sources
+
+    def _upload_sources(self):
+        sources, seen = [], set()
+        for model, field in IMAGE_FIELDS.items():
+            for instance in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).only(field):
+                file = getattr(instance, field)
+                if file.name not in seen:
+                    seen.add(file.name)
+                    sources.append((file.name, file))
+        return sources
@@ -0,0 +1,83 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from service.images import delete_derivatives
+from service.models import IMAGE_FIELDS, ContentBlob
+from service.storage import BLOB_PREFIX, image_storage, is_blob
+
+
+class Command(BaseCommand):
+    help = "Delete content-addressed image blobs that no vehicle, facility or shop references any more."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute reference counts from the image columns first '
+                                 '(repairs counts skipped by bulk inserts / queryset updates)')
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Keep unreferenced blobs younger than this; an upload may not be saved yet')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+        dry_run = options['dry_run']
+
+        if options['recount']:
+            self._recount(dry_run)
+
+        orphans = list(ContentBlob.objects.filter(ref_count=0, created_at__lt=cutoff).values_list('name', 'size'))
+        freed = sum(size for _, size in orphans)
+        if not dry_run:
+            for name, _ in orphans:
+                # Conditional delete: skip blobs that gained a reference since they were listed
+                if ContentBlob.objects.filter(name=name, ref_count=0).delete()[0]:
+                    image_storage.delete(name)
+                    delete_derivatives(name)
+
+        untracked = self._untracked_files(cutoff)
+        if not dry_run:
+            for name in untracked:
+                image_storage.delete(name)
+
+        verb = 'Would delete' if dry_run else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {len(orphans)} unreferenced blob(s) ({freed / 1024 / 1024:.1f} MB) '
+            f'and {len(untracked)} untracked file(s).'
+        ))
+
+    def _recount(self, dry_run):
+        references = Counter()
+        for model, field in IMAGE_FIELDS.items():
+            references.update(name for name in model.objects.values_list(field, flat=True) if is_blob(name))
+
+        with transaction.atomic():
+            blobs = list(ContentBlob.objects.select_for_update())
+            changed = [blob for blob in blobs if blob.ref_count != references.get(blob.name, 0)]
+            for blob in changed:
+                self.stdout.write(f'  {blob.name}: {blob.ref_count} -> {references.get(blob.name, 0)}')
+                blob.ref_count = references.get(blob.name, 0)
+            if not dry_run:
+                ContentBlob.objects.bulk_update(changed, ['ref_count'], batch_size=500)
+        missing = set(references) - {blob.name for blob in blobs}
+        if missing:
+            self.stdout.write(self.style.WARNING(f'{len(missing)} referenced file(s) have no ContentBlob row'))
+        self.stdout.write(f'Recounted references: {len(changed)} blob(s) corrected.')
+
+    def _untracked_files(self, cutoff):
+        """Blob files on disk without a ContentBlob row (e.g. a crash between write and insert)"""
+        root = image_storage.path(BLOB_PREFIX)
+        if not os.path.isdir(root):
+            return []
+        known = set(ContentBlob.objects.values_list('name', flat=True))
+        untracked = []
+        for directory, _, files in os.walk(root):
+            for filename in files:
+                path = os.path.join(directory, filename)
+                name = BLOB_PREFIX + os.path.relpath(path, root).replace(os.sep, '/')
+                if name not in known and os.path.getmtime(path) < cutoff.timestamp():
+                    untracked.append(name)
+        return untracked
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from service.maintenance import compute_maintenance_due
+
+
+class Command(BaseCommand):
+    help = ("Recompute Vehicle.next_maintenance_date from the service intervals and send MAINTENANCE_DUE "
+            "reminders, streaming the vehicles in chunks.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Vehicles per chunk')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without writing them')
+
+    def handle(self, *args, **options):
+        changed, notified = compute_maintenance_due(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {changed} maintenance date(s) and {notified} MAINTENANCE_DUE reminder(s).'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from service.exports import EXPORTS, FORMATS, ExportError, export_lines, export_queryset
+
+
+class Command(BaseCommand):
+    help = ("Stream the appointments, revenue or reviews export as CSV or JSONL to a file or stdout, "
+            "with the same filters as the manager export endpoints.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--from', dest='start', help='First date included (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end', help='Last date included (YYYY-MM-DD)')
+        parser.add_argument('--facility', help='Facility id')
+        parser.add_argument('--status', action='append', default=[], help='Status to include (repeatable)')
+        parser.add_argument('--output', '-o', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            rows = export_queryset(options['kind'], options['start'], options['end'], options['facility'],
+                                   options['status'])
+            lines = export_lines(options['kind'], rows, options['format'])
+        except ExportError as exc:
+            raise CommandError(str(exc))
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as out:
+            for count, line in enumerate(lines, 1):
+                out.write(line)
+        self.stderr.write(self.style.SUCCESS(f'Wrote {count} line(s) to {options["output"]}.'))
@@ -0,0 +1,102 @@
+import re
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from service.datasets import ROLES, build_scaled_dataset
+from service.replay import iter_route_requests, quiet_request_log
+
+# "SCAN service_appointment" (SQLite >= 3.36) / "SCAN TABLE service_appointment" (older) – but not
+# "SCAN ... USING [COVERING] INDEX", which walks an index in order and is fine.
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)\b(?! USING (?:COVERING )?INDEX)')
+
+
+class Command(BaseCommand):
+    help = ("Replay the service views against a scaled dataset and report full-table scans "
+            "found in EXPLAIN QUERY PLAN.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=500, help='Customers in the generated dataset')
+        parser.add_argument('--technicians', type=int, default=20, help='Technicians in the generated dataset')
+        parser.add_argument('--appointments-per-vehicle', type=int, default=5)
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Do not generate data; replay as the first user of each role in the database')
+        parser.add_argument('--keep', action='store_true', help='Commit the generated dataset instead of rolling back')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan, not only the scans')
+        parser.add_argument('--routes', nargs='+', help='Only replay these route names')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('index_advisor reads SQLite EXPLAIN QUERY PLAN output; run it against SQLite.')
+
+        with transaction.atomic():
+            if options['use_existing']:
+                from service.models import BaseUser
+                usernames = {
+                    role: BaseUser.objects.filter(user_type=role).values_list('user__username', flat=True).first()
+                    for role in ROLES
+                }
+            else:
+                self.stdout.write('Building scaled dataset...')
+                dataset = build_scaled_dataset(
+                    customers=options['customers'], technicians=options['technicians'],
+                    appointments_per_vehicle=options['appointments_per_vehicle'], prefix='advisor',
+                    log=lambda message: self.stdout.write(f'  {message}'),
+                )
+                usernames = dataset.usernames
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            with quiet_request_log():
+                queries = self._capture(usernames, options['routes'])
+            scans = self._explain(queries, options['verbose_plans'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        self._report(queries, scans)
+
+    def _capture(self, usernames, routes=None):
+        """Map each distinct SELECT to the set of routes that issued it"""
+        queries = defaultdict(set)
+        for role in (None,) + ROLES:
+            username = usernames.get(role) if role else None
+            if role and not username:
+                continue
+            for name, url, perform in iter_route_requests(username, routes):
+                with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                    perform()
+                    transaction.set_rollback(True)
+                for query in captured.captured_queries:
+                    if query['sql'].lstrip().upper().startswith('SELECT'):
+                        queries[query['sql']].add(f"{role or 'ANONYMOUS'} {name}")
+        return queries
+
+    def _explain(self, queries, verbose):
+        scans = defaultdict(list)
+        tables = set(connection.introspection.table_names())
+        with connection.cursor() as cursor:
+            for sql in queries:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[-1] for row in cursor.fetchall()]
+                if verbose:
+                    self.stdout.write(f'\n{sql}\n  ' + '\n  '.join(plan))
+                for line in plan:
+                    match = FULL_SCAN.search(line)
+                    # "SCAN subquery" / CTE scans are not tables and cannot be indexed
+                    if match and match.group(1) in tables:
+                        scans[match.group(1)].append((sql, line))
+        return scans
+
+    def _report(self, queries, scans):
+        self.stdout.write(f'\nReplayed {len(queries)} distinct SELECT statements.')
+        if not scans:
+            self.stdout.write(self.style.SUCCESS('No full-table scans found.'))
+            return
+        for table, hits in sorted(scans.items(), key=lambda item: -len(item[1])):
+            self.stdout.write(self.style.WARNING(f'\n{table}: {len(hits)} statement(s) scan the whole table'))
+            for sql, line in hits:
+                routes = ', '.join(sorted(queries[sql]))
+                self.stdout.write(f'  [{line}] from {routes}')
+                self.stdout.write(f'    {sql[:300]}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from service.analytics import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the repair shop analytics from grouped aggregate queries."
+
+    def handle(self, *args, **options):
+        analytics = rebuild()
+        if analytics is None:
+            self.stdout.write(self.style.WARNING('No analytics row exists yet – create the repair shop first.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Analytics rebuilt: {analytics.total_appointments} appointments, '
+            f'{analytics.review_count} reviews, revenue {analytics.total_revenue}'
+        ))
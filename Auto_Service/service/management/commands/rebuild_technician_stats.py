@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from service.analytics import rebuild_technician_stats
+
+
+class Command(BaseCommand):
+    help = "Repair the materialised per-technician performance counters in bulk."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows per bulk write / streamed chunk (default: 2000)')
+
+    def handle(self, *args, **options):
+        written = rebuild_technician_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Technician stats rebuilt ({written} rows written).'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from service.capacity import reconcile_loads
+
+
+class Command(BaseCommand):
+    help = "Recompute every facility-day booking counter from the appointments table and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted counters without fixing them')
+
+    def handle(self, *args, **options):
+        drifted = reconcile_loads(dry_run=options['dry_run'])
+        for facility_id, day, stored, actual in drifted[:20]:
+            self.stdout.write(f'  {facility_id} {day}: {stored} -> {actual}')
+        if len(drifted) > 20:
+            self.stdout.write(f'  ... and {len(drifted) - 20} more')
+        verb = 'Would correct' if options['dry_run'] else 'Corrected'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} day load counter(s).'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from service.notifications import reconcile_unread
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's unread-notification counter and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk UPDATE statement')
+        parser.add_argument('--dry-run', action='store_true', help='Report drifted counters without fixing them')
+
+    def handle(self, *args, **options):
+        drifted = reconcile_unread(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        for user_id, stored, actual in drifted[:20]:
+            self.stdout.write(f'  {user_id}: {stored} -> {actual}')
+        if len(drifted) > 20:
+            self.stdout.write(f'  ... and {len(drifted) - 20} more')
+        verb = 'Would correct' if options['dry_run'] else 'Corrected'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} unread counter(s).'))
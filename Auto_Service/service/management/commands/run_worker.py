@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from service import jobs
+
+
+def _init_process():
+    # pool processes are spawned, not forked, so they never share the parent's database connections
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue in a process pool, including recurring schedules."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=getattr(settings, 'JOB_WORKER_PROCESSES', 2),
+                            help='Pool size; 0 runs jobs inline in this process')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait for new jobs when the queue is empty')
+        parser.add_argument('--lease-seconds', type=int,
+                            help='How long a claimed job is reserved before other workers may retry it; '
+                                 'renewed every third of it while the job runs')
+        parser.add_argument('--name', default=f'{socket.gethostname()}:{os.getpid()}',
+                            help='Worker name recorded on claimed jobs')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due')
+        parser.add_argument('--no-schedules', action='store_true', help='Do not enqueue recurring jobs')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 0:
+            raise CommandError('--processes cannot be negative.')
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        if not options['no_schedules']:
+            jobs.sync_schedules()
+        self.processed = self.failed = 0
+        if options['processes'] == 0:
+            self._run_inline(options)
+        else:
+            self._run_pool(options)
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped: {self.processed} job(s) run, {self.failed} failed.'))
+
+    def _stop(self, signum, frame):
+        # finish the jobs in flight, claim nothing new
+        self.stopping = True
+
+    def _tick(self, options, limit):
+        if not options['no_schedules']:
+            jobs.enqueue_due_schedules()
+        if limit < 1:
+            return []
+        return jobs.claim(options['name'], limit, options['lease_seconds'])
+
+    def _done(self, job, error):
+        self.processed += 1
+        if error is not None:
+            self.failed += 1
+            self.stderr.write(f'{job.task} {job.id} failed (attempt {job.attempts}/{job.max_attempts})')
+        jobs.finish(job, error)
+
+    def _run_inline(self, options):
+        while not self.stopping:
+            claimed = self._tick(options, 1)
+            for job in claimed:
+                with jobs.heartbeat([job], options['lease_seconds']):
+                    error = jobs.execute(job.task, job.payload)
+                self._done(job, error)
+            if not claimed:
+                if options['burst']:
+                    return
+                time.sleep(options['poll_interval'])
+
+    def _pool(self, options):
+        return ProcessPoolExecutor(options['processes'], mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_process)
+
+    def _run_pool(self, options):
+        pool = self._pool(options)
+        running = {}
+        renew_every = jobs.lease_length(options['lease_seconds']) / 3
+        renew_at = time.monotonic() + renew_every
+        try:
+            while running or not self.stopping:
+                if running and time.monotonic() >= renew_at:
+                    # heartbeat: the jobs still in flight keep their leases
+                    jobs.renew(running.values(), options['lease_seconds'])
+                    renew_at = time.monotonic() + renew_every
+                claimed = [] if self.stopping else self._tick(options, options['processes'] - len(running))
+                for job in claimed:
+                    running[pool.submit(jobs.execute, job.task, job.payload)] = job
+                if not running:
+                    if options['burst']:
+                        return
+                    time.sleep(options['poll_interval'])
+                    continue
+                finished, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                broken = False
+                for future in finished:
+                    job = running.pop(future)
+                    try:
+                        error = future.result()
+                    except BrokenProcessPool as exc:
+                        # a pool process died (e.g. the OOM killer); every job in flight is lost with it
+                        error, broken = f'{type(exc).__name__}: {exc}', True
+                    self._done(job, error)
+                if broken:
+                    for job in running.values():
+                        self._done(job, 'Worker pool restarted')
+                    running.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self._pool(options)
+        finally:
+            pool.shutdown(wait=True)
@@ -2,9 +2,12 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from django.core.management import call_command
 from django.db import transaction
+from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 import random
+import time
 import uuid
+from datetime import time as dt_time, timedelta
 from faker import Faker
 import os
 from django.core.files.base import File
@@ -12,8 +15,10 @@ from django.conf import settings
 
 from service.models import (
     BaseUser, Employee, Customer, Vehicle, Facility, ServiceType, Appointment, Review,
-    Schedule, RepairShop, Notification, Message
+    Schedule, RepairShop, Notification, Message, TechnicianStats
 )
+from service.analytics import rebuild, rebuild_technician_stats
+from service.storage import retain
 
 fake = Faker()
 
@@ -33,10 +38,12 @@ CAR_MAKE_MODELS = {
     'Kia': ['Rio', 'Ceed', 'Picanto', 'Sportage', 'Sorento'],
 }
 
-def random_make_model():
+COLORS = ['Black', 'White', 'Blue', 'Red', 'Silver']
+
+def random_make_model(rng=random):
     """Return a tuple (make, model) that are consistent with each other."""
-    make = random.choice(list(CAR_MAKE_MODELS.keys()))
-    model = random.choice(CAR_MAKE_MODELS[make])
+    make = rng.choice(list(CAR_MAKE_MODELS.keys()))
+    model = rng.choice(CAR_MAKE_MODELS[make])
     return make, model
 
 # ------------------------------
@@ -333,7 +340,7 @@ SERVICE_DEFINITIONS = {
 
 # Helper to get static image path
 def static_image_path(filename):
-    return os.path.join(settings.BASE_DIR, 'Auto_Service', 'service', 'static', 'images', filename)
+    return os.path.join(settings.BASE_DIR, 'service', 'static', 'images', filename)
 
 class Command(BaseCommand):
     help = "Generate demo data (users, facilities, appointments, etc.) and optionally dump to a fixture."
@@ -342,12 +349,38 @@ class Command(BaseCommand):
         parser.add_argument('--output', type=str, default='service/fixtures/populate.json',
                             help='Path where dumpdata should be saved (default: service/fixtures/populate.json)')
         parser.add_argument('--reset', action='store_true', help='Flush existing domain data before seeding')
+        parser.add_argument('--customers', type=int, default=25, help='Number of customers (default: 25)')
+        parser.add_argument('--technicians', type=int, default=20, help='Number of technicians (default: 20)')
+        parser.add_argument('--appointments-per-vehicle', type=int, default=None,
+                            help='Appointments per vehicle (default: 1-2 at random)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk insert (default: 2000)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--no-fixture', action='store_true', help='Skip writing the dumpdata fixture')
 
     @transaction.atomic
     def handle(self, *args, **options):
         output_path = options['output']
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         reset = options['reset']
+        batch_size = options['batch_size']
+        appointments_per_vehicle = options['appointments_per_vehicle']
+        rng = random.Random(options['seed'])
+        if options['seed'] is not None:
+            Faker.seed(options['seed'])
+        started = time.perf_counter()
+        # Faker is slow per call; draw names, phones, addresses and plates from pre-generated pools
+        self.pools = {
+            'first_name': [fake.first_name() for _ in range(200)],
+            'last_name': [fake.last_name() for _ in range(200)],
+            'phone': [fake.phone_number() for _ in range(200)],
+            'address': [fake.address() for _ in range(200)],
+            'plate': [fake.license_plate() for _ in range(500)],
+        }
+        self.rng = rng
+        # One PBKDF2 hash shared by every demo account
+        plain_pw = 'pass@1234'
+        self.password_hash = make_password(plain_pw)
+        self._stored_images = {}
 
         if reset:
             self.stdout.write(self.style.WARNING('Reset flag provided – existing objects will be deleted'))
@@ -369,11 +402,10 @@ class Command(BaseCommand):
         # ------------------------------------------------------------------
         # 1. Core users & repair shop
         # ------------------------------------------------------------------
-        plain_pw = 'pass@1234'
-        admin_user = self._create_user('admin', 'Admin', 'User', 'admin@example.com', plain_pw, is_staff=True, is_superuser=True)
+        admin_user = self._create_user('admin', 'Admin', 'User', 'admin@example.com', is_staff=True, is_superuser=True)
         admin_base = BaseUser.objects.create(user=admin_user, user_type='ADMIN', phone_number=fake.phone_number(), address=fake.address())
 
-        owner_user = self._create_user('owner', 'Owner', 'One', 'owner@example.com', plain_pw)
+        owner_user = self._create_user('owner', 'Owner', 'One', 'owner@example.com')
         owner_base = BaseUser.objects.create(user=owner_user, user_type='OWNER', phone_number=fake.phone_number(), address=fake.address())
 
         # Repair shop (singleton)
@@ -413,7 +445,7 @@ class Command(BaseCommand):
                 description=FACILITY_DESCRIPTIONS.get(ft, fake.paragraph()),
                 is_active=True,
                 repair_shop=shop,
-                capacity=random.randint(2, 8)
+                capacity=rng.randint(2, 8)
             )
             # Attach facility image if a matching static image exists
             fac_img_name = f"{ft.upper()}.jpg"
@@ -429,11 +461,11 @@ class Command(BaseCommand):
         service_types = []
         for facility in facilities:
             for svc in SERVICE_DEFINITIONS.get(facility.facility_type, []):
-                price = random.randint(10, 20) if facility.facility_type == "OFFICE" else random.randint(50, 300)
+                price = rng.randint(10, 20) if facility.facility_type == "OFFICE" else rng.randint(50, 300)
                 st = ServiceType.objects.create(
                     name=svc["name"],
                     description=svc["description"],
-                    duration_minutes=random.choice([30, 45, 60, 90]),
+                    duration_minutes=rng.choice([30, 45, 60, 90]),
                     price=price,
                     facility=facility,
                 )
@@ -442,227 +474,148 @@ class Command(BaseCommand):
         # ------------------------------------------------------------------
         # 4. Managers, Supervisors, Technicians, Staff, Secretaries
         # ------------------------------------------------------------------
-        def create_role(username_prefix, count, role):
-            users = []
-            for i in range(count):
-                uname = f"{username_prefix}{i+1}"
-                user = self._create_user(uname, fake.first_name(), fake.last_name(), f"{uname}@example.com", plain_pw)
-                base = BaseUser.objects.create(user=user, user_type=role, phone_number=fake.phone_number(), address=fake.address())
-                users.append(base)
-            return users
-
-        managers_base = create_role('manager', 3, 'MANAGER')
-        supervisors_base = create_role('supervisor', 3, 'SUPERVISOR')
-        secretaries = create_role('secretary', 2, 'SECRETARY')
-        staff_members = create_role('staff', 2, 'STAFF')
+        managers_base = self._create_role('manager', 3, 'MANAGER')
+        supervisors_base = self._create_role('supervisor', 3, 'SUPERVISOR')
+        secretaries = self._create_role('secretary', 2, 'SECRETARY')
+        staff_members = self._create_role('staff', 2, 'STAFF')
 
         # Create Employee records for managers and supervisors so they can supervise technicians
-        manager_emps = []
-        for base in managers_base:
-            emp = Employee.objects.create(
-                base_user=base,
-                supervisor=None,
-                facility=random.choice(facilities),
-                hire_date=fake.date_between(start_date='-10y', end_date='today'),
-                salary=random.randint(40000, 60000),
-                is_active=True
-            )
-            manager_emps.append(emp)
-
-        supervisor_emps = []
-        for base in supervisors_base:
-            emp = Employee.objects.create(
-                base_user=base,
-                supervisor=random.choice(manager_emps) if manager_emps else None,
-                facility=random.choice(facilities),
-                hire_date=fake.date_between(start_date='-10y', end_date='today'),
-                salary=random.randint(35000, 55000),
-                is_active=True
-            )
-            supervisor_emps.append(emp)
+        manager_emps = self._create_employees(managers_base, facilities, [None], '-10y', (40000, 60000))
+        supervisor_emps = self._create_employees(supervisors_base, facilities, manager_emps or [None], '-10y',
+                                                 (35000, 55000))
 
         # Technicians
-        technicians_base = create_role('tech', 20, 'TECHNICIAN')
-        technicians = []
-        possible_supervisors = supervisor_emps + manager_emps
-        for base in technicians_base:
-            emp = Employee.objects.create(
-                base_user=base,
-                supervisor=random.choice(possible_supervisors) if possible_supervisors else None,
-                facility=random.choice(facilities),
-                hire_date=fake.date_between(start_date='-5y', end_date='today'),
-                salary=random.randint(30000, 50000),
-                is_active=True
-            )
-            technicians.append(emp)
-
-        # ------------------------------------------------------------------
-        # 5. Customers, Vehicles, Appointments
-        # ------------------------------------------------------------------
-        customers = []
-        for i in range(25):
-            uname = f"customer{i+1}"
-            user = self._create_user(uname, fake.first_name(), fake.last_name(), f"{uname}@example.com", plain_pw)
-            base = BaseUser.objects.create(user=user, user_type='CUSTOMER', phone_number=fake.phone_number(), address=fake.address())
-            cust = Customer.objects.create(base_user=base)
-            customers.append(cust)
-
-            # each customer 1-2 vehicles
-            for _ in range(random.randint(1, 2)):
-                make, model = random_make_model()
-                v = Vehicle.objects.create(
-                    owner=cust,
-                    vin=str(uuid.uuid4())[:17].replace('-', '')[:17],
-                    make=make,
-                    model=model,
-                    year=random.randint(2005, 2025),
-                    color=random.choice(['Black', 'White', 'Blue', 'Red', 'Silver']),
-                    license_plate=fake.license_plate(),
-                    registration_date=fake.date_between(start_date='-10y', end_date='today'),
-                    mileage=random.randint(50000, 2000000)
-                )
-                # Try to assign a specific image for Audi models, else use Default_Car.jpg
-                car_img_name = None
-                if v.make == 'Audi':
-                    model_clean = v.model.replace(' ', '_')
-                    candidate = f"Audi_{model_clean}.png"
-                    candidate_path = static_image_path(candidate)
-                    if os.path.exists(candidate_path):
-                        car_img_name = candidate
-                if not car_img_name:
-                    car_img_name = 'Default_Car.jpg'
-                car_img_path = static_image_path(car_img_name)
-                if os.path.exists(car_img_path):
-                    with open(car_img_path, 'rb') as imgf:
-                        v.image.save(car_img_name, File(imgf), save=True)
-                # each vehicle gets 1-2 appointments
-                for _ in range(random.randint(1, 2)):
-                    st = random.choice(service_types)
-                    appt_status = random.choice(['SCHEDULED', 'COMPLETED', 'CANCELLED'])
-                    if appt_status == 'SCHEDULED':
-                        appt_date = fake.date_between(start_date='today', end_date='+60d')
-                    else:
-                        appt_date = fake.date_between(start_date='-60d', end_date='-1d')
-                    appt = Appointment.objects.create(
-                        customer=cust,
-                        vehicle=v,
-                        service_type=st,
-                        assigned_technician=random.choice(technicians),
-                        scheduled_date=appt_date,
-                        scheduled_time=fake.time(pattern='%H:%M'),
-                        status=appt_status,
-                    )
-                    if appt_status == 'COMPLETED':
-                        Review.objects.create(
-                            appointment=appt,
-                            rating=random.randint(4, 5),
-                            comment=random.choice(REVIEW_COMMENTS),
-                            technician_rating=random.randint(4, 5),
-                            technician_comment=random.choice(TECH_COMMENTS)
-                        )
+        technicians_base = self._create_role('tech', options['technicians'], 'TECHNICIAN')
+        possible_supervisors = (supervisor_emps + manager_emps) or [None]
+        technicians = self._create_employees(technicians_base, facilities, possible_supervisors, '-5y',
+                                             (30000, 50000))
+        self.stdout.write(f'{len(technicians)} technicians')
 
         # ------------------------------------------------------------------
-        # 5b. Ensure each customer has at least one UPCOMING appointment
+        # 5. Customers, Vehicles, Appointments (streamed in batches)
         # ------------------------------------------------------------------
         today = timezone.localdate()
-        for cust in customers:
-            has_upcoming = Appointment.objects.filter(
-                vehicle__owner=cust,
-                status='SCHEDULED',
-                scheduled_date__gte=today
-            ).exists()
-
-            if not has_upcoming:
-                vehicle = cust.vehicles.order_by('?').first()
-                if vehicle is None:
-                    # Extremely defensive – create a vehicle if somehow missing
-                    make, model = random_make_model()
-                    vehicle = Vehicle.objects.create(
+        # "has an upcoming appointment" invariants, tracked in memory instead of re-queried (5b/5c)
+        techs_with_upcoming = set()
+        sample_vehicles = []
+        message_senders = list(technicians_base)
+        totals = {'customers': 0, 'vehicles': 0, 'appointments': 0, 'reviews': 0}
+
+        for start in range(0, options['customers'], batch_size):
+            count = min(batch_size, options['customers'] - start)
+            customer_bases = self._create_role('customer', count, 'CUSTOMER', offset=start)
+            customers = [Customer(base_user=base) for base in customer_bases]
+            Customer.objects.bulk_create(customers)
+
+            vehicles, appointments, reviews = [], [], []
+            for cust in customers:
+                own_vehicles = []
+                first = len(appointments)
+                # each customer 1-2 vehicles
+                for _ in range(rng.randint(1, 2)):
+                    make, model = random_make_model(rng)
+                    v = Vehicle(
                         owner=cust,
-                        vin=str(uuid.uuid4())[:17].replace('-', '')[:17],
+                        vin=uuid.UUID(int=rng.getrandbits(128)).hex[:17],
                         make=make,
                         model=model,
-                        year=random.randint(2005, 2025),
-                        color=random.choice(['Black', 'White', 'Blue', 'Red', 'Silver']),
-                        license_plate=fake.license_plate(),
-                        registration_date=fake.date_between(start_date='-10y', end_date='today'),
-                        mileage=random.randint(50000, 2000000)
+                        year=rng.randint(2005, 2025),
+                        color=rng.choice(COLORS),
+                        license_plate=rng.choice(self.pools['plate']),
+                        registration_date=today - timedelta(days=rng.randint(0, 3650)),
+                        mileage=rng.randint(50000, 2000000),
+                        image=self._vehicle_image(make, model),
                     )
-
-                Appointment.objects.create(
-                    customer=cust,
-                    vehicle=vehicle,
-                    service_type=random.choice(service_types),
-                    assigned_technician=random.choice(technicians),
-                    scheduled_date=fake.date_between(start_date='today', end_date='+30d'),
-                    scheduled_time=fake.time(pattern='%H:%M'),
-                    status='SCHEDULED'
-                )
+                    own_vehicles.append(v)
+                    # each vehicle gets 1-2 appointments unless a fixed count was requested
+                    for _ in range(appointments_per_vehicle or rng.randint(1, 2)):
+                        appt_status = rng.choice(['SCHEDULED', 'COMPLETED', 'CANCELLED'])
+                        if appt_status == 'SCHEDULED':
+                            appt_date = today + timedelta(days=rng.randint(0, 60))
+                        else:
+                            appt_date = today - timedelta(days=rng.randint(1, 60))
+                        appointments.append(self._appointment(rng, cust, v, rng.choice(service_types),
+                                                              rng.choice(technicians), appt_date, appt_status))
+
+                # 5b. Ensure each customer has at least one UPCOMING appointment
+                if not any(a.status == 'SCHEDULED' and a.scheduled_date >= today for a in appointments[first:]):
+                    appointments.append(self._appointment(
+                        rng, cust, rng.choice(own_vehicles), rng.choice(service_types), rng.choice(technicians),
+                        today + timedelta(days=rng.randint(0, 30)), 'SCHEDULED',
+                    ))
+                vehicles.extend(own_vehicles)
+                if len(sample_vehicles) < batch_size:
+                    sample_vehicles.append(rng.choice(own_vehicles))
+
+            for appt in appointments:
+                if appt.status == 'SCHEDULED' and appt.scheduled_date >= today:
+                    techs_with_upcoming.add(appt.assigned_technician)
+                elif appt.status == 'COMPLETED':
+                    # what update_vehicle_last_service would have written
+                    vehicle = appt.vehicle
+                    if vehicle.last_service_date is None or appt.scheduled_date > vehicle.last_service_date:
+                        vehicle.last_service_date = appt.scheduled_date
+                    reviews.append(Review(
+                        appointment=appt,
+                        rating=rng.randint(4, 5),
+                        comment=rng.choice(REVIEW_COMMENTS),
+                        technician_rating=rng.randint(4, 5),
+                        technician_comment=rng.choice(TECH_COMMENTS)
+                    ))
+
+            Vehicle.objects.bulk_create(vehicles, batch_size=batch_size)
+            retain(v.image.name for v in vehicles if v.image)
+            Appointment.objects.bulk_create(appointments, batch_size=batch_size)
+            Review.objects.bulk_create(reviews, batch_size=batch_size)
+            if len(message_senders) < batch_size:
+                message_senders.extend(customer_bases)
+            for key, rows in (('customers', customers), ('vehicles', vehicles), ('appointments', appointments),
+                              ('reviews', reviews)):
+                totals[key] += len(rows)
+            self.stdout.write(f"  {totals['customers']} customers, {totals['appointments']} appointments")
 
         # ------------------------------------------------------------------
-        # Guarantee at least one UPCOMING SCHEDULED appointment per technician
+        # 5c. Guarantee at least one UPCOMING SCHEDULED appointment per technician
         # ------------------------------------------------------------------
-        today = timezone.localdate()
-
+        extra = []
         for tech in technicians:
-            upcoming_exists = Appointment.objects.filter(
-                assigned_technician=tech,
-                status='SCHEDULED',
-                scheduled_date__gte=today
-            ).exists()
-
-            if not upcoming_exists:
-                # Select a random customer with at least one vehicle (guaranteed from above)
-                cust = random.choice(customers)
-                vehicle = cust.vehicles.order_by('?').first()
-
-                # Fallback: extremely defensive – create vehicle if somehow missing
-                if vehicle is None:
-                    make, model = random_make_model()
-                    vehicle = Vehicle.objects.create(
-                        owner=cust,
-                        vin=str(uuid.uuid4())[:17].replace('-', '')[:17],
-                        make=make,
-                        model=model,
-                        year=random.randint(2005, 2025),
-                        color=random.choice(['Black', 'White', 'Blue', 'Red', 'Silver']),
-                        license_plate=fake.license_plate(),
-                        registration_date=fake.date_between(start_date='-10y', end_date='today'),
-                        mileage=random.randint(50000, 2000000)
-                    )
-
-                st = random.choice(service_types)
-
-                # Schedule it for today so it shows up immediately on the technician dashboard
-                future_date = today
-
-                Appointment.objects.create(
-                    customer=cust,
-                    vehicle=vehicle,
-                    service_type=st,
-                    assigned_technician=tech,
-                    scheduled_date=future_date,
-                    scheduled_time=fake.time(pattern='%H:%M'),
-                    status='SCHEDULED'
-                )
+            if tech not in techs_with_upcoming and sample_vehicles:
+                vehicle = rng.choice(sample_vehicles)
+                # Scheduled for today so it shows up immediately on the technician dashboard
+                extra.append(self._appointment(rng, vehicle.owner, vehicle, rng.choice(service_types), tech, today,
+                                               'SCHEDULED'))
+        Appointment.objects.bulk_create(extra, batch_size=batch_size)
+        totals['appointments'] += len(extra)
 
         # ------------------------------------------------------------------
         # 6. Messages to secretaries
         # ------------------------------------------------------------------
-        for sec_base in secretaries:
-            for _ in range(random.randint(5, 10)):
-                sender_base = random.choice(technicians_base + [c.base_user for c in customers])
-                Message.objects.create(
-                    sender=sender_base,
-                    recipient=sec_base,
-                    subject=random.choice(MESSAGE_SUBJECTS),
-                    content=random.choice(MESSAGE_CONTENTS),
-                    priority=random.choice(['LOW', 'MEDIUM', 'HIGH'])
-                )
+        Message.objects.bulk_create([
+            Message(
+                sender=rng.choice(message_senders),
+                recipient=sec_base,
+                subject=rng.choice(MESSAGE_SUBJECTS),
+                content=rng.choice(MESSAGE_CONTENTS),
+                priority=rng.choice(['LOW', 'MEDIUM', 'HIGH'])
+            )
+            for sec_base in secretaries for _ in range(rng.randint(5, 10))
+        ])
+
+        # bulk_create bypasses the signals that maintain the derived tables
+        rebuild()
+        rebuild_technician_stats(batch_size=batch_size)
+
+        self.stdout.write(
+            f"{totals['customers']} customers, {totals['vehicles']} vehicles, {totals['appointments']} "
+            f"appointments, {totals['reviews']} reviews in {time.perf_counter() - started:.1f}s"
+        )
 
         self.stdout.write(self.style.SUCCESS('Demo data generated successfully.'))
         self.stdout.write(self.style.SUCCESS(f'All demo accounts use password: {plain_pw}'))
 
+        if options['no_fixture']:
+            return
+
         # Dump data ensuring UTF-8 encoding so special characters are preserved cross-platform
         with open(output_path, 'w', encoding='utf-8') as fixture_file:
             call_command(
@@ -674,15 +627,76 @@ class Command(BaseCommand):
             )
         self.stdout.write(self.style.SUCCESS(f'Fixture written to {output_path}'))
 
-    def _create_user(self, username, first, last, email, password, is_staff=False, is_superuser=False):
+    def _create_user(self, username, first, last, email, is_staff=False, is_superuser=False):
         user, created = User.objects.get_or_create(username=username, defaults={
             'first_name': first,
             'last_name': last,
             'email': email,
             'is_staff': is_staff,
             'is_superuser': is_superuser,
+            'password': self.password_hash,
         })
-        if created:
-            user.set_password(password)
-            user.save()
-        return user 
\ No newline at end of file
+        return user
+
+    def _create_role(self, username_prefix, count, role, offset=0):
+        """Bulk-create ``count`` users of ``role`` named <prefix><n> and return their BaseUsers"""
+        rng, pools = self.rng, self.pools
+        users = User.objects.bulk_create([
+            User(username=f"{username_prefix}{i + 1}", first_name=rng.choice(pools['first_name']),
+                 last_name=rng.choice(pools['last_name']), email=f"{username_prefix}{i + 1}@example.com",
+                 password=self.password_hash)
+            for i in range(offset, offset + count)
+        ])
+        return BaseUser.objects.bulk_create([
+            BaseUser(user=user, user_type=role, phone_number=rng.choice(pools['phone']),
+                     address=rng.choice(pools['address']))
+            for user in users
+        ])
+
+    def _create_employees(self, bases, facilities, supervisors, hired_since, salary_range):
+        rng = self.rng
+        days = int(hired_since.strip('-y')) * 365
+        today = timezone.localdate()
+        employees = Employee.objects.bulk_create([
+            Employee(
+                base_user=base,
+                supervisor=rng.choice(supervisors),
+                facility=rng.choice(facilities),
+                hire_date=today - timedelta(days=rng.randint(0, days)),
+                salary=rng.randint(*salary_range),
+                is_active=True
+            )
+            for base in bases
+        ])
+        # what the create_technician_stats signal would have done
+        TechnicianStats.objects.bulk_create([TechnicianStats(technician=emp) for emp in employees])
+        return employees
+
+    def _appointment(self, rng, customer, vehicle, service_type, technician, scheduled_date, status):
+        return Appointment(
+            customer=customer,
+            vehicle=vehicle,
+            service_type=service_type,
+            assigned_technician=technician,
+            scheduled_date=scheduled_date,
+            scheduled_time=dt_time(rng.randrange(24), rng.randrange(60)),
+            status=status,
+        )
+
+    def _vehicle_image(self, make, model):
+        """Stored name of the static picture for make/model; storage keeps one copy per distinct image"""
+        # Try to assign a specific image for Audi models, else use Default_Car.jpg
+        car_img_name = 'Default_Car.jpg'
+        if make == 'Audi':
+            candidate = f"Audi_{model.replace(' ', '_')}.png"
+            if os.path.exists(static_image_path(candidate)):
+                car_img_name = candidate
+        if car_img_name not in self._stored_images:
+            stored = None
+            car_img_path = static_image_path(car_img_name)
+            if os.path.exists(car_img_path):
+                field = Vehicle._meta.get_field('image')
+                with open(car_img_path, 'rb') as imgf:
+                    stored = field.storage.save(field.generate_filename(None, car_img_name), File(imgf))
+            self._stored_images[car_img_name] = stored
+        return self._stored_images[car_img_name]
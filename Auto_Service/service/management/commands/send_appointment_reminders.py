@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from service.reminders import send_reminders
+
+
+class Command(BaseCommand):
+    help = "Send the APPOINTMENT_REMINDER notifications that are due; safe to run repeatedly or concurrently."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Appointments per transaction')
+
+    def handle(self, *args, **options):
+        sent = send_reminders(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} appointment reminder(s).'))
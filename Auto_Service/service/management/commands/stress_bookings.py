@@ -0,0 +1,161 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from service.datasets import _ensure_shop
+from service.models import (
+    Appointment, BaseUser, Customer, Employee, Facility, FacilityDayLoad, Schedule, ServiceType, Vehicle,
+)
+from service.replay import client_for, quiet_request_log
+from service.slots import minutes
+
+
+def _next_weekday():
+    day = timezone.localdate() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+def overbooked_minutes(facility, day, bays):
+    """Minutes of ``day`` at which more active appointments run than ``bays``"""
+    load = Counter()
+    for start, duration in Appointment.objects.filter(
+        service_type__facility=facility, scheduled_date=day, status__in=Appointment.ACTIVE_STATUSES,
+    ).values_list('scheduled_time', 'service_type__duration_minutes'):
+        for minute in range(minutes(start), minutes(start) + duration):
+            load[minute] += 1
+    return sum(1 for used in load.values() if used > bays)
+
+
+class Command(BaseCommand):
+    help = ("Stress-test booking: many customers in several processes POST create_appointment for the same "
+            "facility-day at once; checks that neither max_daily_appointments nor the parallel bays are exceeded "
+            "and that the FacilityDayLoad counter matches. Needs a database shared between processes (a SQLite "
+            "file or PostgreSQL); the generated facility and customers are deleted afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=60, help='Customers booking concurrently')
+        parser.add_argument('--processes', type=int, default=4, help='Worker processes the customers are split over')
+        parser.add_argument('--max-daily', type=int, default=8, help='Schedule.max_daily_appointments of the facility')
+        parser.add_argument('--bays', type=int, default=2, help='Facility.capacity (parallel bays and technicians)')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated facility and customers')
+        parser.add_argument('--worker', help='Internal: JSON job for one worker process')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self._worker(json.loads(options['worker']))
+            return
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError('Worker processes cannot share an in-memory SQLite database.')
+        if options['customers'] < 1 or options['processes'] < 1:
+            raise CommandError('Need at least one customer and one process.')
+
+        prefix = f'stress{uuid.uuid4().hex[:6]}'
+        day = _next_weekday()
+        facility, service, usernames = self._setup(prefix, options)
+        try:
+            statuses = Counter()
+            started = time.perf_counter()
+            for result in self._spawn(usernames, service, day, options):
+                statuses.update(result)
+            elapsed = time.perf_counter() - started
+            self._report(facility, day, options, statuses, elapsed)
+        finally:
+            if not options['keep']:
+                facility.delete()
+                User.objects.filter(username__startswith=prefix).delete()
+
+    def _setup(self, prefix, options):
+        shop = _ensure_shop('stress@1234')
+        facility = Facility.objects.create(name=f'{prefix} facility', facility_type='MAINTENANCE', description='-',
+                                           repair_shop=shop, capacity=options['bays'])
+        Schedule.objects.filter(facility=facility).update(max_daily_appointments=options['max_daily'])
+        service = ServiceType.objects.create(name=f'{prefix} service', description='-', duration_minutes=60,
+                                             price=Decimal('50'), facility=facility)
+        for n in range(options['bays']):
+            Employee.objects.create(base_user=self._user(f'{prefix}tech{n}', 'TECHNICIAN'), facility=facility,
+                                    hire_date=timezone.localdate(), salary=Decimal('30000'))
+        usernames = []
+        for n in range(options['customers']):
+            customer = Customer.objects.create(base_user=self._user(f'{prefix}c{n}', 'CUSTOMER'))
+            Vehicle.objects.create(owner=customer, vin=f'{prefix[-6:].upper()}{n:011d}', make='VW', model='Golf',
+                                   year=2020, color='Grey', license_plate=f'{prefix[-6:]}-{n}')
+            usernames.append(customer.base_user.user.username)
+        return facility, service, usernames
+
+    def _user(self, username, user_type):
+        user = User.objects.create_user(username=username, password='stress@1234')
+        return BaseUser.objects.create(user=user, user_type=user_type, phone_number='0000', address='-')
+
+    def _spawn(self, usernames, service, day, options):
+        go = time.time() + 2  # every process fires at the same moment, after its own start-up
+        workers = []
+        for index in range(options['processes']):
+            job = {'usernames': usernames[index::options['processes']], 'service': str(service.pk),
+                   'day': day.isoformat(), 'offset': index, 'go': go}
+            workers.append(subprocess.Popen(
+                [sys.executable, sys.argv[0], 'stress_bookings', '--worker', json.dumps(job)],
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=dict(os.environ),
+            ))
+        for worker in workers:
+            out, err = worker.communicate()
+            if worker.returncode:
+                raise CommandError(f'Worker failed:\n{err}')
+            yield json.loads(out.strip().splitlines()[-1])
+
+    def _worker(self, job):
+        """One thread (and database connection) per customer, all POSTing at ``go``"""
+        statuses = []
+
+        def book(username, slot):
+            try:
+                client = client_for(username)
+                vehicle = Vehicle.objects.filter(owner__base_user__user__username=username).values_list(
+                    'pk', flat=True)[0]
+                time.sleep(max(job['go'] - time.time(), 0))
+                response = client.post(reverse('service:create_appointment'), {
+                    'service_type': job['service'], 'vehicle': vehicle, 'scheduled_date': job['day'],
+                    'scheduled_time': f'{9 + slot % 8:02d}:00',
+                })
+                statuses.append('booked' if response.status_code == 302 else
+                                'rejected' if response.status_code == 200 else f'error {response.status_code}')
+            except Exception as exc:  # e.g. SQLite's busy timeout while logging in: count it, keep the others going
+                statuses.append(f'error {type(exc).__name__}')
+            finally:
+                connection.close()
+
+        with quiet_request_log():
+            threads = [threading.Thread(target=book, args=(username, job['offset'] + n))
+                       for n, username in enumerate(job['usernames'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(json.dumps(Counter(statuses)))
+
+    def _report(self, facility, day, options, statuses, elapsed):
+        booked = Appointment.objects.filter(service_type__facility=facility,
+                                            scheduled_date=day).exclude(status='CANCELLED').count()
+        counter = FacilityDayLoad.objects.filter(facility=facility, date=day).values_list('booked', flat=True).first()
+        overbooked = overbooked_minutes(facility, day, options['bays'])
+        for status, count in sorted(statuses.items()):
+            self.stdout.write(f'  {status:<24} {count:>6}')
+        self.stdout.write(f'  {sum(statuses.values())} requests in {elapsed:.1f}s; {booked} booked appointments '
+                          f'(limit {options["max_daily"]}), counter {counter}, {overbooked} overbooked minutes')
+        if booked > options['max_daily'] or counter != booked or overbooked:
+            raise CommandError('Overbooked or counter out of step.')
+        self.stdout.write(self.style.SUCCESS('No overbooking.'))
@@ -0,0 +1,132 @@
+# Generated by Django 5.2.3 on 2026-10-17 01:45
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def _round(value):
+    return float(Decimal(value).quantize(Decimal('0.01')))
+
+
+def seed_running_totals(apps, schema_editor):
+    """Recompute the analytics row from the appointments and reviews so the signal deltas start from the right
+    totals (the counters and per-technician rating sums were never kept before)"""
+    Analytics = apps.get_model('service', 'Analytics')
+    Appointment = apps.get_model('service', 'Appointment')
+    Customer = apps.get_model('service', 'Customer')
+    Employee = apps.get_model('service', 'Employee')
+    Facility = apps.get_model('service', 'Facility')
+    Review = apps.get_model('service', 'Review')
+    ServiceType = apps.get_model('service', 'ServiceType')
+    Vehicle = apps.get_model('service', 'Vehicle')
+
+    analytics = Analytics.objects.first()
+    if analytics is None:
+        return
+
+    completed = Q(status='COMPLETED')
+    services = {
+        str(pk): {'name': name, 'facility_id': str(facility_id), 'total_appointments': 0,
+                  'completed_appointments': 0, 'total_revenue': Decimal('0')}
+        for pk, name, facility_id in ServiceType.objects.values_list('id', 'name', 'facility_id')
+    }
+    facilities = {
+        str(pk): {'name': name, 'capacity': capacity, 'total_appointments': 0,
+                  'completed_appointments': 0, 'revenue': Decimal('0')}
+        for pk, name, capacity in Facility.objects.values_list('id', 'name', 'capacity')
+    }
+    technicians = {
+        str(pk): {'name': f'{first} {last}'.strip(), 'total_appointments': 0,
+                  'completed_appointments': 0, 'rating_sum': 0, 'rating_count': 0}
+        for pk, first, last in Employee.objects.filter(base_user__user_type='TECHNICIAN').values_list(
+            'id', 'base_user__user__first_name', 'base_user__user__last_name'
+        )
+    }
+
+    total = total_completed = 0
+    total_revenue = Decimal('0')
+    per_service = Appointment.objects.order_by().values('service_type_id').annotate(
+        total=Count('id'), completed=Count('id', filter=completed), revenue=Sum('final_cost', filter=completed),
+    )
+    for row in per_service:
+        revenue = row['revenue'] or Decimal('0')
+        total += row['total']
+        total_completed += row['completed']
+        total_revenue += revenue
+        service = services.get(str(row['service_type_id']))
+        if service is None:
+            continue
+        service.update(total_appointments=row['total'], completed_appointments=row['completed'],
+                       total_revenue=revenue)
+        facility = facilities.get(service['facility_id'])
+        if facility is not None:
+            facility['total_appointments'] += row['total']
+            facility['completed_appointments'] += row['completed']
+            facility['revenue'] += revenue
+
+    per_technician = Appointment.objects.order_by().exclude(assigned_technician__isnull=True).values(
+        'assigned_technician_id'
+    ).annotate(total=Count('id'), completed=Count('id', filter=completed))
+    for row in per_technician:
+        tech = technicians.get(str(row['assigned_technician_id']))
+        if tech is not None:
+            tech.update(total_appointments=row['total'], completed_appointments=row['completed'])
+
+    rating_sum = review_count = 0
+    ratings = Review.objects.order_by().values('appointment__assigned_technician_id').annotate(
+        rating_sum=Sum('rating'), rating_count=Count('id'),
+    )
+    for row in ratings:
+        rating_sum += row['rating_sum']
+        review_count += row['rating_count']
+        tech = technicians.get(str(row['appointment__assigned_technician_id']))
+        if tech is not None:
+            tech.update(rating_sum=row['rating_sum'], rating_count=row['rating_count'])
+
+    for service in services.values():
+        del service['facility_id']
+        service['total_revenue'] = _round(service['total_revenue'])
+    for facility in facilities.values():
+        facility['revenue'] = _round(facility['revenue'])
+        capacity = facility['capacity']
+        facility['utilization_rate'] = facility['completed_appointments'] / capacity if capacity > 0 else 0
+    for tech in technicians.values():
+        count, assigned = tech['rating_count'], tech['total_appointments']
+        tech['average_rating'] = tech['rating_sum'] / count if count else 0
+        tech['completion_rate'] = (tech['completed_appointments'] / assigned) * 100 if assigned else 0
+
+    average = (Decimal(rating_sum) / review_count if review_count else Decimal('0')).quantize(Decimal('0.01'))
+    Analytics.objects.filter(pk=analytics.pk).update(
+        total_customers=Customer.objects.count(), total_vehicles=Vehicle.objects.count(),
+        total_appointments=total, completed_appointments=total_completed, total_revenue=total_revenue,
+        rating_sum=rating_sum, review_count=review_count, average_rating=average, customer_satisfaction=average,
+        revenue_by_service=services, facility_utilization=facilities, technician_performance=technicians,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0002_facility_image_vehicle_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analytics',
+            name='completed_appointments',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analytics',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='analytics',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(seed_running_totals, migrations.RunPython.noop),
+    ]
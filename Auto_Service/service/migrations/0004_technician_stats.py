@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-17 01:46
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from datetime import datetime, timedelta
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_technician_stats(apps, schema_editor):
+    """Seed the rollups from existing appointments so the signal deltas start from the right totals"""
+    Appointment = apps.get_model('service', 'Appointment')
+    Employee = apps.get_model('service', 'Employee')
+    Review = apps.get_model('service', 'Review')
+    TechnicianStats = apps.get_model('service', 'TechnicianStats')
+
+    stats = {pk: TechnicianStats(technician_id=pk) for pk in Employee.objects.values_list('id', flat=True)}
+    totals = Appointment.objects.order_by().values('assigned_technician_id').annotate(
+        total=Count('id'), completed=Count('id', filter=Q(status='COMPLETED')),
+    )
+    for row in totals:
+        if row['assigned_technician_id'] in stats:
+            stats[row['assigned_technician_id']].total_assigned = row['total']
+            stats[row['assigned_technician_id']].completed_count = row['completed']
+    ratings = Review.objects.order_by().values('appointment__assigned_technician_id').annotate(
+        rating_sum=Sum('rating'), rating_count=Count('id'),
+    )
+    for row in ratings:
+        if row['appointment__assigned_technician_id'] in stats:
+            stats[row['appointment__assigned_technician_id']].rating_sum = row['rating_sum']
+            stats[row['appointment__assigned_technician_id']].rating_count = row['rating_count']
+    finished = Appointment.objects.filter(status='COMPLETED', actual_end_time__isnull=False).values_list(
+        'assigned_technician_id', 'scheduled_date', 'scheduled_time', 'actual_end_time',
+        'service_type__duration_minutes',
+    )
+    for technician_id, day, start, end, duration in finished.iterator(chunk_size=2000):
+        scheduled = django.utils.timezone.make_aware(datetime.combine(day, start))
+        if technician_id in stats and end <= scheduled + timedelta(minutes=duration):
+            stats[technician_id].on_time_count += 1
+    TechnicianStats.objects.bulk_create(stats.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0003_analytics_running_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TechnicianStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('total_assigned', models.PositiveIntegerField(default=0)),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('on_time_count', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('technician', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='service.employee')),
+            ],
+            options={
+                'verbose_name_plural': 'Technician Stats',
+            },
+        ),
+        migrations.RunPython(populate_technician_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-17 02:01
+
+import django.utils.timezone
+import service.storage
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentBlob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AlterField(
+            model_name='facility',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=service.storage.get_image_storage, upload_to='facility_images/'),
+        ),
+        migrations.AlterField(
+            model_name='repairshop',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, storage=service.storage.get_image_storage, upload_to='shop_logos/'),
+        ),
+        migrations.AlterField(
+            model_name='vehicle',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=service.storage.get_image_storage, upload_to='vehicle_images/'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-17 02:17
+
+from django.db import migrations, models
+
+
+def count_unread(apps, schema_editor):
+    BaseUser = apps.get_model('service', 'BaseUser')
+    Notification = apps.get_model('service', 'Notification')
+    users_by_count = {}
+    for user_id, unread in (Notification.objects.filter(is_read=False).values('user_id')
+                            .annotate(unread=models.Count('id')).values_list('user_id', 'unread')):
+        users_by_count.setdefault(unread, []).append(user_id)
+    for unread, user_ids in users_by_count.items():
+        BaseUser.objects.filter(id__in=user_ids).update(unread_notifications=unread)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0007_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='baseuser',
+            name='unread_notifications',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_unread, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:08
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0010_facility_day_load'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventLogArchive',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('month', models.DateField(help_text='First day of the archived month')),
+                ('part', models.PositiveSmallIntegerField(default=1)),
+                ('name', models.CharField(max_length=200)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('first_event_at', models.DateTimeField(blank=True, null=True)),
+                ('last_event_at', models.DateTimeField(blank=True, null=True)),
+                ('purged', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['month', 'part'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'part'), name='event_log_archive_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.3 on 2026-10-17 03:35
+
+import calendar
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def add_months(day, months):
+    """``day`` moved ``months`` calendar months ahead, clamped to the end of shorter months.
+
+    A frozen copy of service.maintenance.add_months, so this migration keeps working if that module changes.
+    """
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def log_sent_reminders(apps, schema_editor):
+    """Record the reminders already sent as notifications so the job does not send them again"""
+    Appointment = apps.get_model('service', 'Appointment')
+    MaintenanceReminderLog = apps.get_model('service', 'MaintenanceReminderLog')
+    Notification = apps.get_model('service', 'Notification')
+
+    reminded = Notification.objects.filter(type='MAINTENANCE_DUE', related_appointment__isnull=False)
+    visits = (Appointment.objects.filter(id__in=reminded.values('related_appointment_id'),
+                                         service_type__maintenance_interval_months__isnull=False)
+              .annotate(served=Coalesce(TruncDate('actual_end_time'), 'scheduled_date'))
+              .values_list('id', 'served', 'service_type__maintenance_interval_months'))
+    batch = uuid.uuid4()
+    MaintenanceReminderLog.objects.bulk_create(
+        [MaintenanceReminderLog(appointment_id=pk, due_date=add_months(served, interval), batch=batch)
+         for pk, served, interval in visits.iterator()],
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0011_event_log_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenanceReminderLog',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('due_date', models.DateField()),
+                ('batch', models.UUIDField(db_index=True)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_reminder_logs', to='service.appointment')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [models.UniqueConstraint(fields=('appointment', 'due_date'), name='maintenance_reminder_log_unique')],
+            },
+        ),
+        migrations.RunPython(log_sent_reminders, migrations.RunPython.noop),
+    ]
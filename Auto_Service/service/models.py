@@ -1,23 +1,65 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User, Group
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
 import uuid
 from datetime import datetime, timedelta, date
+from django.db.models.fields.files import FieldFile
+from .storage import get_image_storage
 
 class BaseModel(models.Model):
     """Abstract base model with UUID primary key"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    created_at = models.DateTimeField(default=timezone.now)
+    # Indexed because every admin changelist (BaseModelAdmin) and most listings sort by it
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         abstract = True
 
-class BaseUser(BaseModel):
+class LoadedStateMixin:
+    """Remember the persisted field values so save/delete signals can compute deltas"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        saved = {
+            f.attname: self._loaded_value(self.__dict__[f.attname])
+            for f in self._meta.concrete_fields
+            if f.attname in self.__dict__ and (update_fields is None or f.name in update_fields)
+        }
+        if update_fields is None or not hasattr(self, '_loaded_values'):
+            self._loaded_values = saved
+        else:
+            self._loaded_values.update(saved)
+
+    @staticmethod
+    def _loaded_value(value):
+        # FieldFile.save() renames the file object in place; keep the persisted name instead
+        return value.name if isinstance(value, FieldFile) else value
+
+    def get_loaded_state(self, fields):
+        """Values of ``fields`` as last read from / written to the database, None for new rows"""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        # Deferred fields were not written by this save, so their current value is the old one
+        return {f: loaded[f] if f in loaded else getattr(self, f) for f in fields}
+
+    def get_state(self, fields):
+        return {f: getattr(self, f) for f in fields}
+
+class BaseUser(LoadedStateMixin, BaseModel):
     USER_TYPES = [
         ('ADMIN', 'Administrator'),
         ('OWNER', 'Owner'),
@@ -33,6 +75,8 @@ class BaseUser(BaseModel):
     user_type = models.CharField(max_length=20, choices=USER_TYPES)
     phone_number = models.CharField(max_length=15)
     address = models.TextField()
+    # Denormalised count of unread notifications (see service/notifications.py)
+    unread_notifications = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.get_user_type_display()}"
@@ -51,19 +95,41 @@ class Employee(BaseModel):
     def __str__(self):
         return f"{self.base_user.user.get_full_name()} - {self.base_user.get_user_type_display()}"
 
+    def get_stats(self):
+        """Materialised performance rollup (select_related('stats') to avoid the extra query)"""
+        try:
+            return self.stats
+        except TechnicianStats.DoesNotExist:
+            return None
+
     @property
     def average_rating(self):
-        return self.assigned_appointments.filter(
-            review__isnull=False
-        ).aggregate(avg_rating=models.Avg('review__rating'))['avg_rating'] or 0
+        stats = self.get_stats()
+        if stats is None or stats.rating_count == 0:
+            return 0
+        return stats.rating_sum / stats.rating_count
 
     @property
     def completion_rate(self):
-        total = self.assigned_appointments.count()
-        if total == 0:
+        stats = self.get_stats()
+        if stats is None or stats.total_assigned == 0:
             return 0
-        completed = self.assigned_appointments.filter(status='COMPLETED').count()
-        return (completed / total) * 100
+        return (stats.completed_count / stats.total_assigned) * 100
+
+class TechnicianStats(BaseModel):
+    """Per-technician performance counters, kept current by the appointment/review signals"""
+    technician = models.OneToOneField(Employee, on_delete=models.CASCADE, related_name='stats')
+    total_assigned = models.PositiveIntegerField(default=0)
+    completed_count = models.PositiveIntegerField(default=0)
+    on_time_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Technician Stats'
+
+    def __str__(self):
+        return f"Stats for {self.technician}"
 
 class Customer(BaseModel):
     base_user = models.OneToOneField(BaseUser, on_delete=models.CASCADE)
@@ -76,7 +142,7 @@ class Customer(BaseModel):
     def __str__(self):
         return f"{self.base_user.user.get_full_name()}"
 
-class Notification(BaseModel):
+class Notification(LoadedStateMixin, BaseModel):
     NOTIFICATION_TYPES = [
         ('MAINTENANCE_DUE', 'Maintenance Due'),
         ('APPOINTMENT_REMINDER', 'Appointment Reminder'),
@@ -95,6 +161,11 @@ class Notification(BaseModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # unread badge count in get_base_context and the per-user notification lists
+            models.Index(fields=['user', 'is_read'], name='notification_user_read_idx'),
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.type} for {self.user}"
@@ -145,7 +216,7 @@ class Schedule(BaseModel):
     def __str__(self):
         return f"Schedule for {self.facility}"
 
-class Vehicle(BaseModel):
+class Vehicle(LoadedStateMixin, BaseModel):
     owner = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='vehicles')
     vin = models.CharField(max_length=17, unique=True)
     make = models.CharField(max_length=50)
@@ -162,7 +233,7 @@ class Vehicle(BaseModel):
     next_maintenance_date = models.DateField(null=True, blank=True)
     mileage = models.PositiveIntegerField(default=0)
     last_service_date = models.DateField(null=True, blank=True)
-    image = models.ImageField(upload_to='vehicle_images/', null=True, blank=True)
+    image = models.ImageField(upload_to='vehicle_images/', storage=get_image_storage, null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
@@ -170,7 +241,7 @@ class Vehicle(BaseModel):
     def __str__(self):
         return f"{self.year} {self.make} {self.model} ({self.license_plate})"
 
-class Facility(BaseModel):
+class Facility(LoadedStateMixin, BaseModel):
     FACILITY_TYPES = [
         ('OFFICE', 'Office'),
         ('TUNING', 'Tuning Facility'),
@@ -189,7 +260,7 @@ class Facility(BaseModel):
     repair_shop = models.ForeignKey('RepairShop', on_delete=models.CASCADE, related_name='facilities')
     capacity = models.PositiveIntegerField(default=1)
     equipment = models.ManyToManyField('Equipment', blank=True)
-    image = models.ImageField(upload_to='facility_images/', null=True, blank=True)
+    image = models.ImageField(upload_to='facility_images/', storage=get_image_storage, null=True, blank=True)
 
     def save(self, *args, **kwargs):
         if not self.repair_shop_id:
@@ -222,10 +293,24 @@ class Equipment(BaseModel):
     def __str__(self):
         return f"{self.name} - {self.get_status_display()}"
 
+class ContentBlob(BaseModel):
+    """One stored image file (see service/storage.py), shared by every field that uploaded the same bytes"""
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
 def get_default_founded_date():
     return date(2010, 1, 1)
 
-class RepairShop(BaseModel):
+# Process-wide copy of the RepairShop row: [version stamp it was loaded under, shop or None]; the stamp lives in
+# the 'shared' cache so that a save in one process retires the copies of all the others
+_repair_shop_cache = [None, None]
+REPAIR_SHOP_VERSION_KEY = 'repairshop:version'
+
+class RepairShop(LoadedStateMixin, BaseModel):
     """Model representing the auto repair shop business - implemented as a singleton"""
     name = models.CharField(max_length=100)
     address = models.CharField(max_length=200)
@@ -237,7 +322,7 @@ class RepairShop(BaseModel):
     tax_id = models.CharField(max_length=50)
     registration_number = models.CharField(max_length=50, default="FN123456a")
     founded_date = models.DateField(default=get_default_founded_date)
-    logo = models.ImageField(upload_to='shop_logos/', null=True, blank=True)
+    logo = models.ImageField(upload_to='shop_logos/', storage=get_image_storage, null=True, blank=True)
     owner = models.ForeignKey('BaseUser', on_delete=models.PROTECT, limit_choices_to={'user_type': 'OWNER'})
 
     def save(self, *args, **kwargs):
@@ -246,10 +331,35 @@ class RepairShop(BaseModel):
             raise ValidationError('Only one repair shop instance can exist.')
         return super(RepairShop, self).save(*args, **kwargs)
 
+    @classmethod
+    def cached(cls):
+        """The shop (or None) from a process-wide copy; treat it as read-only.
+
+        The copy is reloaded when the version stamp in the shared cache changes, which every save or
+        delete of the shop does (see the receivers below), so all processes pick up admin edits.
+        """
+        stamps = caches['shared']
+        version = stamps.get(REPAIR_SHOP_VERSION_KEY)
+        if version is None:
+            # first process after a cache flush: start a new epoch (add() keeps a concurrent bump)
+            stamps.add(REPAIR_SHOP_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            version = stamps.get(REPAIR_SHOP_VERSION_KEY)
+        loaded_version, shop = _repair_shop_cache
+        if version is None or loaded_version != version:
+            shop = cls.objects.first()
+            _repair_shop_cache[:] = [version, shop]
+        return shop
+
+    @classmethod
+    def clear_cache(cls):
+        """Retire every process's cached copy"""
+        caches['shared'].set(REPAIR_SHOP_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        _repair_shop_cache[:] = [None, None]
+
     @classmethod
     def get_instance(cls):
         """Get the single repair shop instance or raise an error if it doesn't exist"""
-        instance = cls.objects.first()
+        instance = cls.cached()
         if instance is None:
             raise ValidationError('No repair shop instance exists. Create one through the admin interface.')
         return instance
@@ -280,6 +390,10 @@ class Analytics(BaseModel):
     revenue_by_service = models.JSONField(default=dict)  # Store per-service revenue
     peak_hours = models.JSONField(default=dict)  # Store busy hours data
     customer_demographics = models.JSONField(default=dict)  # Store customer statistics
+    # Running sums kept by service.analytics so the averages can be adjusted incrementally
+    completed_appointments = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    review_count = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
@@ -288,59 +402,9 @@ class Analytics(BaseModel):
         super(Analytics, self).save(*args, **kwargs)
 
     def update_statistics(self):
-        """Update all analytics fields based on current data"""
-        from django.db.models import Avg, Count
-        from django.utils import timezone
-
-        # Update basic counts
-        self.total_customers = Customer.objects.count()
-        self.total_vehicles = Vehicle.objects.count()
-
-        # Calculate customer satisfaction
-        reviews = Review.objects.all()
-        self.customer_satisfaction = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-
-        # Calculate facility utilization
-        facilities = Facility.objects.all()
-        self.facility_utilization = {
-            str(facility.id): {
-                'name': facility.name,
-                'total_appointments': facility.service_types.filter(
-                    appointments__scheduled_date__gte=timezone.now() - timezone.timedelta(days=30)
-                ).count(),
-                'utilization_rate': facility.service_types.filter(
-                    appointments__status='COMPLETED'
-                ).count() / facility.capacity if facility.capacity > 0 else 0
-            }
-            for facility in facilities
-        }
-
-        # Calculate technician performance
-        technicians = Employee.objects.filter(base_user__user_type='TECHNICIAN')
-        self.technician_performance = {
-            str(tech.id): {
-                'name': tech.base_user.user.get_full_name(),
-                'completed_appointments': tech.assigned_appointments.filter(status='COMPLETED').count(),
-                'average_rating': tech.average_rating,
-                'completion_rate': tech.completion_rate
-            }
-            for tech in technicians
-        }
-
-        # Calculate revenue by service
-        services = ServiceType.objects.all()
-        self.revenue_by_service = {
-            str(service.id): {
-                'name': service.name,
-                'total_revenue': sum(
-                    appointment.final_cost or 0
-                    for appointment in service.appointments.filter(status='COMPLETED')
-                )
-            }
-            for service in services
-        }
-
-        self.save()
+        """Rebuild all analytics fields from grouped aggregate queries"""
+        from .analytics import rebuild
+        rebuild(self)
 
     class Meta:
         verbose_name_plural = "Analytics"
@@ -349,11 +413,12 @@ class Analytics(BaseModel):
         return f"Analytics for {self.repair_shop}"
 
 @receiver(post_save, sender=RepairShop)
-def create_repair_shop_analytics(sender, instance, created, **kwargs):
+def create_repair_shop_analytics(sender, instance, created, raw=False, **kwargs):
     """
     Signal handler to automatically create Analytics instance when RepairShop is created
     """
-    if created:
+    # fixtures carry the shop's analytics row themselves
+    if created and not raw:
         Analytics.objects.create(repair_shop=instance)
 
 class ServiceType(BaseModel):
@@ -378,13 +443,14 @@ class Certification(BaseModel):
     def __str__(self):
         return self.name
 
-class Appointment(BaseModel):
+class Appointment(LoadedStateMixin, BaseModel):
     STATUS_CHOICES = [
         ('SCHEDULED', 'Scheduled'),
         ('IN_PROGRESS', 'In Progress'),
         ('COMPLETED', 'Completed'),
         ('CANCELLED', 'Cancelled'),
     ]
+    ACTIVE_STATUSES = ('SCHEDULED', 'IN_PROGRESS')
 
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='appointments')
     vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='appointments')
@@ -403,6 +469,21 @@ class Appointment(BaseModel):
 
     class Meta:
         ordering = ['-scheduled_date', '-scheduled_time']
+        indexes = [
+            # customer dashboard / appointment lists: vehicle__owner -> (vehicle, status, date)
+            models.Index(fields=['vehicle', 'status', 'scheduled_date'], name='appt_vehicle_status_date_idx'),
+            # technician dashboard / schedule
+            models.Index(fields=['assigned_technician', 'scheduled_date'], name='appt_tech_date_idx'),
+            # partial indexes: only the (small) set of open appointments is searched by date
+            models.Index(fields=['scheduled_date', 'scheduled_time'], name='appt_active_date_idx',
+                         condition=models.Q(status__in=['SCHEDULED', 'IN_PROGRESS'])),
+            models.Index(fields=['assigned_technician', 'scheduled_date', 'scheduled_time'],
+                         name='appt_tech_active_date_idx',
+                         condition=models.Q(status__in=['SCHEDULED', 'IN_PROGRESS'])),
+            # reminder sweep: status = 'SCHEDULED' and a date range; unlike the partial indexes this one is also
+            # usable when the status arrives as a bound parameter (SQLite cannot match those to a partial index)
+            models.Index(fields=['status', 'scheduled_date', 'scheduled_time'], name='appt_status_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.service_type} for {self.vehicle} on {self.scheduled_date}"
@@ -411,12 +492,15 @@ class Appointment(BaseModel):
     def is_on_time(self):
         if not self.actual_end_time or not self.scheduled_time:
             return None
-        scheduled_datetime = timezone.make_aware(
-            datetime.combine(self.scheduled_date, self.scheduled_time)
-        )
-        return self.actual_end_time <= scheduled_datetime + timedelta(minutes=self.service_type.duration_minutes)
+        return finished_on_time(self.scheduled_date, self.scheduled_time, self.actual_end_time,
+                                self.service_type.duration_minutes)
+
+def finished_on_time(scheduled_date, scheduled_time, actual_end_time, duration_minutes):
+    """True when the work ended within the booked duration of the scheduled start"""
+    scheduled_datetime = timezone.make_aware(datetime.combine(scheduled_date, scheduled_time))
+    return actual_end_time <= scheduled_datetime + timedelta(minutes=duration_minutes)
 
-class Review(BaseModel):
+class Review(LoadedStateMixin, BaseModel):
     appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE, related_name='review')
     rating = models.PositiveIntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(5)]
@@ -452,6 +536,9 @@ class Message(BaseModel):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at'], name='message_recipient_created_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender} to {self.recipient}: {self.subject}"
@@ -531,21 +618,363 @@ class TechnicianAvailability(BaseModel):
     def __str__(self):
         return f"{self.technician} - {self.date} ({self.start_time}-{self.end_time})"
 
+class Job(BaseModel):
+    """A unit of background work (see service/jobs.py), claimed by ``run_worker`` processes with a lease"""
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    priority = models.SmallIntegerField(default=0, help_text='Higher runs first')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # workers only ever search the (small) set of unfinished jobs
+            models.Index(fields=['status', 'run_at'], name='job_pending_idx',
+                         condition=models.Q(status__in=['QUEUED', 'RUNNING'])),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.get_status_display()})"
+
+class JobSchedule(BaseModel):
+    """A recurring job; rows are synced from settings.JOB_SCHEDULES by the worker"""
+    name = models.CharField(max_length=100, unique=True)
+    task = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    interval_seconds = models.PositiveIntegerField()
+    next_run_at = models.DateTimeField(default=timezone.now)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.name} every {self.interval_seconds}s"
+
+class ReminderLog(BaseModel):
+    """An (appointment, reminder window) pair already handled by service/reminders.py"""
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='reminder_logs')
+    window = models.CharField(max_length=20)
+    # the run that inserted the row; lets a run tell its own inserts from those of an overlapping worker
+    batch = models.UUIDField(db_index=True)
+    notified = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'window'], name='reminder_log_unique_window'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} reminder for {self.appointment_id}"
+
+class MaintenanceReminderLog(BaseModel):
+    """A (service visit, due date) pair already reminded about by service/maintenance.py"""
+    appointment = models.ForeignKey(Appointment, on_delete=models.CASCADE, related_name='maintenance_reminder_logs')
+    due_date = models.DateField()
+    # the run that inserted the row; lets a run tell its own inserts from those of an overlapping worker
+    batch = models.UUIDField(db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['appointment', 'due_date'], name='maintenance_reminder_log_unique'),
+        ]
+
+    def __str__(self):
+        return f"Maintenance due {self.due_date} after {self.appointment_id}"
+
+class FacilityDayLoad(BaseModel):
+    """Appointments not cancelled on one facility-day; the counter bookings claim against (service/capacity.py)"""
+    facility = models.ForeignKey(Facility, on_delete=models.CASCADE, related_name='day_loads')
+    date = models.DateField()
+    booked = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['facility', 'date'], name='facility_day_load_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.facility_id} on {self.date}: {self.booked}"
+
+class EventLogArchive(BaseModel):
+    """One gzip JSONL file of EventLog rows moved out of the table (service/retention.py)"""
+    month = models.DateField(help_text='First day of the archived month')
+    part = models.PositiveSmallIntegerField(default=1)
+    name = models.CharField(max_length=200)
+    rows = models.PositiveIntegerField(default=0)
+    size = models.PositiveBigIntegerField(default=0)
+    first_event_at = models.DateTimeField(null=True, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+    # set once the archived rows have been deleted from EventLog
+    purged = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['month', 'part']
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'part'], name='event_log_archive_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} part {self.part}: {self.rows} events"
+
 @receiver(post_save, sender=Facility)
-def create_facility_schedule(sender, instance, created, **kwargs):
+def create_facility_schedule(sender, instance, created, raw=False, **kwargs):
     """
     Signal handler to automatically create Schedule instance when Facility is created
     """
-    if created:
+    # fixtures carry the facility's schedule themselves
+    if created and not raw:
         Schedule.objects.create(facility=instance)
 
 @receiver(post_save, sender=Appointment)
-def update_vehicle_last_service(sender, instance, **kwargs):
+def update_vehicle_last_service(sender, instance, raw=False, **kwargs):
     """Ensure Vehicle.last_service_date reflects the most recent completed appointment."""
-    if instance.status == 'COMPLETED' and instance.vehicle_id:
-        # Determine service date: prefer actual_end_time date, else scheduled_date
-        service_date = (instance.actual_end_time.date() if instance.actual_end_time else instance.scheduled_date)
-        vehicle = instance.vehicle
-        if vehicle.last_service_date is None or service_date > vehicle.last_service_date:
-            vehicle.last_service_date = service_date
-            vehicle.save(update_fields=['last_service_date'])
\ No newline at end of file
+    if raw or instance.status != 'COMPLETED' or not instance.vehicle_id:
+        return
+    # Determine service date: prefer actual_end_time date, else scheduled_date
+    service_date = (timezone.localdate(instance.actual_end_time) if instance.actual_end_time
+                    else instance.scheduled_date)
+    # One conditional UPDATE instead of loading and saving the vehicle; a concurrent later date is never overwritten
+    Vehicle.objects.filter(
+        models.Q(last_service_date__isnull=True) | models.Q(last_service_date__lt=service_date),
+        pk=instance.vehicle_id,
+    ).update(last_service_date=service_date)
+
+@receiver(post_save, sender=RepairShop)
+@receiver(post_delete, sender=RepairShop)
+def invalidate_repair_shop_cache(sender, **kwargs):
+    RepairShop.clear_cache()
+    # again after commit, in case a request reloaded the old row before the transaction finished
+    transaction.on_commit(RepairShop.clear_cache)
+
+# ---------------------- Incremental analytics ----------------------
+
+@receiver(post_save, sender=Appointment)
+def track_appointment_analytics(sender, instance, raw=False, **kwargs):
+    """Fold the before/after state of a saved appointment into the running analytics totals."""
+    if raw:
+        return
+    from .analytics import APPOINTMENT_FIELDS, record_appointment_change
+    record_appointment_change(instance.get_loaded_state(APPOINTMENT_FIELDS), instance.get_state(APPOINTMENT_FIELDS))
+
+@receiver(post_delete, sender=Appointment)
+def untrack_appointment_analytics(sender, instance, **kwargs):
+    from .analytics import APPOINTMENT_FIELDS, record_appointment_change
+    record_appointment_change(instance.get_loaded_state(APPOINTMENT_FIELDS) or instance.get_state(APPOINTMENT_FIELDS), None)
+
+@receiver(post_save, sender=Review)
+def track_review_analytics(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .analytics import REVIEW_FIELDS, record_review_change
+    record_review_change(instance.get_loaded_state(REVIEW_FIELDS), instance.get_state(REVIEW_FIELDS))
+
+@receiver(post_delete, sender=Review)
+def untrack_review_analytics(sender, instance, **kwargs):
+    from .analytics import REVIEW_FIELDS, record_review_change
+    record_review_change(instance.get_loaded_state(REVIEW_FIELDS) or instance.get_state(REVIEW_FIELDS), None)
+
+@receiver(post_save, sender=Employee)
+def create_technician_stats(sender, instance, created, raw=False, **kwargs):
+    """Every employee gets an (empty) stats row so the signal updates always have a target"""
+    if created and not raw:
+        TechnicianStats.objects.get_or_create(technician=instance)
+
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=Vehicle)
+def count_created_customers_and_vehicles(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from .analytics import record_count_change
+        record_count_change(**{'customers' if sender is Customer else 'vehicles': 1})
+
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=Vehicle)
+def count_deleted_customers_and_vehicles(sender, instance, **kwargs):
+    from .analytics import record_count_change
+    record_count_change(**{'customers' if sender is Customer else 'vehicles': -1})
+
+# ---------------------- Unread notification counters ----------------------
+
+NOTIFICATION_FIELDS = ('user_id', 'is_read')
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def count_unread_notifications(sender, instance, signal, raw=False, **kwargs):
+    """Keep BaseUser.unread_notifications in step with created, read and deleted notifications"""
+    if raw:
+        return
+    from .notifications import record_notification_change
+    old = instance.get_loaded_state(NOTIFICATION_FIELDS)
+    if signal is post_save:
+        record_notification_change(old, instance.get_state(NOTIFICATION_FIELDS))
+    else:
+        record_notification_change(old or instance.get_state(NOTIFICATION_FIELDS), None)
+
+# ---------------------- Slot availability cache ----------------------
+
+SLOT_FIELDS = ('status', 'service_type_id', 'scheduled_date', 'scheduled_time')
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_appointment_slots(sender, instance, signal, raw=False, **kwargs):
+    """Drop the cached free-slot timelines of the days a booking left or entered"""
+    if raw:
+        return
+    from .slots import invalidate_appointment
+    old = instance.get_loaded_state(SLOT_FIELDS)
+    new = instance.get_state(SLOT_FIELDS) if signal is post_save else None
+    if signal is post_delete and old is None:
+        old = instance.get_state(SLOT_FIELDS)
+    service_type = instance.service_type if Appointment.service_type.is_cached(instance) else None
+    invalidate_appointment(old, new, service_type)
+
+@receiver(post_save, sender=Facility)
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=FacilityClosure)
+@receiver(post_delete, sender=FacilityClosure)
+@receiver(post_save, sender=ServiceType)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=TechnicianAvailability)
+@receiver(post_delete, sender=TechnicianAvailability)
+def invalidate_facility_slots(sender, instance, raw=False, **kwargs):
+    """Hours, capacity, closures, staff and durations change every cached day of a facility"""
+    if raw:
+        return
+    from .slots import invalidate_facility
+    if sender is Facility:
+        facility_id = instance.pk
+    elif sender is TechnicianAvailability:
+        facility_id = Employee.objects.filter(pk=instance.technician_id).values_list('facility_id', flat=True).first()
+    else:
+        facility_id = instance.facility_id
+    if facility_id:
+        invalidate_facility(facility_id)
+
+# ---------------------- Technician assignment index ----------------------
+
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+@receiver(post_save, sender=ServiceType)
+@receiver(post_delete, sender=ServiceType)
+@receiver(m2m_changed, sender=Employee.specializations.through)
+def invalidate_assignment_index(sender, raw=False, **kwargs):
+    """Staff, specialisations and services decide who may be assigned what"""
+    if raw:
+        return
+    from .assignment import invalidate_index
+    invalidate_index()
+
+@receiver(post_save, sender=BaseUser)
+def invalidate_assignment_index_on_role_change(sender, instance, created, raw=False, **kwargs):
+    """Only technicians are assigned work, so a role change adds or removes one"""
+    if raw or created:
+        return
+    old = instance.get_loaded_state(('user_type',))
+    if old is None or old['user_type'] != instance.user_type:
+        from .assignment import invalidate_index
+        invalidate_index()
+
+# ---------------------- Appointment reminders ----------------------
+REMINDER_FIELDS = ('id', 'scheduled_date', 'scheduled_time')
+
+@receiver(post_save, sender=Appointment)
+def reset_appointment_reminders(sender, instance, created, raw=False, **kwargs):
+    """A rescheduled appointment gets its reminders again for the new date"""
+    if raw or created:
+        return
+    from .reminders import forget_reminders
+    forget_reminders(instance.get_loaded_state(REMINDER_FIELDS), instance.get_state(REMINDER_FIELDS))
+
+# ---------------------- Live events ----------------------
+
+@receiver(post_save, sender=Notification)
+def publish_notification_event(sender, instance, created, raw=False, **kwargs):
+    """Push new notifications to the owner's open event streams"""
+    if raw or not created:
+        return
+    from .events import publish_notifications
+    publish_notifications([instance])
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_event(sender, instance, created, raw=False, **kwargs):
+    """Push status transitions to the customer's and technician's open event streams"""
+    if raw:
+        return
+    old = instance.get_loaded_state(('status',))
+    if old is None or old['status'] != instance.status:
+        from .events import publish_appointment
+        publish_appointment(instance)
+
+# ---------------------- Facility day load ----------------------
+
+LOAD_FIELDS = ('status', 'service_type_id', 'scheduled_date')
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def count_facility_day_load(sender, instance, signal, raw=False, **kwargs):
+    """Keep FacilityDayLoad.booked in step with the non-cancelled appointments of each facility-day"""
+    if raw:
+        return
+    if getattr(instance, '_day_load_claimed', False):
+        # create_appointment already counted it with capacity.claim
+        instance._day_load_claimed = False
+        return
+    from .capacity import record_load_changes
+    old = instance.get_loaded_state(LOAD_FIELDS)
+    new = instance.get_state(LOAD_FIELDS) if signal is post_save else None
+    if signal is post_delete and old is None:
+        old = instance.get_state(LOAD_FIELDS)
+    service_type = instance.service_type if Appointment.service_type.is_cached(instance) else None
+    record_load_changes([(old, new)], {service_type.pk: service_type.facility_id} if service_type else None)
+
+# ---------------------- Content-addressed images ----------------------
+
+IMAGE_FIELDS = {Vehicle: 'image', Facility: 'image', RepairShop: 'logo'}
+
+def _file_name(value):
+    return getattr(value, 'name', value) or None
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_save, sender=Facility)
+@receiver(post_save, sender=RepairShop)
+def track_image_references(sender, instance, raw=False, **kwargs):
+    """Move one blob reference from the previously saved file to the new one"""
+    if raw:
+        return
+    field = IMAGE_FIELDS[sender]
+    loaded = instance.get_loaded_state([field])
+    old = _file_name(loaded[field]) if loaded else None
+    new = _file_name(getattr(instance, field))
+    if old != new:
+        from .storage import release, retain
+        retain([new])
+        release([old])
+        if new:
+            # build the resized variants in the background rather than on the first page view
+            from .jobs import enqueue
+            enqueue('build_image_derivatives', {'model': instance._meta.label, 'pk': str(instance.pk), 'field': field})
+
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_delete, sender=Facility)
+@receiver(post_delete, sender=RepairShop)
+def release_image_references(sender, instance, **kwargs):
+    from .storage import release
+    field = IMAGE_FIELDS[sender]
+    state = instance.get_loaded_state([field]) or instance.get_state([field])
+    release([_file_name(state[field])])
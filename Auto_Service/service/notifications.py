@@ -0,0 +1,79 @@
+"""
+Unread notification counters.
+
+``BaseUser.unread_notifications`` replaces the COUNT the page header used to
+run on every request. It is adjusted with single ``F()`` UPDATEs: by the
+Notification signal handlers in models.py for ordinary saves and deletes,
+and explicitly by the bulk paths here (``bulk_notify``, ``mark_read``), which
+bypass signals. ``bulk_notify`` likewise publishes to open event streams
+(events.py) itself. ``reconcile_unread`` (``manage.py reconcile_unread_counts``)
+recomputes the counters from the notifications table and repairs any drift.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+
+from .events import publish_notifications
+from .models import BaseUser, Notification
+
+
+def adjust_unread(deltas):
+    """Apply ``{base_user_id: delta}``; users sharing a delta are updated by one statement"""
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        BaseUser.objects.filter(id__in=user_ids).update(
+            unread_notifications=Greatest(F('unread_notifications') + delta, 0))
+
+
+def record_notification_change(old, new):
+    """Counter deltas for one notification; ``old`` / ``new`` are (user_id, is_read) states or None"""
+    deltas = Counter()
+    if old and not old['is_read']:
+        deltas[old['user_id']] -= 1
+    if new and not new['is_read']:
+        deltas[new['user_id']] += 1
+    adjust_unread(deltas)
+
+
+def bulk_notify(notifications, batch_size=1000):
+    """bulk_create ``notifications`` and count the unread ones; returns the created rows"""
+    with transaction.atomic(savepoint=False):
+        created = Notification.objects.bulk_create(notifications, batch_size=batch_size)
+        adjust_unread(Counter(n.user_id for n in created if not n.is_read))
+        publish_notifications(created)
+    return created
+
+
+def mark_read(base_user, notification_ids=None):
+    """Mark ``base_user``'s unread notifications (optionally only ``notification_ids``) as read.
+
+    The conditional UPDATE only touches rows that are still unread, so concurrent requests never
+    decrement the counter twice for the same notification. Returns the number marked.
+    """
+    unread = Notification.objects.filter(user=base_user, is_read=False)
+    if notification_ids is not None:
+        unread = unread.filter(id__in=notification_ids)
+    with transaction.atomic():
+        marked = unread.update(is_read=True)
+        adjust_unread({base_user.pk: -marked})
+    return marked
+
+
+def reconcile_unread(batch_size=1000, dry_run=False):
+    """Reset every drifted counter to the real unread count; returns the ``(id, stored, actual)`` corrections"""
+    drifted = list(
+        BaseUser.objects.annotate(actual=Count('notifications', filter=Q(notifications__is_read=False)))
+        .exclude(unread_notifications=F('actual'))
+        .values_list('id', 'unread_notifications', 'actual')
+    )
+    if not dry_run:
+        BaseUser.objects.bulk_update(
+            [BaseUser(id=user_id, unread_notifications=actual) for user_id, _, actual in drifted],
+            ['unread_notifications'], batch_size=batch_size,
+        )
+    return drifted
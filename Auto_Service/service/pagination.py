@@ -0,0 +1,125 @@
+"""
+Keyset (cursor) pagination for the long per-user lists.
+
+Appointments, notifications, messages and a vehicle's service history used
+to be rendered in full. ``paginate`` returns one page of a queryset ordered
+by a unique key such as ``('-created_at', '-id')``: instead of an OFFSET
+(which makes the database walk every earlier row) the next page filters on
+"after the last row shown", so page 50 costs the same indexed range scan as
+page 1. The position travels as an opaque URL-safe cursor holding the last
+row's ordering values; it stays valid while rows are added or removed.
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from uuid import UUID
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """The rows of one page and the cursor of the next one (None on the last page)"""
+
+    def __init__(self, items, next_cursor=None, cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def is_first(self):
+        return not self.cursor
+
+
+def page_size(value=None):
+    """``value`` (e.g. a ``?limit=`` parameter) clamped to 1..MAX_PAGE_SIZE; the configured default when empty"""
+    if value in (None, ''):
+        return getattr(settings, 'LIST_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor('limit must be a number.')
+    return min(max(value, 1), MAX_PAGE_SIZE)
+
+
+def _dump(value):
+    # full precision: DjangoJSONEncoder would cut datetimes to milliseconds and skip rows on the boundary
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_dump(value) for value in values], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, model, fields):
+    """The ordering values stored in ``cursor``, converted back to the Python types of ``fields``"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor('Malformed cursor.')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Cursor does not match this list.')
+    try:
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+    except (FieldDoesNotExist, ValidationError):
+        raise InvalidCursor('Cursor does not match this list.')
+
+
+def after(ordering, values):
+    """``Q`` selecting the rows that sort after ``values`` in ``ordering`` (mixed directions allowed)"""
+    fields = [name.lstrip('-') for name in ordering]
+    condition = Q()
+    for i, name in enumerate(ordering):
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        condition |= Q(**dict(zip(fields[:i], values[:i])), **{f'{fields[i]}__{lookup}': values[i]})
+    # the redundant bound on the leading column lets the database seek the index instead of filtering
+    lead = 'lte' if ordering[0].startswith('-') else 'gte'
+    return Q(**{f'{fields[0]}__{lead}': values[0]}) & condition
+
+
+def paginate(queryset, ordering, cursor=None, size=None):
+    """One ``KeysetPage`` of ``queryset``; ``ordering`` must end in a unique column (normally ``id``).
+
+    Ordering fields must be concrete columns of the queryset's model. Raises ``InvalidCursor`` for a
+    cursor that was not produced for this ordering.
+    """
+    size = size or page_size()
+    fields = [name.lstrip('-') for name in ordering]
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(after(ordering, decode_cursor(cursor, queryset.model, fields)))
+    # one extra row tells whether there is a next page without a COUNT
+    rows = list(queryset[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor([getattr(rows[-1], field) for field in fields])
+    return KeysetPage(rows, next_cursor, cursor)
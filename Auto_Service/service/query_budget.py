@@ -0,0 +1,123 @@
+"""
+Per-route SQL query budgets.
+
+``QUERY_BUDGETS`` declares, for every named route in service/urls.py, the
+role it is exercised as and the maximum number of queries / total SQL time
+it may spend against a dataset of ``BUDGET_SCALE``. The budget tests in
+service/tests.py fail when a view exceeds its budget; at runtime
+``QueryBudgetMiddleware`` measures every request, logs the figures and, when
+enabled, returns them as ``X-DB-Queries`` / ``X-DB-Time-Ms`` headers.
+"""
+import logging
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('service.query_budget')
+
+QueryBudget = namedtuple('QueryBudget', ['role', 'max_queries', 'max_db_ms'])
+
+# Dataset the budgets are declared against (kwargs for datasets.build_scaled_dataset)
+BUDGET_SCALE = {
+    'customers': 12,
+    'technicians': 4,
+    'vehicles_per_customer': 3,
+    'appointments_per_vehicle': 6,
+    'notifications_per_customer': 12,
+}
+
+# role None = anonymous visitor. Authenticated pages pay 3 fixed queries (session, user, base user; the shop
+# is cached per process and the unread count is a BaseUser column). A transition reads the appointments and runs
+# one compare-and-set UPDATE per target status, then 6 statements of side effects: technician stats, the analytics
+# row (read and write), the vehicles, the notification INSERT and its unread counter; a fixed cost however many
+# appointments a batch moves (plus a savepoint pair inside the test transaction). The notification endpoints keep
+# the unread counter in step.
+# The paginated lists are held to the same budget on a page reached with a cursor as on the first page.
+# The events budget covers opening the stream, not the minutes it stays open. Routes that log audit events include
+# their batched INSERT (3 statements inside the test transaction); a server writes it after sending the response.
+# The export budgets leave room for their one SELECT, which runs while the body streams and is not counted here.
+QUERY_BUDGETS = {
+    'landing_page': QueryBudget(None, 4, 100),
+    'login': QueryBudget(None, 1, 50),
+    'signup': QueryBudget(None, 1, 50),
+    'facility_list': QueryBudget(None, 2, 50),
+    'facility_detail': QueryBudget('CUSTOMER', 8, 100),
+    'dashboard': QueryBudget('CUSTOMER', 10, 150),
+    'notifications': QueryBudget('CUSTOMER', 4, 100),
+    'appointments': QueryBudget('CUSTOMER', 6, 100),
+    'messages': QueryBudget('SECRETARY', 5, 100),
+    'vehicle_register': QueryBudget('CUSTOMER', 3, 100),
+    'vehicle_detail': QueryBudget('CUSTOMER', 6, 100),
+    'create_appointment': QueryBudget('CUSTOMER', 7, 100),
+    'appointment_detail': QueryBudget('CUSTOMER', 6, 100),
+    'appointment_cancel': QueryBudget('CUSTOMER', 12, 100),
+    'review_create': QueryBudget('CUSTOMER', 6, 100),
+    'admin_analytics': QueryBudget('MANAGER', 5, 100),
+    'admin_users': QueryBudget('MANAGER', 5, 100),
+    'export_appointments': QueryBudget('MANAGER', 4, 100),
+    'export_revenue': QueryBudget('MANAGER', 4, 100),
+    'export_reviews': QueryBudget('MANAGER', 4, 100),
+    'admin_facilities': QueryBudget('MANAGER', 5, 100),
+    'api_facility_schedule': QueryBudget('CUSTOMER', 4, 50),
+    'api_facility_slots': QueryBudget('CUSTOMER', 9, 50),
+    'api_appointment_start': QueryBudget('TECHNICIAN', 7, 50),
+    'api_appointment_complete': QueryBudget('TECHNICIAN', 16, 50),
+    'api_appointment_transition': QueryBudget('TECHNICIAN', 16, 50),
+    'api_technician_schedule': QueryBudget('CUSTOMER', 4, 50),
+    'api_mark_notification_read': QueryBudget('CUSTOMER', 7, 50),
+    'api_notification_dismiss': QueryBudget('CUSTOMER', 6, 50),
+    'api_notifications': QueryBudget('CUSTOMER', 4, 50),
+    'api_messages': QueryBudget('SECRETARY', 4, 50),
+    'api_appointments': QueryBudget('CUSTOMER', 5, 50),
+    'api_service_history': QueryBudget('CUSTOMER', 6, 50),
+    'events': QueryBudget('CUSTOMER', 6, 50),
+}
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` hook that counts statements and their wall time"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+    @property
+    def milliseconds(self):
+        return self.seconds * 1000
+
+
+class QueryBudgetMiddleware:
+    """Measure queries per request; log them, warn on budget overruns and optionally add debug headers"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.headers = getattr(settings, 'QUERY_BUDGET_HEADERS', settings.DEBUG)
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.url_name if match and match.namespace == 'service' else None
+        logger.debug('%s %s: %d queries, %.1f ms', request.method, request.path, counter.count,
+                     counter.milliseconds)
+        budget = QUERY_BUDGETS.get(route)
+        if budget and (counter.count > budget.max_queries or counter.milliseconds > budget.max_db_ms):
+            logger.warning('%s %s exceeded its query budget: %d/%d queries, %.1f/%d ms', request.method,
+                           request.path, counter.count, budget.max_queries, counter.milliseconds,
+                           budget.max_db_ms)
+        if self.headers:
+            response['X-DB-Queries'] = str(counter.count)
+            response['X-DB-Time-Ms'] = f'{counter.milliseconds:.1f}'
+        return response
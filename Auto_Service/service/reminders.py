@@ -0,0 +1,116 @@
+"""
+Appointment reminders.
+
+``send_reminders`` (job ``send_appointment_reminders``, run every few minutes
+from ``JOB_SCHEDULES``) finds every SCHEDULED appointment starting within the
+widest of ``APPOINTMENT_REMINDER_WINDOWS`` with one range query on the
+(status, date, time) index, and sends each customer one
+APPOINTMENT_REMINDER per window: the narrowest window the appointment is
+in, so a booking made an hour ahead does not get the 24 hour reminder too.
+
+Handled (appointment, window) pairs are recorded in ``ReminderLog``, which
+has a unique constraint on the pair. A run inserts its pairs with
+``ignore_conflicts`` under a fresh batch id and only notifies for the rows
+that carry its own id, so reruns and overlapping workers never send a
+reminder twice. Rescheduling an appointment forgets its pairs (see the
+receiver in models.py).
+"""
+import uuid
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# window name -> minutes before the appointment starts
+DEFAULT_WINDOWS = {'24h': 24 * 60, '2h': 2 * 60}
+
+
+def reminder_windows():
+    """``[(name, lead minutes), ...]``, narrowest first"""
+    windows = getattr(settings, 'APPOINTMENT_REMINDER_WINDOWS', DEFAULT_WINDOWS)
+    return sorted(windows.items(), key=lambda window: window[1])
+
+
+def starting_between(start, end):
+    """``Q`` for appointments starting in [start, end] (naive local datetimes)"""
+    after = Q(scheduled_date__gt=start.date()) | Q(scheduled_date=start.date(), scheduled_time__gte=start.time())
+    before = Q(scheduled_date__lt=end.date()) | Q(scheduled_date=end.date(), scheduled_time__lte=end.time())
+    # the plain date range is what the index is searched by; the rest trims the first and last day
+    return Q(scheduled_date__range=(start.date(), end.date())) & after & before
+
+
+def due_appointments(now, horizon):
+    """SCHEDULED appointments starting between ``now`` and ``horizon``, as tuples for the reminder text"""
+    from .models import Appointment
+
+    # one range scan of appt_status_date_idx
+    return list(Appointment.objects.filter(starting_between(now, horizon), status='SCHEDULED').order_by().values_list(
+        'id', 'scheduled_date', 'scheduled_time', 'customer__base_user_id', 'service_type__name', 'vehicle__make',
+        'vehicle__model',
+    ))
+
+
+def _claim(pairs, narrowest):
+    """Insert ``(appointment_id, window)`` log rows; returns the appointments this call won the narrowest for"""
+    from .models import ReminderLog
+
+    batch = uuid.uuid4()
+    ReminderLog.objects.bulk_create(
+        [ReminderLog(appointment_id=appointment_id, window=window, batch=batch,
+                     notified=window == narrowest[appointment_id]) for appointment_id, window in pairs],
+        ignore_conflicts=True,
+    )
+    return set(ReminderLog.objects.filter(batch=batch, notified=True).values_list('appointment_id', flat=True))
+
+
+def send_reminders(now=None, batch_size=1000):
+    """Send the reminders due at ``now``; returns how many were sent"""
+    from .models import Notification, ReminderLog
+    from .notifications import bulk_notify
+
+    windows = reminder_windows()
+    if not windows:
+        return 0
+    now = timezone.localtime(now).replace(tzinfo=None, second=0, microsecond=0)
+    appointments = due_appointments(now, now + timedelta(minutes=windows[-1][1]))
+
+    sent = 0
+    for offset in range(0, len(appointments), batch_size):
+        chunk = appointments[offset:offset + batch_size]
+        handled = set(ReminderLog.objects.filter(appointment_id__in=[row[0] for row in chunk])
+                      .values_list('appointment_id', 'window'))
+        pairs, narrowest, details = [], {}, {}
+        for appointment_id, day, start, user_id, service, make, model in chunk:
+            starts_in = (datetime.combine(day, start) - now) / timedelta(minutes=1)
+            covering = [name for name, lead in windows if starts_in <= lead]
+            if (appointment_id, covering[0]) in handled:
+                continue
+            # the wider windows are marked handled too, so they do not fire later for the same booking
+            pairs += [(appointment_id, name) for name in covering if (appointment_id, name) not in handled]
+            narrowest[appointment_id] = covering[0]
+            details[appointment_id] = (user_id, service, make, model, day, start)
+        if not pairs:
+            continue
+        with transaction.atomic():
+            notifications = []
+            for appointment_id in _claim(pairs, narrowest):
+                user_id, service, make, model, day, start = details[appointment_id]
+                notifications.append(Notification(
+                    user_id=user_id, type='APPOINTMENT_REMINDER', title='Appointment reminder',
+                    message=(f'Your {service} appointment for the {make} {model} is on '
+                             f'{day:%B} {day.day} at {start:%H:%M}.'),
+                    related_appointment_id=appointment_id,
+                ))
+            bulk_notify(notifications, batch_size=batch_size)
+        sent += len(notifications)
+    return sent
+
+
+def forget_reminders(old, new):
+    """Let a rescheduled appointment be reminded again; ``old`` / ``new`` are REMINDER_FIELDS states"""
+    from .models import ReminderLog
+
+    if old is not None and new is not None and old != new:
+        ReminderLog.objects.filter(appointment_id=new['id']).delete()
@@ -0,0 +1,144 @@
+"""
+Replay the routes in service/urls.py with the Django test client.
+
+The index advisor, the query-budget tests and the view benchmarks all need
+to hit every named route as a given user, filling in the UUID path
+parameters with rows that user can actually see.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.test import Client
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from . import urls
+from .models import Appointment, BaseUser, Employee, Facility, ServiceType, Vehicle
+
+# Routes that only accept POST (require_POST) or must not be replayed at all
+POST_ROUTES = {
+    'api_appointment_start', 'api_appointment_complete', 'api_appointment_transition', 'api_notification_dismiss',
+}
+SKIPPED_ROUTES = {'logout'}
+
+
+def _facility(base_user):
+    return Facility.objects.filter(is_active=True).order_by('name').values_list('id', flat=True).first()
+
+
+def _vehicle(base_user):
+    if base_user is None:
+        return None
+    return Vehicle.objects.filter(owner__base_user=base_user).values_list('id', flat=True).first()
+
+
+def _appointment(base_user):
+    if base_user is None:
+        return None
+    return Appointment.objects.filter(
+        Q(customer__base_user=base_user) | Q(assigned_technician__base_user=base_user)
+    ).values_list('id', flat=True).first()
+
+
+def _technician(base_user):
+    return Employee.objects.filter(base_user__user_type='TECHNICIAN').order_by('hire_date', 'id').values_list(
+        'id', flat=True
+    ).first()
+
+
+def _notification(base_user):
+    if base_user is None:
+        return None
+    return base_user.notifications.values_list('id', flat=True).first()
+
+
+# URL parameter name -> how to pick a value visible to the requesting user
+ROUTE_ARGUMENTS = {
+    'facility_id': _facility,
+    'vehicle_id': _vehicle,
+    'appointment_id': _appointment,
+    'technician_id': _technician,
+    'notification_id': _notification,
+}
+
+
+def _slot_query(kwargs, base_user):
+    service_type = ServiceType.objects.filter(facility_id=kwargs['facility_id']).values_list('id', flat=True).first()
+    return service_type and {'service_type': service_type, 'days': 31}
+
+
+# Route name -> query string parameters (from the reversed URL kwargs), for views that require some
+ROUTE_QUERIES = {
+    'api_facility_slots': _slot_query,
+}
+
+
+def service_routes():
+    """``(name, pattern)`` for every named route of the service app"""
+    return [(pattern.name, pattern) for pattern in urls.urlpatterns
+            if pattern.name and pattern.name not in SKIPPED_ROUTES]
+
+
+def route_url(name, pattern, base_user=None):
+    """Reverse ``name`` with parameters owned by ``base_user``; None when the user has no such row"""
+    kwargs = {}
+    for param in pattern.pattern.converters:
+        value = ROUTE_ARGUMENTS[param](base_user)
+        if value is None:
+            return None
+        kwargs[param] = value
+    url = reverse(f'{urls.app_name}:{name}', kwargs=kwargs)
+    if name in ROUTE_QUERIES:
+        query = ROUTE_QUERIES[name](kwargs, base_user)
+        if not query:
+            return None
+        url = f'{url}?{urlencode(query)}'
+    return url
+
+
+def client_for(username=None):
+    """A test client logged in as ``username`` (anonymous when None) that reports errors as 500s"""
+    host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+    client = Client(raise_request_exception=False, HTTP_HOST=host)
+    if username is not None:
+        client.force_login(User.objects.get(username=username))
+    return client
+
+
+def request_route(client, name, url):
+    if name in POST_ROUTES:
+        return client.post(url, content_type='application/json', data={})
+    return client.get(url)
+
+
+def iter_route_requests(username=None, routes=None):
+    """Yield ``(name, url, perform)`` for each replayable route; ``perform()`` issues the request"""
+    base_user = BaseUser.objects.filter(user__username=username).first() if username else None
+    client = client_for(username)
+    for name, pattern in service_routes():
+        if routes and name not in routes:
+            continue
+        url = route_url(name, pattern, base_user)
+        if url is None:
+            continue
+        yield name, url, (lambda name=name, url=url: request_route(client, name, url))
+
+
+QUIET_LOGGERS = ('django.request', 'service.query_budget')
+
+
+@contextmanager
+def quiet_request_log():
+    """Silence request / budget logging while replaying; the callers report status codes and counts themselves"""
+    loggers = [logging.getLogger(name) for name in QUIET_LOGGERS]
+    levels = [logger.level for logger in loggers]
+    for logger in loggers:
+        logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
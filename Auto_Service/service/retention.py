@@ -0,0 +1,210 @@
+"""
+EventLog retention: old months move out of the table into compressed archives.
+
+The EventLog table keeps the current month and the ``EVENT_LOG_RETENTION_MONTHS
+- 1`` before it (calendar months in the local time zone). ``archive_expired``
+(``manage.py archive_events`` and the daily ``archive-events`` job) moves every
+older month out, one month at a time:
+
+1. the month's rows are streamed with ``iterator()``, oldest first, into
+   ``<EVENT_LOG_ARCHIVE_ROOT>/<yyyy>/events-<yyyy>-<mm>-<part>-<run>.jsonl.gz``
+   (one JSON object per line), written under a temporary name and renamed
+   once complete; ``<run>`` is random, so two overlapping runs (the daily
+   job and a manual ``archive_events``) never write the same file;
+2. an ``EventLogArchive`` row records the file; the unique (month, part)
+   constraint picks one of two runs that chose the same part, and the other
+   removes its own file and leaves the rows to the winner;
+3. the ids are read back from the file and deleted ``chunk_size`` at a time,
+   each chunk its own short DELETE, and the archive is marked ``purged``.
+
+Only rows that made it into a file are ever deleted. A run interrupted before
+step 2 leaves a stray temporary file and the rows in place; one interrupted
+during step 3 is finished by the next run before it archives anything else.
+Events that arrive for an already archived month (imports) go to the next part.
+
+Each month is stored and expired as a unit, so the table only ever holds the
+retention window. ``iter_events`` reads that window and the archives as one
+ordered stream, so reports and exports do not need to know where a month lives.
+"""
+import gzip
+import heapq
+import json
+import os
+import uuid
+from datetime import datetime, time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Max
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .maintenance import _chunks, add_months
+from .models import EventLog, EventLogArchive
+
+DEFAULT_RETENTION_MONTHS = 6
+DEFAULT_CHUNK_SIZE = 1000
+
+ARCHIVE_FIELDS = ('id', 'event_type', 'description', 'user_id', 'facility_id', 'appointment_id', 'metadata',
+                  'created_at', 'updated_at')
+UUID_FIELDS = ('id', 'user_id', 'facility_id', 'appointment_id')
+DATETIME_FIELDS = ('created_at', 'updated_at')
+FILTER_FIELDS = ('event_type', 'user_id', 'facility_id', 'appointment_id')
+
+
+def archive_root():
+    return getattr(settings, 'EVENT_LOG_ARCHIVE_ROOT', os.path.join(settings.BASE_DIR, 'archive', 'eventlog'))
+
+
+def month_bounds(month):
+    """``[start, end)`` of the calendar month containing ``month`` in the local time zone"""
+    first = month.replace(day=1)
+    tz = timezone.get_current_timezone()
+    return (timezone.make_aware(datetime.combine(first, time.min), tz),
+            timezone.make_aware(datetime.combine(add_months(first, 1), time.min), tz))
+
+
+def retention_cutoff(months=None, today=None):
+    """Events created before this moment are past the retention window"""
+    months = months or getattr(settings, 'EVENT_LOG_RETENTION_MONTHS', DEFAULT_RETENTION_MONTHS)
+    today = today or timezone.localdate()
+    return month_bounds(add_months(today.replace(day=1), -(months - 1)))[0]
+
+
+def expired_months(months=None, today=None):
+    """``[(first day of month, events)]`` still in the table but past the retention window, oldest first"""
+    rows = (EventLog.objects.filter(created_at__lt=retention_cutoff(months, today))
+            .annotate(month=TruncMonth('created_at')).order_by('month')
+            .values('month').annotate(events=Count('pk')).values_list('month', 'events'))
+    return [(timezone.localtime(month).date(), events) for month, events in rows]
+
+
+def _encode(row):
+    row = dict(zip(ARCHIVE_FIELDS, row))
+    for field in UUID_FIELDS:
+        if row[field] is not None:
+            row[field] = str(row[field])
+    for field in DATETIME_FIELDS:
+        row[field] = row[field].isoformat()  # full precision: it is the sort key of iter_events
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':'))
+
+
+def _decode(line):
+    row = json.loads(line)
+    for field in UUID_FIELDS:
+        if row[field] is not None:
+            row[field] = uuid.UUID(row[field])
+    for field in DATETIME_FIELDS:
+        row[field] = datetime.fromisoformat(row[field])
+    return row
+
+
+def read_archive(archive):
+    """Rows of one archive file as dicts of ``ARCHIVE_FIELDS``, in the order they were written"""
+    with gzip.open(os.path.join(archive_root(), archive.name), 'rt', encoding='utf-8') as lines:
+        for line in lines:
+            yield _decode(line)
+
+
+def _next_part(month):
+    return (EventLogArchive.objects.filter(month=month).aggregate(last=Max('part'))['last'] or 0) + 1
+
+
+def archive_month(month, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Move the month's events from the table into a new archive part.
+
+    None when the month has no events, or when an overlapping run recorded the same part first.
+    """
+    start, end = month_bounds(month)
+    month = start.date()
+    rows = (EventLog.objects.filter(created_at__gte=start, created_at__lt=end)
+            .order_by('created_at', 'id').values_list(*ARCHIVE_FIELDS))
+    part = _next_part(month)
+    name = f'{month:%Y}/events-{month:%Y-%m}-{part}-{uuid.uuid4().hex[:8]}.jsonl.gz'
+    path = os.path.join(archive_root(), name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    count, first, last = 0, None, None
+    with gzip.open(f'{path}.tmp', 'wt', encoding='utf-8') as out:
+        for row in rows.iterator(chunk_size=chunk_size):
+            out.write(_encode(row) + '\n')
+            count += 1
+            first = first or row[ARCHIVE_FIELDS.index('created_at')]
+            last = row[ARCHIVE_FIELDS.index('created_at')]
+    if not count:
+        os.remove(f'{path}.tmp')
+        return None
+    os.replace(f'{path}.tmp', path)
+    try:
+        with transaction.atomic():
+            archive = EventLogArchive.objects.create(month=month, part=part, name=name, rows=count,
+                                                     size=os.path.getsize(path), first_event_at=first,
+                                                     last_event_at=last)
+    except IntegrityError:
+        # another run archived this part meanwhile; its file holds the rows and it deletes them
+        os.remove(path)
+        return None
+    purge(archive, chunk_size)
+    return archive
+
+
+def purge(archive, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Delete the archived rows still in the table, ``chunk_size`` ids per DELETE"""
+    for ids in _chunks((row['id'] for row in read_archive(archive)), chunk_size):
+        EventLog.objects.filter(pk__in=ids).delete()
+    archive.purged = True
+    archive.save(update_fields=['purged', 'updated_at'])
+
+
+def archive_expired(months=None, chunk_size=DEFAULT_CHUNK_SIZE, today=None):
+    """Archive every month past the retention window; returns the archives written"""
+    for archive in EventLogArchive.objects.filter(purged=False):
+        purge(archive, chunk_size)
+    archives = []
+    for month, _ in expired_months(months, today):
+        archive = archive_month(month, chunk_size)
+        if archive is not None:
+            archives.append(archive)
+    return archives
+
+
+def _matches(row, filters):
+    return all(row[field] == value for field, value in filters.items())
+
+
+def iter_events(since=None, until=None, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """Events created in ``[since, until)`` as dicts of ``ARCHIVE_FIELDS``, oldest first, wherever they are stored.
+
+    ``filters`` may be any of ``FILTER_FIELDS`` (``event_type='REVIEW_SUBMITTED'``, ``user_id=...``). The table
+    and each overlapping archive file are read lazily and merged on ``(created_at, id)``.
+    """
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f'Cannot filter events on {", ".join(sorted(unknown))}')
+    filters = {field: uuid.UUID(str(value)) if field in UUID_FIELDS and value is not None else value
+               for field, value in filters.items()}
+
+    table = EventLog.objects.filter(**filters)
+    archives = EventLogArchive.objects.all()
+    if since is not None:
+        table = table.filter(created_at__gte=since)
+        archives = archives.filter(last_event_at__gte=since)
+    if until is not None:
+        table = table.filter(created_at__lt=until)
+        archives = archives.filter(first_event_at__lt=until)
+
+    def archived(archive):
+        for row in read_archive(archive):
+            if ((since is None or row['created_at'] >= since) and (until is None or row['created_at'] < until)
+                    and _matches(row, filters)):
+                yield row
+
+    sources = [archived(archive) for archive in archives]
+    sources.append(dict(zip(ARCHIVE_FIELDS, row)) for row in table.order_by('created_at', 'id')
+                   .values_list(*ARCHIVE_FIELDS).iterator(chunk_size=chunk_size))
+    previous = None
+    for row in heapq.merge(*sources, key=lambda row: (row['created_at'], row['id'])):
+        # a part whose purge was interrupted still has its rows in the table too
+        if row['id'] != previous:
+            yield row
+        previous = row['id']
@@ -0,0 +1,286 @@
+"""
+Free appointment start times per facility, service type and day.
+
+A facility-day is reduced to a ``DayTimeline``: the spare bays for every
+minute between opening and closing, built from intervals with a difference
+array. Capacity is ``Facility.capacity`` parallel bays, further limited by
+how many of the facility's technicians are available at that minute
+(``TechnicianAvailability`` records; technicians without a record that day
+work the opening hours). Every active appointment occupies one bay for its
+service's duration. Closed days (weekends, ``FacilityClosure``) and days that
+reached ``Schedule.max_daily_appointments`` (counting every appointment that
+was not cancelled, completed ones included) have no free starts.
+
+Timelines do not depend on the requested service type, so they are cached
+per facility-day and shared by every duration. Appointment changes drop the
+affected day; schedule, closure, availability, staff and service changes bump
+a per-facility version that retires all of that facility's days (see the
+receivers in models.py). Cache entries also expire after
+``SLOT_CACHE_SECONDS`` so a per-process cache cannot stay stale for long;
+bookings are always re-checked against fresh data (``is_free``).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+DEFAULT_STEP_MINUTES = 15
+DEFAULT_CACHE_SECONDS = 300
+MAX_DAYS = 62
+
+
+def step_minutes():
+    return getattr(settings, 'APPOINTMENT_SLOT_MINUTES', DEFAULT_STEP_MINUTES)
+
+
+def minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _clock(value):
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+class DayTimeline:
+    """Which minutes of one facility-day still have a free bay"""
+
+    def __init__(self, opening=0, closing=0, booked=0, max_daily=0, blocked=(0,)):
+        self.opening = opening
+        self.closing = closing
+        self.booked = booked
+        self.max_daily = max_daily
+        # blocked[i] = number of minutes in [opening, opening + i) without a free bay
+        self.blocked = blocked
+
+    @classmethod
+    def closed(cls):
+        return cls()
+
+    @classmethod
+    def build(cls, opening, closing, bays, busy, max_daily, technicians=None, booked=None):
+        """``busy``: (start, end) minute intervals; ``technicians``: (start, end) working intervals or None;
+        ``booked``: appointments counted against ``max_daily`` (default: one per busy interval)"""
+        length = max(closing - opening, 0)
+        delta = [0] * (length + 1)
+
+        def add(start, end, amount):
+            start, end = max(start - opening, 0), min(end - opening, length)
+            if start < end:
+                delta[start] += amount
+                delta[end] -= amount
+
+        for start, end in busy:
+            add(start, end, 1)
+        load = _running(delta, length)
+
+        if technicians is None:
+            capacity = [bays] * length
+        else:
+            delta = [0] * (length + 1)
+            for start, end in technicians:
+                add(start, end, 1)
+            capacity = [min(bays, working) for working in _running(delta, length)]
+
+        blocked = [0]
+        for used, available in zip(load, capacity):
+            blocked.append(blocked[-1] + (used >= available))
+        return cls(opening, closing, len(busy) if booked is None else booked, max_daily, tuple(blocked))
+
+    @property
+    def is_open(self):
+        return self.closing > self.opening
+
+    @property
+    def is_full(self):
+        return self.booked >= self.max_daily
+
+    def fits(self, start, duration):
+        """True when a job of ``duration`` minutes can start at minute ``start``"""
+        if not self.is_open or self.is_full or start < self.opening or start + duration > self.closing:
+            return False
+        offset = start - self.opening
+        return self.blocked[offset + duration] == self.blocked[offset]
+
+    def starts(self, duration, step, not_before=None):
+        """Free start minutes, aligned to ``step`` minutes after opening"""
+        if not self.is_open or self.is_full:
+            return []
+        first = self.opening
+        if not_before is not None and not_before > first:
+            first += -(-(not_before - first) // step) * step
+        return [start for start in range(first, self.closing - duration + 1, step) if self.fits(start, duration)]
+
+
+def _running(delta, length):
+    values, total = [], 0
+    for change in delta[:length]:
+        total += change
+        values.append(total)
+    return values
+
+
+def working_intervals(records, opening, closing):
+    """A technician's working intervals for one day from their availability records"""
+    available = [(s, e) for s, e, ok in records if ok]
+    intervals = available or [(opening, closing)]
+    for start, end in (r[:2] for r in records if not r[2]):
+        carved = []
+        for s, e in intervals:
+            if end <= s or start >= e:
+                carved.append((s, e))
+                continue
+            if s < start:
+                carved.append((s, start))
+            if end < e:
+                carved.append((end, e))
+        intervals = carved
+    return intervals
+
+
+def build_timelines(facility, days):
+    """``{date: DayTimeline}`` for ``days`` of ``facility``, loaded in a fixed number of queries"""
+    from .models import Appointment, Employee, Schedule, TechnicianAvailability
+
+    if not days:
+        return {}
+    first, last = min(days), max(days)
+    schedule = Schedule.objects.filter(facility=facility).first()
+    if schedule is None or not facility.is_active:
+        return {day: DayTimeline.closed() for day in days}
+
+    closures = list(facility.closures.filter(start_date__lte=last, end_date__gte=first)
+                    .values_list('start_date', 'end_date'))
+    technicians = list(Employee.objects.filter(
+        facility=facility, is_active=True, base_user__user_type='TECHNICIAN'
+    ).values_list('id', flat=True))
+    availability = defaultdict(lambda: defaultdict(list))
+    for tech_id, date, start, end, ok in TechnicianAvailability.objects.filter(
+        technician_id__in=technicians, date__range=(first, last)
+    ).values_list('technician_id', 'date', 'start_time', 'end_time', 'is_available'):
+        availability[date][tech_id].append((minutes(start), minutes(end), ok))
+    busy, booked = defaultdict(list), defaultdict(int)
+    for date, start, duration, status in Appointment.objects.filter(
+        service_type__facility=facility, scheduled_date__range=(first, last),
+    ).exclude(status='CANCELLED').values_list('scheduled_date', 'scheduled_time', 'service_type__duration_minutes',
+                                              'status'):
+        # every booking counts against the daily limit; only open ones still hold a bay
+        booked[date] += 1
+        if status in Appointment.ACTIVE_STATUSES:
+            busy[date].append((minutes(start), minutes(start) + duration))
+
+    opening, closing = minutes(schedule.opening_time), minutes(schedule.closing_time)
+    timelines = {}
+    for day in days:
+        if (day.weekday() >= 5 and not schedule.is_open_weekends) or any(s <= day <= e for s, e in closures):
+            timelines[day] = DayTimeline.closed()
+            continue
+        working = None
+        if technicians:
+            working = [interval for tech_id in technicians
+                       for interval in working_intervals(availability[day][tech_id], opening, closing)]
+        timelines[day] = DayTimeline.build(opening, closing, facility.capacity, busy[day],
+                                           schedule.max_daily_appointments, working, booked[day])
+    return timelines
+
+
+# ---- cache ----
+
+def _version_key(facility_id):
+    return f'slots:{facility_id}:version'
+
+
+def _version(facility_id):
+    return cache.get_or_set(_version_key(facility_id), 1, timeout=None)
+
+
+def _day_key(facility_id, version, day):
+    return f'slots:{facility_id}:v{version}:{day.isoformat()}'
+
+
+def get_timelines(facility, days):
+    """Cached ``build_timelines``: only the days missing from the cache hit the database"""
+    version = _version(facility.pk)
+    keys = {_day_key(facility.pk, version, day): day for day in days}
+    cached = cache.get_many(keys)
+    timelines = {keys[key]: timeline for key, timeline in cached.items()}
+    missing = [day for day in days if day not in timelines]
+    if missing:
+        built = build_timelines(facility, missing)
+        cache.set_many({_day_key(facility.pk, version, day): timeline for day, timeline in built.items()},
+                       timeout=getattr(settings, 'SLOT_CACHE_SECONDS', DEFAULT_CACHE_SECONDS))
+        timelines.update(built)
+    return timelines
+
+
+def _after_commit(func):
+    # Drop the entry now and again once the transaction commits, so a request that recomputed the day
+    # from not-yet-committed data in between cannot leave a stale timeline behind
+    func()
+    transaction.on_commit(func)
+
+
+def invalidate_day(facility_id, day):
+    _after_commit(lambda: cache.delete(_day_key(facility_id, _version(facility_id), day)))
+
+
+def invalidate_facility(facility_id):
+    def bump():
+        try:
+            cache.incr(_version_key(facility_id))
+        except ValueError:
+            cache.set(_version_key(facility_id), 2, timeout=None)
+    _after_commit(bump)
+
+
+# ---- queries ----
+
+def free_slots(service_type, start, days):
+    """``{date: ['HH:MM', ...]}`` of free start times for ``service_type`` over ``days`` days from ``start``"""
+    dates = [start + timedelta(days=offset) for offset in range(days)]
+    timelines = get_timelines(service_type.facility, dates)
+    now = timezone.localtime()
+    step = step_minutes()
+    result = {}
+    for day in dates:
+        if day < now.date():
+            result[day] = []
+            continue
+        not_before = minutes(now) + 1 if day == now.date() else None
+        result[day] = [_clock(minute) for minute in
+                       timelines[day].starts(service_type.duration_minutes, step, not_before)]
+    return result
+
+
+def is_free(service_type, day, start_time):
+    """Check one booking against fresh (uncached) data; call inside the booking transaction after capacity.claim"""
+    if timezone.make_aware(datetime.combine(day, start_time)) <= timezone.now():
+        return False
+    timeline = build_timelines(service_type.facility, [day])[day]
+    return timeline.fits(minutes(start_time), service_type.duration_minutes)
+
+
+def invalidate_appointment(old, new, service_type=None):
+    """Drop the days an appointment left or entered; ``old`` / ``new`` are SLOT_FIELDS states (None if absent)"""
+    from .models import Appointment, ServiceType
+
+    def booking(state):
+        if state and state['status'] != 'CANCELLED':
+            return (state['service_type_id'], state['scheduled_date'], state['scheduled_time'],
+                    state['status'] in Appointment.ACTIVE_STATUSES)
+        return None
+
+    # Starting a job or editing its notes / technician leaves the day's count and occupied bays unchanged
+    old, new = booking(old), booking(new)
+    if old == new:
+        return
+    affected = {slot[:2] for slot in (old, new) if slot}
+    facilities = {service_type.pk: service_type.facility_id} if service_type is not None else {}
+    unknown = {service_type_id for service_type_id, _ in affected} - set(facilities)
+    if unknown:
+        facilities.update(ServiceType.objects.filter(pk__in=unknown).values_list('id', 'facility_id'))
+    for service_type_id, day in affected:
+        if service_type_id in facilities:
+            invalidate_day(facilities[service_type_id], day)
@@ -24,6 +24,9 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // Live notifications and appointment status changes
+    openEventStream();
+
     // Handle facility schedule loading
     const facilitySelect = document.getElementById('facility-select');
     if (facilitySelect) {
@@ -326,6 +329,39 @@ function updateNotificationCount() {
     }
 }
 
+function openEventStream() {
+    const url = document.body.dataset.eventsUrl;
+    if (!url || typeof EventSource === 'undefined') return;
+
+    // EventSource reconnects by itself and resumes from the last event id
+    const source = new EventSource(url);
+    source.addEventListener('notification', function(e) {
+        const data = JSON.parse(e.data);
+        const badge = document.getElementById('notification-count');
+        if (badge) {
+            badge.textContent = (parseInt(badge.textContent, 10) || 0) + 1;
+            badge.style.display = 'inline';
+        }
+        showAlert(`<strong>${escapeHtml(data.title)}</strong> ${escapeHtml(data.message)}`);
+    });
+    source.addEventListener('appointment', function(e) {
+        const data = JSON.parse(e.data);
+        const labels = document.querySelectorAll(`[data-appointment-status="${data.id}"]`);
+        labels.forEach(function(label) {
+            label.textContent = data.status_display;
+        });
+        if (!labels.length) {
+            showAlert(`Appointment on ${data.scheduled_date} ${data.scheduled_time}: ${escapeHtml(data.status_display)}`);
+        }
+    });
+}
+
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
 function showAlert(message, type = 'info') {
     const alertsContainer = document.getElementById('alerts-container');
     if (!alertsContainer) return;
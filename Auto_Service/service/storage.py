@@ -0,0 +1,95 @@
+"""
+Content-addressed storage for uploaded images.
+
+Each file is stored once under ``blobs/<ab>/<sha256><ext>`` no matter how
+many vehicles, facilities or shops use it, so seeding thousands of vehicles
+with the same stock photo or re-uploading an identical picture costs no
+extra disk or I/O. ``ContentBlob`` rows track how many model fields point
+at each blob; the signal handlers in models.py keep ``ref_count`` current
+and ``manage.py cleanup_blobs`` removes blobs nobody references any more.
+"""
+import hashlib
+import os
+import tempfile
+from collections import Counter
+
+from django.core.files.storage import FileSystemStorage
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils.deconstruct import deconstructible
+
+BLOB_PREFIX = 'blobs/'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files after the SHA-256 of their content"""
+
+    def blob_name(self, digest, name):
+        ext = os.path.splitext(name)[1].lower()
+        return f'{BLOB_PREFIX}{digest[:2]}/{digest}{ext}'
+
+    def get_available_name(self, name, max_length=None):
+        # Identical names mean identical content, so an existing file is never a conflict
+        return name
+
+    def _save(self, name, content):
+        from .models import ContentBlob
+
+        sha = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            sha.update(chunk)
+            size += len(chunk)
+        name = self.blob_name(sha.hexdigest(), name)
+
+        if not self.exists(name):
+            content.seek(0)
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write beside the target and rename, so concurrent uploads of the same file never expose a partial blob
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    for chunk in content.chunks():
+                        fh.write(chunk)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        ContentBlob.objects.get_or_create(name=name, defaults={'size': size})
+        return name
+
+
+image_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    return image_storage
+
+
+def _adjust(names, sign):
+    from .models import ContentBlob
+
+    counts = Counter(name for name in names if is_blob(name))
+    for name, count in counts.items():
+        ContentBlob.objects.filter(name=name).update(ref_count=Greatest(F('ref_count') + sign * count, 0))
+
+
+def retain(names):
+    """Add one reference per occurrence of each blob name (use after bulk inserts, which skip signals)"""
+    _adjust(names, 1)
+
+
+def release(names):
+    """Drop one reference per occurrence of each blob name"""
+    _adjust(names, -1)
@@ -0,0 +1,69 @@
+"""
+Built-in background tasks (see service/jobs.py); payloads must be JSON-serialisable.
+"""
+from datetime import timedelta
+
+from django.apps import apps
+from django.core.management import call_command
+from django.utils import timezone
+
+from .jobs import task
+
+
+@task('rebuild_analytics')
+def rebuild_analytics():
+    from .analytics import rebuild
+    rebuild()
+
+
+@task('build_image_derivatives')
+def build_image_derivatives(model, pk, field):
+    """Pre-build the resized variants of an uploaded image so the first page view does not pay for it"""
+    from .images import derivatives_for
+    instance = apps.get_model(model).objects.filter(pk=pk).first()
+    if instance is not None and getattr(instance, field):
+        derivatives_for(getattr(instance, field))
+
+
+@task('notify')
+def notify(user_id, type, title, message, related_appointment_id=None):
+    from .models import Notification
+    Notification.objects.create(user_id=user_id, type=type, title=title, message=message,
+                                related_appointment_id=related_appointment_id)
+
+
+@task('assign_technicians')
+def assign_technicians():
+    from .assignment import assign_unassigned
+    assign_unassigned()
+
+
+@task('compute_maintenance_due')
+def compute_maintenance_due(batch_size=1000):
+    from .maintenance import compute_maintenance_due
+    compute_maintenance_due(batch_size=batch_size)
+
+
+@task('send_appointment_reminders')
+def send_appointment_reminders():
+    from .reminders import send_reminders
+    send_reminders()
+
+
+@task('cleanup_blobs')
+def cleanup_blobs():
+    call_command('cleanup_blobs')
+
+
+@task('archive_events')
+def archive_events():
+    from .retention import archive_expired
+    archive_expired()
+
+
+@task('purge_jobs')
+def purge_jobs(days=7):
+    """Delete finished jobs older than ``days`` days"""
+    from .models import Job
+    Job.objects.filter(status__in=['SUCCEEDED', 'FAILED'],
+                       finished_at__lt=timezone.now() - timedelta(days=days)).delete()
@@ -1,4 +1,10 @@
 from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.html import format_html
+
+from service.images import derivatives_for
 
 register = template.Library()
 
@@ -82,4 +88,50 @@ def compress_hours(business_hours):
             formatted.append(f"{start}: {hours}")
         else:
             formatted.append(f"{start} to {end}: {hours}")
-    return formatted 
\ No newline at end of file
+    return formatted 
+
+
+def _original_url(source):
+    return static(source) if isinstance(source, str) else source.url
+
+
+@register.simple_tag
+def responsive_image(source, alt='', sizes='100vw', css_class='', width=640, loading='lazy'):
+    """
+    Render a static path or an ImageField file as a <picture> with WebP and JPEG srcsets,
+    so the browser downloads the smallest variant that fills the slot.
+    Usage (in template):
+    {% responsive_image vehicle.image alt=vehicle.model sizes="(max-width: 768px) 100vw, 50vw" css_class="img-fluid" %}
+    {% responsive_image 'images/Default_Car.jpg' alt="Car" %}
+    ``width`` picks the fallback <img src> for browsers without srcset support.
+    """
+    if not source:
+        return ''
+    derivatives = derivatives_for(source)
+    if derivatives is None:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="{}">',
+                           _original_url(source), css_class, alt, loading)
+    fallback = derivatives.closest(width)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="{}"></picture>',
+        derivatives.srcset('webp'), sizes, derivatives.url(fallback, 'jpg'), derivatives.srcset('jpg'), sizes,
+        css_class, alt, loading,
+    )
+
+
+@register.simple_tag
+def derivative_url(source, width=1600, ext='webp'):
+    """URL of the variant closest to ``width`` (e.g. for CSS backgrounds); the original when none can be built"""
+    if not source:
+        return ''
+    derivatives = derivatives_for(source)
+    if derivatives is None:
+        return _original_url(source)
+    return derivatives.url(derivatives.closest(width), ext)
+
+
+@register.simple_tag
+def live_events_url():
+    """URL of the live event stream when pages should open it (``LIVE_EVENTS_STREAM``), else an empty string"""
+    return reverse('service:events') if getattr(settings, 'LIVE_EVENTS_STREAM', False) else ''
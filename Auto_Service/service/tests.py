@@ -1,3 +1,1270 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import uuid
+from collections import Counter
+from urllib.parse import urlencode
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.template import Context, Template
+from django.db import connection
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape
+from PIL import Image
+
+from .analytics import rebuild, rebuild_technician_stats
+from .datasets import build_scaled_dataset
+from .images import derivatives_for
+from .maintenance import add_months
+from .jobs import enqueue, task
+from .notifications import bulk_notify
+from .models import (
+    Analytics, Appointment, BaseUser, ContentBlob, Customer, Employee, EventLog, EventLogArchive, Facility,
+    FacilityClosure, FacilityDayLoad, Job, JobSchedule, MaintenanceReminderLog, Message, Notification, ReminderLog,
+    RepairShop, Review, Schedule, ServiceType, TechnicianAvailability, TechnicianStats, Vehicle
+)
+from .query_budget import BUDGET_SCALE, QUERY_BUDGETS, QueryCounter
+from .replay import client_for, iter_route_requests, quiet_request_log, service_routes
+from . import (
+    assignment, async_views, audit, capacity, events, exports, fastload, jobs, maintenance, reminders, retention,
+    slots, transitions,
+)
+
+
+def png_bytes(width=4, height=4, color=(200, 30, 30, 128)):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def reset_caches():
+    """Forget slot timelines, version stamps and cached copies left behind by earlier tests"""
+    cache.clear()
+    caches['shared'].clear()
+
+
+def create_user(username, user_type):
+    user = User.objects.create_user(username=username, password='pass@1234', first_name=username.title())
+    return BaseUser.objects.create(user=user, user_type=user_type, phone_number='0660000000', address='Street 1')
+
+
+class ServiceDataMixin:
+    """Minimal shop / facility / customer / technician graph shared by the test cases"""
+
+    @classmethod
+    def setUpTestData(cls):
+        owner = create_user('owner', 'OWNER')
+        cls.shop = RepairShop.objects.create(name='Auto Service', address='Main St', email='info@example.com',
+                                             tax_id='AT1', owner=owner)
+        cls.facility = Facility.objects.create(name='Maintenance Facility', facility_type='MAINTENANCE',
+                                               description='Maintenance', capacity=2, repair_shop=cls.shop)
+        cls.service = ServiceType.objects.create(name='Oil Change', description='Oil', duration_minutes=60,
+                                                 price=Decimal('80.00'), facility=cls.facility)
+        cls.tech = Employee.objects.create(base_user=create_user('tech1', 'TECHNICIAN'), facility=cls.facility,
+                                           hire_date=timezone.localdate(), salary=Decimal('30000'))
+        cls.customer = Customer.objects.create(base_user=create_user('customer1', 'CUSTOMER'))
+        cls.vehicle = Vehicle.objects.create(owner=cls.customer, vin='VIN0000000000001', make='Audi', model='A4',
+                                             year=2020, color='Black', license_plate='W-1')
+
+    def book(self, days=1, status='SCHEDULED', **kwargs):
+        kwargs.setdefault('assigned_technician', self.tech)
+        kwargs.setdefault('scheduled_time', time(10, 0))
+        return Appointment.objects.create(
+            customer=self.customer, vehicle=self.vehicle, service_type=self.service,
+            scheduled_date=timezone.localdate() + timedelta(days=days), status=status, **kwargs
+        )
+
+
+class TempMediaMixin:
+    """Point MEDIA_ROOT at a throw-away directory for uploads and image derivatives"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media_root))
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        super().setUpClass()
+
+
+class IncrementalAnalyticsTests(ServiceDataMixin, TestCase):
+
+    def snapshot(self):
+        a = Analytics.objects.get()
+        return (a.total_appointments, a.completed_appointments, a.total_revenue, a.rating_sum, a.review_count,
+                a.total_customers, a.total_vehicles, a.average_rating, a.revenue_by_service,
+                a.facility_utilization, a.technician_performance)
+
+    def test_incremental_totals_match_rebuild(self):
+        done = self.book(days=-2, status='COMPLETED', final_cost=Decimal('120.50'))
+        Review.objects.create(appointment=done, rating=4, comment='Good')
+        pending = self.book()
+        pending.status = 'COMPLETED'
+        pending.final_cost = Decimal('99.50')
+        pending.save()
+        self.book(days=3).delete()
+
+        incremental = self.snapshot()
+        rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+        analytics = Analytics.objects.get()
+        self.assertEqual(analytics.total_revenue, Decimal('220.00'))
+        self.assertEqual(analytics.technician_performance[str(self.tech.id)]['completion_rate'], 100)
+
+    def test_rebuild_uses_constant_number_of_queries(self):
+        for _ in range(5):
+            self.book(days=-1, status='COMPLETED', final_cost=Decimal('10'))
+        with self.assertNumQueries(10):
+            rebuild()
+
+
+class TechnicianStatsTests(ServiceDataMixin, TestCase):
+
+    def test_signals_keep_rollup_in_step_with_repair_command(self):
+        start = timezone.localdate() - timedelta(days=1)
+        on_time = self.book(days=-1, status='COMPLETED',
+                            actual_end_time=timezone.make_aware(datetime.combine(start, time(10, 30))))
+        late = self.book(days=-1)
+        late.status = 'COMPLETED'
+        late.actual_end_time = timezone.make_aware(datetime.combine(start, time(15, 0)))
+        late.save()
+        Review.objects.create(appointment=on_time, rating=5, comment='Great')
+        Review.objects.create(appointment=late, rating=3, comment='Slow')
+        self.book()
+
+        stats = TechnicianStats.objects.get(technician=self.tech)
+        self.assertEqual((stats.total_assigned, stats.completed_count, stats.on_time_count,
+                          stats.rating_sum, stats.rating_count), (3, 2, 1, 8, 2))
+
+        TechnicianStats.objects.update(total_assigned=0, on_time_count=0, rating_sum=0)
+        rebuild_technician_stats()
+        repaired = TechnicianStats.objects.get(technician=self.tech)
+        self.assertEqual((repaired.total_assigned, repaired.on_time_count, repaired.rating_sum), (3, 1, 8))
+
+    def test_properties_read_the_rollup_without_queries(self):
+        self.book(days=-1, status='COMPLETED')
+        self.book()
+        tech = Employee.objects.select_related('stats').get(pk=self.tech.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(tech.completion_rate, 50)
+            self.assertEqual(tech.average_rating, 0)
+
+
+# times max_db_ms a route may take in the budget test before it fails; the middleware warns past 1x
+DB_TIME_MARGIN = 5
+
+# paginated route -> (cursor parameter, context key of the page; None for the JSON APIs' next_cursor)
+PAGINATED_ROUTES = {
+    'notifications': ('cursor', 'notifications'),
+    'appointments': ('past', 'past_appointments'),
+    'messages': ('cursor', 'received_messages'),
+    'vehicle_detail': ('cursor', 'service_history'),
+    'api_notifications': ('cursor', None),
+    'api_messages': ('cursor', None),
+    'api_appointments': ('cursor', None),
+    'api_service_history': ('cursor', None),
+}
+
+
+class QueryBudgetTests(TempMediaMixin, TestCase):
+    """Every route stays within its declared query budget on a BUDGET_SCALE dataset"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.dataset = build_scaled_dataset(**BUDGET_SCALE, prefix='budget')
+
+    def setUp(self):
+        reset_caches()
+
+    def test_every_route_has_a_budget(self):
+        self.assertEqual({name for name, _ in service_routes()} - set(QUERY_BUDGETS), set())
+
+    def test_routes_stay_within_budget(self):
+        with quiet_request_log():
+            for name, budget in QUERY_BUDGETS.items():
+                username = self.dataset.usernames[budget.role] if budget.role else None
+                for _, url, perform in iter_route_requests(username, routes={name}):
+                    with self.subTest(route=name):
+                        counter = QueryCounter()
+                        with connection.execute_wrapper(counter):
+                            perform()
+                        self.assertLessEqual(counter.count, budget.max_queries, url)
+                        # database time depends on the machine running the tests, hence the wide margin
+                        self.assertLessEqual(counter.milliseconds, budget.max_db_ms * DB_TIME_MARGIN, url)
+
+    def test_later_pages_cost_what_the_first_page_costs(self):
+        with quiet_request_log(), self.settings(LIST_PAGE_SIZE=1):
+            for name, (param, key) in PAGINATED_ROUTES.items():
+                username = self.dataset.usernames[QUERY_BUDGETS[name].role]
+                client = client_for(username)
+                (_, url, _), = iter_route_requests(username, routes={name})
+                response = client.get(url)  # also warms the per-process caches
+                cursor = response.context[key].next_cursor if key else response.json()['next_cursor']
+                later = f'{url}{"&" if "?" in url else "?"}{urlencode({param: cursor})}'
+                with self.subTest(route=name, url=later):
+                    self.assertIsNotNone(cursor)
+                    counts = []
+                    for page in (url, later):
+                        counter = QueryCounter()
+                        with connection.execute_wrapper(counter):
+                            self.assertEqual(client.get(page).status_code, 200)
+                        counts.append(counter.count)
+                    self.assertEqual(counts[1], counts[0])
+                    self.assertLessEqual(counts[1], QUERY_BUDGETS[name].max_queries)
+
+    @override_settings(QUERY_BUDGET_HEADERS=True)
+    def test_middleware_reports_query_count(self):
+        response = client_for(self.dataset.usernames['CUSTOMER']).get(reverse('service:notifications'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+
+class BenchViewsCommandTests(TempMediaMixin, TestCase):
+
+    def test_writes_a_comparable_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            first, second = os.path.join(tmp, 'first.json'), os.path.join(tmp, 'second.json')
+            options = dict(customers=2, technicians=1, iterations=2, warmup=0, routes=['dashboard', 'landing_page'],
+                           stdout=io.StringIO())
+            call_command('bench_views', output=first, **options)
+            out = io.StringIO()
+            call_command('bench_views', output=second, compare=first, **dict(options, stdout=out))
+            with open(second) as fh:
+                report = json.load(fh)
+
+        row = report['results']['CUSTOMER dashboard']
+        self.assertEqual(row['status'], 200)
+        self.assertLessEqual(row['p50_ms'], row['p99_ms'])
+        self.assertGreater(row['queries'], 0)
+        self.assertIn('ANONYMOUS landing_page', report['results'])
+        self.assertIn('CUSTOMER dashboard: p95', out.getvalue())
+
+
+class IndexAdvisorCommandTests(TempMediaMixin, TestCase):
+
+    def test_hot_message_list_is_served_by_its_index(self):
+        out = io.StringIO()
+        call_command('index_advisor', customers=3, technicians=1, appointments_per_vehicle=1, routes=['messages'],
+                     verbose_plans=True, stdout=out)
+        report = out.getvalue()
+        self.assertIn('SEARCH service_message USING INDEX message_recipient_created_idx (recipient_id=?)', report)
+        self.assertNotIn('SCAN service_message', report)
+        self.assertIn('No full-table scans found.', report)
+
+
+class SeedDemoDataTests(TestCase):
+
+    def test_bulk_seed_keeps_invariants_and_derived_tables(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            call_command('seed_demo_data', customers=6, technicians=3, appointments_per_vehicle=2, seed=3,
+                         no_fixture=True, stdout=io.StringIO())
+            stored_images = [name for _, _, files in os.walk(os.path.join(media, 'blobs')) for name in files]
+
+        today = timezone.localdate()
+        upcoming = Appointment.objects.filter(status='SCHEDULED', scheduled_date__gte=today)
+        self.assertEqual(Customer.objects.exclude(appointments__in=upcoming).count(), 0)
+        technicians = Employee.objects.filter(base_user__user_type='TECHNICIAN')
+        self.assertEqual(technicians.exclude(assigned_appointments__in=upcoming).count(), 0)
+        # each distinct picture is written once, however many vehicles use it
+        self.assertEqual(len(stored_images), Vehicle.objects.values('image').distinct().count())
+        self.assertEqual(sum(ContentBlob.objects.values_list('ref_count', flat=True)), Vehicle.objects.count())
+
+        analytics = Analytics.objects.get()
+        self.assertEqual(analytics.total_appointments, Appointment.objects.count())
+        self.assertEqual(analytics.total_vehicles, Vehicle.objects.count())
+        self.assertEqual(TechnicianStats.objects.count(), Employee.objects.count())
+
+
+class ContentAddressedStorageTests(TempMediaMixin, ServiceDataMixin, TestCase):
+
+    def add_vehicle(self, vin, image=None):
+        return Vehicle.objects.create(owner=self.customer, vin=vin, make='Audi', model='A3', year=2020,
+                                      color='Red', license_plate='W-2', image=image)
+
+    def test_identical_uploads_share_one_counted_blob(self):
+        first = self.add_vehicle('VIN0000000000002', SimpleUploadedFile('a.png', png_bytes()))
+        second = self.add_vehicle('VIN0000000000003', SimpleUploadedFile('b.PNG', png_bytes()))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(first.image.name.startswith('blobs/'))
+        self.assertEqual(ContentBlob.objects.get().ref_count, 2)
+
+        second = Vehicle.objects.get(pk=second.pk)
+        second.image.save('c.png', ContentFile(png_bytes(color='blue')))
+        self.assertEqual(dict(ContentBlob.objects.values_list('name', 'ref_count')),
+                         {first.image.name: 1, second.image.name: 1})
+
+        first.delete()
+        call_command('cleanup_blobs', grace_hours=0, stdout=io.StringIO())
+        self.assertFalse(default_storage.exists(first.image.name))
+        self.assertTrue(second.image.storage.exists(second.image.name))
+        self.assertEqual(list(ContentBlob.objects.values_list('name', flat=True)), [second.image.name])
+
+    def test_recount_repairs_references_skipped_by_bulk_inserts(self):
+        shared = self.add_vehicle('VIN0000000000004', SimpleUploadedFile('a.png', png_bytes(color='green'))).image.name
+        Vehicle.objects.bulk_create([
+            Vehicle(owner=self.customer, vin=f'VIN10000000000{i}', make='Audi', model='A3', year=2020,
+                    color='Red', license_plate='W-3', image=shared)
+            for i in range(3)
+        ])
+        call_command('cleanup_blobs', recount=True, grace_hours=0, stdout=io.StringIO())
+        self.assertEqual(ContentBlob.objects.get(name=shared).ref_count, 4)
+
+
+class ResponsiveImageTests(TempMediaMixin, ServiceDataMixin, TestCase):
+
+    def test_upload_gets_webp_and_jpeg_variants_without_upscaling(self):
+        self.vehicle.image = SimpleUploadedFile('photo.png', png_bytes(800, 400))
+        self.vehicle.save()
+
+        html = Template('{% load service_extras %}{% responsive_image vehicle.image alt="Car" sizes="50vw" %}').render(
+            Context({'vehicle': self.vehicle}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('sizes="50vw"', html)
+        self.assertIn('-320w.webp 320w', html)
+        self.assertIn('-800w.jpg 800w', html)
+        self.assertNotIn('1024w', html)
+
+        derivatives = derivatives_for(self.vehicle.image, create=False)
+        self.assertEqual(derivatives.missing(), [])
+        with Image.open(derivatives.storage_path(320, 'jpg')) as variant:
+            self.assertEqual((variant.size, variant.format), ((320, 160), 'JPEG'))
+
+    def test_unreadable_image_falls_back_to_the_original(self):
+        self.vehicle.image = SimpleUploadedFile('broken.png', b'not an image')
+        self.vehicle.save()
+        with self.assertLogs('service.images', 'WARNING'):
+            html = Template('{% load service_extras %}{% responsive_image vehicle.image %}').render(
+                Context({'vehicle': self.vehicle}))
+        self.assertIn(f'src="{self.vehicle.image.url}"', html)
+
+
+class SlotAvailabilityTests(TempMediaMixin, ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.day = timezone.localdate() + timedelta(days=1)
+        while self.day.weekday() >= 5:
+            self.day += timedelta(days=1)
+
+    def book_day(self, hour=10, **kwargs):
+        return self.book(days=(self.day - timezone.localdate()).days, scheduled_time=time(hour, 0), **kwargs)
+
+    def free(self, day=None):
+        return slots.free_slots(self.service, day or self.day, 1)[day or self.day]
+
+    def test_bookings_use_up_the_available_technician(self):
+        self.book_day(10)
+        free = self.free()
+        # one technician limits the two bays to one job at a time
+        self.assertIn('09:00', free)
+        self.assertNotIn('09:15', free)
+        self.assertNotIn('10:45', free)
+        self.assertIn('11:00', free)
+        self.assertEqual(free[-1], '16:00')
+
+    def test_unavailable_technician_and_closed_days(self):
+        TechnicianAvailability.objects.create(technician=self.tech, date=self.day, start_time=time(12, 0),
+                                              end_time=time(14, 0), is_available=False)
+        free = self.free()
+        self.assertIn('11:00', free)
+        self.assertNotIn('11:15', free)
+        self.assertIn('14:00', free)
+
+        FacilityClosure.objects.create(facility=self.facility, start_date=self.day, end_date=self.day, reason='Audit',
+                                       announced_by=create_user('manager1', 'MANAGER'))
+        self.assertEqual(self.free(), [])
+        saturday = self.day + timedelta(days=5 - self.day.weekday())
+        self.assertEqual(self.free(saturday), [])
+
+    def test_daily_limit(self):
+        self.facility.schedule.max_daily_appointments = 1
+        self.facility.schedule.save()
+        self.book_day(10)
+        self.assertEqual(self.free(), [])
+
+    def test_cached_days_are_invalidated_by_bookings(self):
+        self.assertIn('10:00', self.free())
+        with self.assertNumQueries(0):
+            self.free()
+        appointment = self.book_day(10)
+        self.assertNotIn('10:00', self.free())
+        appointment.status = 'CANCELLED'
+        appointment.save()
+        self.assertIn('10:00', self.free())
+
+    def test_api_returns_a_month_of_slots(self):
+        client = client_for('customer1')
+        url = reverse('service:api_facility_slots', args=[self.facility.id])
+        response = client.get(url, {'service_type': self.service.id, 'start': self.day.isoformat(), 'days': 31})
+        self.assertEqual(response.status_code, 200)
+        days = response.json()['days']
+        self.assertEqual(len(days), 31)
+        self.assertEqual(days[0], {'date': self.day.isoformat(), 'slots': self.free()})
+        self.assertEqual(client.get(url, {'service_type': 'nope'}).status_code, 400)
+        self.assertEqual(client.get(url, {'service_type': self.service.id, 'days': 400}).status_code, 400)
+
+    def test_booking_is_rejected_when_the_slot_is_taken(self):
+        self.book_day(10)
+        client = client_for('customer1')
+        data = {'service_type': self.service.id, 'vehicle': self.vehicle.id,
+                'scheduled_date': self.day.isoformat(), 'scheduled_time': '10:30', 'notes': ''}
+        with quiet_request_log():
+            response = client.post(reverse('service:create_appointment'), data)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('scheduled_time', response.context['form'].errors)
+            self.assertEqual(Appointment.objects.count(), 1)
+
+            response = client.post(reverse('service:create_appointment'), dict(data, scheduled_time='11:00'))
+        self.assertRedirects(response, reverse('service:dashboard'))
+        self.assertEqual(Appointment.objects.count(), 2)
+
+
+class TechnicianAssignmentTests(ServiceDataMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.specialist = Employee.objects.create(base_user=create_user('tech2', 'TECHNICIAN'), facility=cls.facility,
+                                                 hire_date=timezone.localdate(), salary=Decimal('30000'))
+        cls.day = timezone.localdate() + timedelta(days=3)
+
+    def setUp(self):
+        reset_caches()
+
+    def unassigned(self, hour, **kwargs):
+        return self.book(days=3, assigned_technician=None, scheduled_time=time(hour, 0), **kwargs)
+
+    def test_prefers_specialists_and_free_technicians(self):
+        appointment = self.unassigned(10)
+        self.assertIn(assignment.assign(appointment), {self.tech.id, self.specialist.id})
+
+        self.specialist.specializations.add(self.service)
+        self.assertEqual(assignment.assign(appointment), self.specialist.id)
+
+        TechnicianAvailability.objects.create(technician=self.specialist, date=self.day, start_time=time(9, 0),
+                                              end_time=time(10, 30), is_available=False)
+        # the only specialist is away, nobody else is eligible
+        self.assertIsNone(assignment.assign(self.unassigned(10)))
+
+    def test_role_change_rebuilds_the_index(self):
+        appointment = self.unassigned(10)
+        self.specialist.specializations.add(self.service)
+        self.assertEqual(assignment.assign(appointment), self.specialist.id)
+
+        base_user = BaseUser.objects.get(pk=self.specialist.base_user_id)
+        base_user.user_type = 'MANAGER'
+        base_user.save()
+        self.assertEqual(assignment.assign(appointment), self.tech.id)
+        version = caches['shared'].get(assignment.INDEX_VERSION_KEY)
+        base_user.phone_number = '0661111111'
+        base_user.save()  # not a role change: the index stays
+        self.assertEqual(caches['shared'].get(assignment.INDEX_VERSION_KEY), version)
+
+    def test_batch_assignment_balances_load_and_updates_stats(self):
+        for hour in (9, 9, 11, 13):
+            self.unassigned(hour)
+        self.unassigned(9)  # third job at 9:00 and only two technicians
+
+        with CaptureQueriesContext(connection) as queries:
+            assigned, left = assignment.assign_unassigned()
+        self.assertEqual((assigned, left), (4, 1))
+        self.assertEqual(sum(q['sql'].startswith('UPDATE "service_appointment"') for q in queries), 1)
+        loads = Counter(Appointment.objects.exclude(assigned_technician=None)
+                        .values_list('assigned_technician', flat=True))
+        self.assertEqual(sorted(loads.values()), [2, 2])
+        self.assertEqual(TechnicianStats.objects.get(technician=self.specialist).total_assigned,
+                         loads[self.specialist.id])
+
+    def test_booking_assigns_a_technician(self):
+        data = {'service_type': self.service.id, 'vehicle': self.vehicle.id,
+                'scheduled_date': self.day.isoformat(), 'scheduled_time': '10:00', 'notes': ''}
+        if self.day.weekday() >= 5:
+            self.facility.schedule.is_open_weekends = True
+            self.facility.schedule.save()
+        with quiet_request_log():
+            client_for('customer1').post(reverse('service:create_appointment'), data)
+        self.assertIsNotNone(Appointment.objects.get().assigned_technician_id)
+
+
+@task('tests.fail')
+def failing_task(message):
+    raise RuntimeError(message)
+
+
+class JobQueueTests(TestCase):
+
+    def run_worker(self):
+        call_command('run_worker', processes=0, burst=True, no_schedules=True, stdout=io.StringIO(),
+                     stderr=io.StringIO())
+
+    def test_worker_runs_jobs_and_retries_with_backoff(self):
+        shop_owner = create_user('owner', 'OWNER')
+        ok = enqueue('notify', {'user_id': str(shop_owner.id), 'type': 'STATUS_UPDATE', 'title': 'Hi',
+                                'message': 'Queued'})
+        failing = enqueue('tests.fail', {'message': 'boom'}, max_attempts=2)
+        with self.assertLogs('service.jobs', 'WARNING'):
+            self.run_worker()
+
+        ok.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual((ok.status, ok.attempts), ('SUCCEEDED', 1))
+        self.assertEqual(shop_owner.notifications.get().message, 'Queued')
+        self.assertEqual((failing.status, failing.attempts), ('QUEUED', 1))
+        self.assertIn('RuntimeError: boom', failing.last_error)
+        self.assertGreater(failing.run_at, timezone.now())
+
+        Job.objects.filter(pk=failing.pk).update(run_at=timezone.now())
+        with self.assertLogs('service.jobs', 'ERROR'):
+            self.run_worker()
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), ('FAILED', 2))
+
+    def test_leased_jobs_are_not_claimed_twice(self):
+        job = enqueue('rebuild_analytics')
+        first = jobs.claim('worker-a', 10)
+        self.assertEqual([j.id for j in first], [job.id])
+        self.assertEqual(jobs.claim('worker-b', 10), [])
+
+        # worker-a died: once its lease expires another worker takes over and worker-a cannot finish it
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        second = jobs.claim('worker-b', 10)
+        self.assertEqual(second[0].attempts, 2)
+        self.assertFalse(jobs.finish(first[0]))
+        self.assertTrue(jobs.finish(second[0]))
+
+    def test_heartbeat_keeps_the_lease_of_a_long_job(self):
+        job = enqueue('rebuild_analytics')
+        claimed = jobs.claim('worker-a', 10, lease_seconds=60)
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() + timedelta(seconds=1))
+        self.assertEqual(jobs.renew(claimed, 60), 1)
+        self.assertGreater(Job.objects.get(pk=job.pk).locked_until, timezone.now() + timedelta(seconds=50))
+        self.assertEqual(jobs.claim('worker-b', 10), [])
+
+        # a lease already taken over by another worker is not renewed
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        jobs.claim('worker-b', 10)
+        with self.assertLogs('service.jobs', 'WARNING'):
+            self.assertEqual(jobs.renew(claimed, 60), 0)
+
+    @override_settings(JOB_SCHEDULES={'nightly': {'task': 'rebuild_analytics', 'interval': 3600}})
+    def test_schedules_enqueue_each_occurrence_once(self):
+        jobs.sync_schedules()
+        self.assertEqual(jobs.enqueue_due_schedules(), 1)
+        self.assertEqual(jobs.enqueue_due_schedules(), 0)
+        self.assertEqual(Job.objects.filter(task='rebuild_analytics').count(), 1)
+        self.assertGreater(JobSchedule.objects.get(name='nightly').next_run_at, timezone.now())
+
+
+class UnreadNotificationCounterTests(ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        reset_caches()
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(user=self.customer.base_user, type='STATUS_UPDATE', title='Update',
+                                           message='Changed', **kwargs)
+
+    def unread(self):
+        return BaseUser.objects.get(pk=self.customer.base_user_id).unread_notifications
+
+    def test_counter_follows_create_read_and_dismiss(self):
+        first, second = self.notify(), self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(self.unread(), 2)
+
+        client = client_for('customer1')
+        url = reverse('service:api_mark_notification_read', args=[first.id])
+        client.get(url)
+        client.get(url)  # marking twice must not count twice
+        self.assertEqual(self.unread(), 1)
+
+        client.post(reverse('service:api_notification_dismiss', args=[second.id]))
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(client.get(reverse('service:notifications')).context['unread_notifications_count'], 0)
+
+    def test_bulk_notify_and_reconcile(self):
+        bulk_notify([Notification(user=self.customer.base_user, type='STATUS_UPDATE', title='Bulk', message='x')
+                     for _ in range(3)])
+        self.assertEqual(self.unread(), 3)
+
+        Notification.objects.update(is_read=True)  # bypasses the signal handlers
+        out = io.StringIO()
+        call_command('reconcile_unread_counts', stdout=out)
+        self.assertIn('Corrected 1 unread counter(s)', out.getvalue())
+        self.assertEqual(self.unread(), 0)
+
+
+class RepairShopCacheTests(ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        reset_caches()
+
+    def test_pages_reuse_the_cached_shop_until_it_is_saved(self):
+        self.assertEqual(RepairShop.cached(), self.shop)
+        with self.assertNumQueries(0):
+            self.assertEqual(RepairShop.get_instance().name, 'Auto Service')
+
+        # a queryset update skips the version bump, so the cached copy survives until a real save
+        RepairShop.objects.filter(pk=self.shop.pk).update(name='Renamed')
+        self.assertEqual(RepairShop.cached().name, 'Auto Service')
+        self.shop.name = 'Renamed'
+        self.shop.save()
+        self.assertEqual(RepairShop.cached().name, 'Renamed')
+
+    def test_a_save_in_another_process_retires_this_copy(self):
+        self.assertEqual(RepairShop.cached().name, 'Auto Service')
+        RepairShop.objects.filter(pk=self.shop.pk).update(name='Renamed')
+        # what the save receivers do in a web or worker process that shares the 'shared' cache
+        subprocess.run(
+            [sys.executable, '-c', 'import django; django.setup(); '
+                                   'from service.models import RepairShop; RepairShop.clear_cache()'],
+            cwd=settings.BASE_DIR, check=True,
+        )
+        self.assertEqual(RepairShop.cached().name, 'Renamed')
+
+
+class LastServiceDateTests(ServiceDataMixin, TestCase):
+
+    def test_completion_moves_the_date_forward_only(self):
+        later = self.book(days=-2, status='COMPLETED')
+        self.book(days=-5, status='COMPLETED')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.last_service_date, later.scheduled_date)
+
+    def test_backfill_command_fills_missing_dates_in_chunks(self):
+        other = Vehicle.objects.create(owner=self.customer, vin='VIN0000000000002', make='VW', model='Golf',
+                                       year=2019, color='Red', license_plate='W-2')
+        done = self.book(days=-3, status='COMPLETED', actual_end_time=timezone.now() - timedelta(days=1))
+        self.book(days=-10, status='COMPLETED')
+        Vehicle.objects.update(last_service_date=None)  # legacy rows
+
+        out = io.StringIO()
+        call_command('backfill_last_service', batch_size=1, stdout=out)
+        self.assertIn('Back-filled last_service_date on 1 vehicle(s)', out.getvalue())
+        self.vehicle.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.vehicle.last_service_date, timezone.localdate(done.actual_end_time))
+        self.assertIsNone(other.last_service_date)
+
+
+class KeysetPaginationTests(TempMediaMixin, ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        reset_caches()
+
+    def walk(self, client, url, **params):
+        """Follow next_cursor to the end; returns the ids seen and the SQL of every page"""
+        ids, statements, cursor = [], [], None
+        while True:
+            query = dict(params, cursor=cursor) if cursor else params
+            with CaptureQueriesContext(connection) as queries:
+                data = client.get(url, query).json()
+            statements.append([q['sql'] for q in queries.captured_queries])
+            ids += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                return ids, statements
+
+    def test_notification_pages_cover_every_row_once_without_offset(self):
+        created = bulk_notify([Notification(user=self.customer.base_user, type='STATUS_UPDATE', title='Update',
+                                            message=str(i)) for i in range(25)])
+        # ties on created_at are broken by id
+        Notification.objects.filter(id__in=[n.id for n in created[:10]]).update(created_at=timezone.now())
+        expected = [str(pk) for pk in Notification.objects.order_by('-created_at', '-id').values_list('id', flat=True)]
+
+        ids, statements = self.walk(client_for('customer1'), reverse('service:api_notifications'), limit=4)
+        self.assertEqual(ids, expected)
+        self.assertEqual(len(statements), 7)
+        # a deep page runs the same number of statements as the first, and never an OFFSET
+        self.assertEqual(len(statements[-1]), len(statements[0]))
+        self.assertFalse(any('OFFSET' in sql for page in statements for sql in page))
+
+    def test_service_history_and_appointment_lists_paginate(self):
+        for days in (-1, -1, -1, -2, -3):
+            self.book(days=days, status='COMPLETED')
+        ids, _ = self.walk(client_for('customer1'), reverse('service:api_service_history', args=[self.vehicle.id]),
+                           limit=2)
+        expected = Appointment.objects.order_by('-scheduled_date', '-scheduled_time', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, [str(pk) for pk in expected])
+
+        with self.settings(LIST_PAGE_SIZE=2):
+            client = client_for('customer1')
+            first = client.get(reverse('service:appointments')).context['past_appointments']
+            self.assertTrue(first.has_next)
+            second = client.get(reverse('service:appointments'), {'past': first.next_cursor}).context['past_appointments']
+        self.assertEqual([a.id for a in list(first) + list(second)], list(expected[:4]))
+
+    def test_page_links_keep_the_other_lists_cursor(self):
+        for days in (1, 2, 3, 4, 5):
+            self.book(days=days)
+        for days in (-1, -2, -3):
+            self.book(days=days, status='COMPLETED')
+        url = reverse('service:appointments')
+        with self.settings(LIST_PAGE_SIZE=2):
+            client = client_for('customer1')
+            first = client.get(url).context
+            past = first['past_appointments'].next_cursor
+            response = client.get(url, {'upcoming': first['upcoming_appointments'].next_cursor, 'past': past})
+        later = response.context['upcoming_appointments'].next_cursor
+        self.assertContains(response, f'href="{escape("?" + urlencode({"upcoming": later, "past": past}))}"')
+        self.assertContains(response, f'href="{escape("?" + urlencode({"past": past}))}"')  # upcoming: first page
+
+    def test_messages_page_links_to_older_and_newest(self):
+        secretary = create_user('secretary1', 'SECRETARY')
+        Message.objects.bulk_create([Message(sender=self.customer.base_user, recipient=secretary,
+                                             subject=f'Question {i}', content='When?') for i in range(3)])
+        with self.settings(LIST_PAGE_SIZE=2):
+            client = client_for('secretary1')
+            first = client.get(reverse('service:messages'))
+            self.assertContains(first, 'Older messages')
+            self.assertNotContains(first, 'Newest')
+            second = client.get(reverse('service:messages'), {'cursor': first.context['received_messages'].next_cursor})
+        self.assertContains(second, 'Newest')
+        self.assertEqual(len(second.context['received_messages']), 1)
+
+    def test_bad_cursor_is_rejected_by_the_api_and_ignored_by_pages(self):
+        self.book(days=-1, status='COMPLETED')
+        client = client_for('customer1')
+        response = client.get(reverse('service:api_appointments'), {'list': 'past', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        page = client.get(reverse('service:vehicle_detail', args=[self.vehicle.id]), {'cursor': 'WzFd'})
+        self.assertEqual(len(page.context['service_history']), 1)
+
+
+class MaintenanceDueTests(ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        ServiceType.objects.filter(pk=self.service.pk).update(maintenance_interval_months=6)
+
+    def test_due_date_and_single_reminder_per_visit(self):
+        visit = self.book(days=-200, status='COMPLETED')
+        self.book(days=-400, status='COMPLETED')
+        out = io.StringIO()
+        call_command('compute_maintenance_due', batch_size=1, stdout=out)
+        call_command('compute_maintenance_due', stdout=out)  # re-running must not remind twice
+
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.next_maintenance_date, add_months(visit.scheduled_date, 6))
+        reminders = Notification.objects.filter(type='MAINTENANCE_DUE')
+        self.assertEqual([n.related_appointment_id for n in reminders], [visit.id])
+        self.assertEqual(BaseUser.objects.get(pk=self.customer.base_user_id).unread_notifications, 1)
+
+    def test_dismissed_reminder_is_not_sent_again(self):
+        visit = self.book(days=-200, status='COMPLETED')
+        self.assertEqual(maintenance.compute_maintenance_due(), (1, 1))
+        reminder = Notification.objects.get(type='MAINTENANCE_DUE')
+        response = client_for('customer1').post(reverse('service:api_notification_dismiss', args=[reminder.id]))
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(maintenance.compute_maintenance_due(), (0, 0))
+        self.assertFalse(Notification.objects.filter(type='MAINTENANCE_DUE').exists())
+        self.assertEqual(list(MaintenanceReminderLog.objects.values_list('appointment_id', 'due_date')),
+                         [(visit.id, add_months(visit.scheduled_date, 6))])
+
+    def test_vehicles_are_streamed_in_chunks(self):
+        other = Vehicle.objects.create(owner=self.customer, vin='VIN0000000000002', make='VW', model='Golf',
+                                       year=2019, color='Red', license_plate='W-2',
+                                       next_maintenance_date=date(2020, 1, 1))
+        recent = self.book(days=-10, status='COMPLETED')
+        with CaptureQueriesContext(connection) as queries:
+            changed, notified = maintenance.compute_maintenance_due(batch_size=1)
+        self.assertEqual((changed, notified), (2, 0))
+        # the vehicle table is read by one streaming query, not once per chunk
+        self.assertEqual(sum('FROM "service_vehicle"' in q['sql'] for q in queries.captured_queries), 1)
+        other.refresh_from_db()
+        self.vehicle.refresh_from_db()
+        self.assertIsNone(other.next_maintenance_date)
+        self.assertEqual(self.vehicle.next_maintenance_date, add_months(recent.scheduled_date, 6))
+
+    def test_add_months_clamps_to_month_end(self):
+        self.assertEqual(add_months(date(2026, 1, 31), 1), date(2026, 2, 28))
+        self.assertEqual(add_months(date(2026, 11, 15), 14), date(2028, 1, 15))
+
+
+class AppointmentReminderTests(ServiceDataMixin, TestCase):
+
+    def at(self, day, hour, minute=0):
+        return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+    def sent(self):
+        return list(Notification.objects.filter(type='APPOINTMENT_REMINDER').values_list('related_appointment_id',
+                                                                                         flat=True))
+
+    def test_each_window_fires_once(self):
+        appt = self.book(days=1)
+        eve = appt.scheduled_date - timedelta(days=1)
+        self.assertEqual(reminders.send_reminders(now=self.at(eve, 12)), 1)
+        self.assertEqual(reminders.send_reminders(now=self.at(eve, 12, 5)), 0)  # rerun
+        self.assertEqual(reminders.send_reminders(now=self.at(appt.scheduled_date, 8, 30)), 1)
+        self.assertEqual(reminders.send_reminders(now=self.at(appt.scheduled_date, 9)), 0)
+        self.assertEqual(self.sent(), [appt.id, appt.id])
+        self.assertEqual(BaseUser.objects.get(pk=self.customer.base_user_id).unread_notifications, 2)
+
+    def test_late_booking_and_overlapping_workers_get_one_reminder(self):
+        appt = self.book(days=1)
+        now = self.at(appt.scheduled_date, 9)
+        # another worker already claimed the pair: this run must not notify
+        ReminderLog.objects.create(appointment=appt, window='2h', batch=uuid.uuid4(), notified=True)
+        self.assertEqual(reminders.send_reminders(now=now), 0)
+        ReminderLog.objects.all().delete()
+        self.assertEqual(reminders.send_reminders(now=now), 1)
+        # booked an hour ahead: the 24h window is recorded as handled without a second reminder
+        self.assertEqual(set(ReminderLog.objects.values_list('window', 'notified')), {('2h', True), ('24h', False)})
+        self.assertEqual(len(self.sent()), 1)
+
+    def test_rescheduling_forgets_the_handled_windows(self):
+        appt = self.book(days=1)
+        reminders.send_reminders(now=self.at(appt.scheduled_date, 9))
+        appt.scheduled_time = time(11, 0)
+        appt.save()
+        self.assertFalse(ReminderLog.objects.exists())
+
+
+class AsyncApiViewTests(ServiceDataMixin, TestCase):
+
+    async def call(self, view, username, *args, method='get'):
+        user = await User.objects.aget(username=username)
+        request = getattr(AsyncRequestFactory(), method)('/')
+
+        async def auser():
+            return user
+        request.user, request.auser = user, auser
+        response = await view(request, *args)
+        return response.status_code, json.loads(response.content)
+
+    def sync_get(self, url):
+        return client_for('customer1').get(url).json()
+
+    async def test_async_reads_match_the_sync_views(self):
+        notification = await Notification.objects.acreate(user_id=self.customer.base_user_id, type='STATUS_UPDATE',
+                                                          title='Update', message='Changed')
+        for view, arg in ((async_views.api_facility_schedule, self.facility.id),
+                          (async_views.api_technician_schedule, self.tech.id)):
+            expected = await sync_to_async(self.sync_get)(reverse(f'service:{view.__name__}', args=[arg]))
+            self.assertEqual(await self.call(view, 'customer1', arg), (200, expected))
+
+        self.assertEqual(await self.call(async_views.api_mark_notification_read, 'customer1', notification.id),
+                         (200, {'status': 'success'}))
+        base_user = await BaseUser.objects.aget(pk=self.customer.base_user_id)
+        self.assertEqual(base_user.unread_notifications, 0)
+        with self.assertRaises(Http404):
+            await self.call(async_views.api_mark_notification_read, 'tech1', notification.id)
+
+    async def test_async_start_and_complete(self):
+        appt = await sync_to_async(self.book)(days=0, scheduled_time=time(8, 0))
+        start, complete = async_views.api_appointment_start, async_views.api_appointment_complete
+        self.assertEqual((await self.call(start, 'customer1', appt.id, method='post'))[0], 403)
+        self.assertEqual(await self.call(start, 'tech1', appt.id, method='post'), (200, {'success': True}))
+        self.assertEqual((await self.call(start, 'tech1', appt.id, method='post'))[0], 400)
+        self.assertEqual(await self.call(complete, 'tech1', appt.id, method='post'), (200, {'success': True}))
+
+        appt = await Appointment.objects.aget(pk=appt.pk)
+        self.assertEqual(appt.status, 'COMPLETED')
+        self.assertTrue(await Notification.objects.filter(related_appointment=appt, type='STATUS_UPDATE').aexists())
+
+
+class LiveEventTests(ServiceDataMixin, TestCase):
+
+    def listen(self, base_user, since=None):
+        listener = events.Listener(base_user, since and since.isoformat())
+        subscription = events.Subscription(listener.keys)
+        events.hub.subscribe(subscription)
+        self.addCleanup(events.hub.unsubscribe, subscription)
+        return listener, subscription
+
+    def received(self, subscription):
+        return [event for event in iter(lambda: subscription.get(timeout=0), None)]
+
+    def test_hub_publishes_after_commit(self):
+        _, customer = self.listen(self.customer.base_user)
+        _, tech = self.listen(self.tech.base_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            appt = self.book(days=0)
+            Notification.objects.create(user_id=self.customer.base_user_id, type='STATUS_UPDATE',
+                                        title='Booked', message='See you soon')
+            self.assertEqual(self.received(customer), [])  # nothing leaves an open transaction
+        self.assertEqual([e['event'] for e in self.received(customer)], ['appointment', 'notification'])
+        self.assertEqual(len(self.received(tech)), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appt.notes = 'no status change'
+            appt.save()
+        self.assertEqual(self.received(tech), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            appt.status = 'IN_PROGRESS'
+            appt.save()
+        event, = self.received(tech)
+        self.assertEqual(event['data']['status_display'], 'In Progress')
+
+    def test_database_fallback_sends_each_event_once(self):
+        listener = events.Listener(self.customer.base_user, (timezone.now() - timedelta(minutes=1)).isoformat())
+        # created without a subscriber in this process, as if by another worker
+        notification = Notification.objects.create(user_id=self.customer.base_user_id, type='STATUS_UPDATE',
+                                                   title='Update', message='Changed')
+        polled = listener.poll()
+        self.assertEqual([e['data']['id'] for e in polled], [str(notification.id)])
+        self.assertEqual(listener.poll(), [])
+        self.assertFalse(listener.accept(polled[0]))  # the hub delivering it as well is dropped
+
+    def test_database_fallback_sends_status_changes_only(self):
+        appt = self.book()
+        listener = events.Listener(self.customer.base_user)
+        # queryset updates, as made by another process without subscribers here
+        Appointment.objects.filter(pk=appt.pk).update(notes='Bring the spare key', updated_at=timezone.now())
+        self.assertEqual(listener.poll(), [])
+        Appointment.objects.filter(pk=appt.pk).update(status='IN_PROGRESS', updated_at=timezone.now())
+        booked = self.book(days=2)
+        self.assertEqual([(e['data']['id'], e['data']['status']) for e in listener.poll()],
+                         [(str(appt.id), 'IN_PROGRESS'), (str(booked.id), 'SCHEDULED')])
+        Appointment.objects.filter(pk=appt.pk).update(final_cost=Decimal('90'), updated_at=timezone.now())
+        self.assertEqual(listener.poll(), [])
+
+    def test_pages_open_the_stream_only_when_enabled(self):
+        client = client_for('customer1')
+        with self.settings(LIVE_EVENTS_STREAM=False):
+            self.assertNotContains(client.get(reverse('service:notifications')), 'data-events-url')
+        with self.settings(LIVE_EVENTS_STREAM=True):
+            self.assertContains(client.get(reverse('service:notifications')),
+                                f'data-events-url="{reverse("service:events")}"')
+
+    @override_settings(SSE_MAX_SECONDS=0)
+    def test_stream_resumes_from_last_event_id(self):
+        since = timezone.now() - timedelta(minutes=1)
+        Notification.objects.create(user_id=self.customer.base_user_id, type='STATUS_UPDATE',
+                                    title='Missed', message='While offline')
+        response = client_for('customer1').get(reverse('service:events'), HTTP_LAST_EVENT_ID=since.isoformat())
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('event: notification\ndata: {', body)
+        self.assertIn('"title":"Missed"', body)
+
+
+class AppointmentTransitionTests(ServiceDataMixin, TestCase):
+
+    def post(self, username, name, *args, data=None):
+        return client_for(username).post(reverse(f'service:{name}', args=args), data=data or {},
+                                         content_type='application/json')
+
+    def test_batch_applies_each_item_with_compare_and_set(self):
+        other = Employee.objects.create(base_user=create_user('tech2', 'TECHNICIAN'), facility=self.facility,
+                                        hire_date=timezone.localdate(), salary=Decimal('30000'))
+        first, second = self.book(days=0), self.book(days=0, scheduled_time=time(12, 0))
+        done, foreign = self.book(days=0, status='COMPLETED'), self.book(days=0, assigned_technician=other)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post('tech1', 'api_appointment_transition', data={'transitions': [
+                {'id': str(first.id), 'status': 'IN_PROGRESS'},
+                {'id': str(first.id), 'status': 'COMPLETED', 'comment': 'Filter replaced'},
+                {'id': str(second.id), 'status': 'IN_PROGRESS'},
+                {'id': str(done.id), 'status': 'IN_PROGRESS'},
+                {'id': str(foreign.id), 'status': 'IN_PROGRESS'},
+                {'id': 'nope', 'status': 'COMPLETED'},
+            ]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['result'] for r in response.json()['results']],
+                         ['applied', 'applied', 'applied', 'conflict', 'not_found', 'invalid'])
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.notes), ('COMPLETED', 'Filter replaced'))
+        self.assertEqual(Appointment.objects.get(pk=second.pk).status, 'IN_PROGRESS')
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.last_service_date, timezone.localdate())
+        notification = Notification.objects.get(related_appointment=first)
+        self.assertIn('Technician note: Filter replaced', notification.message)
+        self.assertEqual(BaseUser.objects.get(pk=self.customer.base_user_id).unread_notifications, 1)
+        self.assertEqual(TechnicianStats.objects.get(technician=self.tech).completed_count, 2)
+
+    def test_single_transition_is_one_conditional_update(self):
+        appt = self.book(days=0)
+        with CaptureQueriesContext(connection) as queries:
+            result, = transitions.transition(self.tech.base_user, [(appt.id, 'IN_PROGRESS', '')])
+        self.assertEqual(result['result'], 'applied')
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('UPDATE', 'INSERT'))]
+        self.assertEqual(len(writes), 1)
+
+        # another request completed it after this one read it IN_PROGRESS: the conditional UPDATE matches nothing
+        Appointment.objects.filter(pk=appt.pk).update(status='COMPLETED')
+        self.assertEqual(transitions._update('COMPLETED', [(appt.id, '')], self.tech.id, timezone.now()), set())
+        self.assertFalse(Notification.objects.filter(related_appointment=appt).exists())
+
+        self.assertEqual(self.post('tech1', 'api_appointment_start', appt.id).status_code, 400)
+        self.assertEqual(self.post('customer1', 'api_appointment_start', appt.id).status_code, 403)
+
+    def test_side_effects_cost_the_same_for_one_or_many_completions(self):
+        counts = []
+        for hours in ((8,), (10, 12, 14)):
+            appts = [self.book(days=0, status='IN_PROGRESS', scheduled_time=time(hour, 0)) for hour in hours]
+            with CaptureQueriesContext(connection) as queries, audit.event_batch():
+                transitions.transition(self.tech.base_user, [(appt.id, 'COMPLETED', '') for appt in appts])
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Notification.objects.filter(title='Service Completed').count(), 4)
+
+
+def next_weekday(days=1):
+    day = timezone.localdate() + timedelta(days=days)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return day
+
+
+class FacilityDayLoadTests(ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        Schedule.objects.filter(facility=self.facility).update(max_daily_appointments=2)
+        self.day = next_weekday()
+
+    def book_online(self, hour):
+        with quiet_request_log():
+            return client_for('customer1').post(reverse('service:create_appointment'), {
+                'service_type': self.service.id, 'vehicle': self.vehicle.id,
+                'scheduled_date': self.day.isoformat(), 'scheduled_time': f'{hour:02d}:00',
+            })
+
+    def booked(self):
+        return FacilityDayLoad.objects.get(facility=self.facility, date=self.day).booked
+
+    def test_claim_enforces_the_daily_limit_and_cancel_releases(self):
+        self.assertEqual(self.book_online(9).status_code, 302)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(capacity.claim(self.facility.id, self.day))
+        self.assertEqual(len(queries), 1)
+        FacilityDayLoad.objects.filter(facility=self.facility).update(booked=1)
+
+        self.assertEqual(self.book_online(11).status_code, 302)
+        self.assertEqual(self.book_online(13).status_code, 200)  # day is full
+        self.assertEqual((Appointment.objects.filter(scheduled_date=self.day).count(), self.booked()), (2, 2))
+
+        appt = Appointment.objects.filter(scheduled_date=self.day).first()
+        client_for('customer1').get(reverse('service:appointment_cancel', args=[appt.id]))
+        client_for('customer1').get(reverse('service:appointment_cancel', args=[appt.id]))
+        self.assertEqual(self.booked(), 1)
+        self.assertEqual(self.book_online(13).status_code, 302)
+
+    def test_counter_follows_other_changes(self):
+        first = self.book(days=(self.day - timezone.localdate()).days, scheduled_time=time(9, 0))
+        self.book(days=(self.day - timezone.localdate()).days, scheduled_time=time(12, 0))
+        # the first claim of a day seeds the counter from the appointments already booked
+        self.assertFalse(capacity.claim(self.facility.id, self.day))
+        self.assertEqual(self.booked(), 2)
+
+        # a completed appointment keeps its place in the day
+        first.status = 'IN_PROGRESS'
+        first.save()
+        transitions.transition(self.tech.base_user, [(first.id, 'COMPLETED', '')])
+        self.assertEqual(self.booked(), 2)
+        self.assertFalse(capacity.claim(self.facility.id, self.day))
+        self.assertTrue(slots.build_timelines(self.facility, [self.day])[self.day].is_full)
+
+        second = Appointment.objects.filter(scheduled_date=self.day, status='SCHEDULED').get()
+        second.scheduled_date = next_weekday((self.day - timezone.localdate()).days + 1)
+        second.save()
+        self.assertEqual(self.booked(), 1)
+
+        FacilityDayLoad.objects.filter(date=self.day).update(booked=7)
+        self.assertIn((7, 1), [row[2:] for row in capacity.reconcile_loads()])
+        self.assertEqual(self.booked(), 1)
+
+
+
+class EventLogTests(ServiceDataMixin, TestCase):
+
+    def test_request_events_are_written_after_the_response(self):
+        appt = self.book(days=3)
+        client = client_for('customer1')
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('service:appointment_cancel', args=[appt.id]))
+        inserts = [q['sql'] for q in queries.captured_queries if 'INSERT INTO "service_eventlog"' in q['sql']]
+        self.assertEqual((response.status_code, len(inserts)), (302, 1))
+        event = EventLog.objects.get()
+        self.assertEqual((event.event_type, event.appointment_id, event.user_id),
+                         ('APPOINTMENT_CANCELLED', appt.id, self.customer.base_user_id))
+
+    @override_settings(EVENT_LOG_BATCH_SIZE=3)
+    def test_batch_flushes_at_the_size_threshold(self):
+        with audit.event_batch() as batch:
+            for n in range(4):
+                audit.log_event('USER_REGISTERED', f'user {n}', n=n)
+            self.assertEqual((EventLog.objects.count(), len(batch)), (3, 1))
+        self.assertEqual(sorted(EventLog.objects.values_list('metadata__n', flat=True)), [0, 1, 2, 3])
+
+        with override_settings(EVENT_LOG_MODE='off'), audit.event_batch():
+            audit.log_event('USER_REGISTERED', 'dropped')
+        self.assertEqual(EventLog.objects.count(), 4)
+
+
+class EventLogRetentionTests(ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.enterContext(override_settings(EVENT_LOG_ARCHIVE_ROOT=root, EVENT_LOG_RETENTION_MONTHS=2))
+        self.today = date(2026, 10, 17)
+        tz = timezone.get_current_timezone()
+        self.events = EventLog.objects.bulk_create([
+            EventLog(event_type=event_type, description=str(n), user=self.customer.base_user,
+                     created_at=datetime(2026, month, day, 12, tzinfo=tz))
+            for n, (month, day, event_type) in enumerate([
+                (7, 31, 'USER_REGISTERED'), (8, 1, 'REVIEW_SUBMITTED'), (8, 20, 'USER_REGISTERED'),
+                (9, 1, 'REVIEW_SUBMITTED'), (10, 2, 'USER_REGISTERED'),
+            ])
+        ])
+
+    def test_expired_months_move_to_archives_and_stay_readable(self):
+        self.assertEqual(retention.expired_months(today=self.today), [(date(2026, 7, 1), 1), (date(2026, 8, 1), 2)])
+        archives = retention.archive_expired(chunk_size=1, today=self.today)
+        self.assertEqual([(a.month, a.rows, a.purged) for a in archives],
+                         [(date(2026, 7, 1), 1, True), (date(2026, 8, 1), 2, True)])
+        self.assertEqual(sorted(EventLog.objects.values_list('description', flat=True)), ['3', '4'])
+
+        self.assertEqual([row['description'] for row in retention.iter_events()], ['0', '1', '2', '3', '4'])
+        rows = list(retention.iter_events(since=self.events[1].created_at, until=self.events[4].created_at,
+                                          event_type='REVIEW_SUBMITTED', user_id=self.customer.base_user_id))
+        self.assertEqual([row['description'] for row in rows], ['1', '3'])
+        self.assertEqual(rows[0]['id'], self.events[1].id)
+        self.assertEqual(rows[0]['created_at'], self.events[1].created_at)
+
+    def test_interrupted_purge_is_finished_without_duplicates(self):
+        with mock.patch.object(retention, 'purge'):
+            archive = retention.archive_month(date(2026, 8, 1))
+        self.assertEqual((archive.purged, EventLog.objects.count()), (False, 5))
+        self.assertEqual(len(list(retention.iter_events())), 5)
+
+        EventLog.objects.create(event_type='USER_REGISTERED', description='late', created_at=self.events[2].created_at)
+        retention.archive_expired(today=self.today)
+        self.assertEqual(list(EventLogArchive.objects.values_list('month', 'part', 'rows', 'purged')), [
+            (date(2026, 7, 1), 1, 1, True), (date(2026, 8, 1), 1, 2, True), (date(2026, 8, 1), 2, 1, True),
+        ])
+        self.assertEqual(EventLog.objects.count(), 2)
+        self.assertEqual(len(list(retention.iter_events())), 6)
+
+    def test_overlapping_run_that_loses_the_part_keeps_the_winners_file(self):
+        winner = retention.archive_month(date(2026, 8, 1))
+        late = EventLog.objects.create(event_type='USER_REGISTERED', description='late',
+                                       created_at=self.events[2].created_at)
+        # a run that read the part number before the winner recorded it
+        with mock.patch.object(retention, '_next_part', return_value=1):
+            self.assertIsNone(retention.archive_month(date(2026, 8, 1)))
+        self.assertEqual([row['description'] for row in retention.read_archive(winner)], ['1', '2'])
+        self.assertTrue(EventLog.objects.filter(pk=late.pk).exists())
+        files = [name for _, _, names in os.walk(retention.archive_root()) for name in names]
+        self.assertEqual(files, [os.path.basename(winner.name)])
+
+
+class ExportTests(ServiceDataMixin, TestCase):
+
+    def setUp(self):
+        create_user('manager1', 'MANAGER')
+        self.done = self.book(days=-3, status='COMPLETED', final_cost=Decimal('95.50'),
+                              actual_end_time=timezone.now() - timedelta(days=3))
+        self.upcoming = self.book(days=2)
+        self.book(days=-20, status='CANCELLED')
+
+    def download(self, name, username='manager1', **params):
+        response = client_for(username).get(reverse(f'service:{name}'), params)
+        return response, b''.join(response.streaming_content).decode() if response.streaming else None
+
+    def test_appointments_stream_as_csv_from_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response, body = self.download('export_appointments', **{
+                'from': (timezone.localdate() - timedelta(days=7)).isoformat(), 'status': 'COMPLETED,SCHEDULED',
+                'facility': str(self.facility.id),
+            })
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual([row['id'] for row in rows], [str(self.done.id), str(self.upcoming.id)])
+        self.assertEqual((rows[0]['service'], rows[0]['vin'], rows[0]['customer'], rows[0]['technician']),
+                         ('Oil Change', 'VIN0000000000001', 'customer1', 'tech1'))
+        self.assertEqual(len([q for q in queries.captured_queries if 'service_appointment' in q['sql']]), 1)
+
+        self.assertEqual(self.download('export_appointments', status='LOST')[0].status_code, 400)
+        self.assertEqual(self.download('export_appointments', username='customer1')[0].status_code, 403)
+
+    def test_revenue_and_reviews_export_as_jsonl(self):
+        Review.objects.create(appointment=self.done, rating=4, comment='Quick')
+        _, body = self.download('export_revenue', format='jsonl', to=timezone.localdate().isoformat())
+        revenue = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row['appointment_id'], row['final_cost'], row['payment_status']) for row in revenue],
+                         [(str(self.done.id), '95.50', None)])
+
+        out = io.StringIO()
+        call_command('export_data', 'reviews', format='jsonl', facility=str(self.facility.id), stdout=out)
+        self.assertEqual([(row['rating'], row['comment']) for row in map(json.loads, out.getvalue().splitlines())],
+                         [(4, 'Quick')])
+        self.assertEqual(exports.export_queryset('reviews', start=timezone.localdate() + timedelta(days=1)).count(), 0)
+
+    def test_csv_quotes_formula_text_and_jsonl_keeps_it(self):
+        Review.objects.create(appointment=self.done, rating=2, comment='=HYPERLINK("http://x")',
+                              technician_comment='-slow')
+        _, body = self.download('export_reviews')
+        row = next(csv.DictReader(io.StringIO(body)))
+        self.assertEqual((row['comment'], row['technician_comment'], row['rating']),
+                         ('\'=HYPERLINK("http://x")', "'-slow", '2'))
+        _, body = self.download('export_revenue')
+        self.assertEqual(next(csv.DictReader(io.StringIO(body)))['final_cost'], '95.50')
+
+        _, body = self.download('export_reviews', format='jsonl')
+        self.assertEqual(json.loads(body)['comment'], '=HYPERLINK("http://x")')
+
+
+class FastLoadDataTests(TestCase):
+
+    def test_loads_populate_without_duplicates_and_reloads_in_place(self):
+        with open(fastload.fixture_path('populate')) as fixture:
+            expected = Counter(obj['model'] for obj in json.load(fixture))
+        call_command('fast_loaddata', 'populate', stdout=io.StringIO())
+        counts = Counter({model._meta.label_lower: model.objects.count()
+                          for model in (User, BaseUser, Facility, Schedule, RepairShop, Analytics, Appointment)})
+        self.assertEqual(counts, Counter({label: expected[label] for label in counts}))
+        user = User.objects.get(username='admin')
+        self.assertEqual(user.date_joined, datetime.fromisoformat('2025-06-11T10:24:15.785+00:00'))
+
+        # loading again (either way) updates the same rows; the schedule / analytics handlers skip raw saves
+        call_command('loaddata', 'populate', verbosity=0)
+        call_command('fast_loaddata', 'populate', stdout=io.StringIO())
+        self.assertEqual((Schedule.objects.count(), Analytics.objects.count(), Appointment.objects.count()),
+                         (expected['service.schedule'], 1, expected['service.appointment']))
+
+    def test_rows_are_validated_per_batch_and_nothing_is_kept_on_failure(self):
+        facility = uuid.uuid4()
+        owner = {'model': 'auth.user', 'pk': 900, 'fields': {'username': 'owner', 'password': '!'}}
+        rows = [owner, {'model': 'service.baseuser', 'pk': str(uuid.uuid4()), 'fields': {
+            'user': 900, 'user_type': 'OWNER', 'phone_number': '1', 'address': '-',
+            'created_at': '2026-01-01T00:00:00Z', 'updated_at': '2026-01-01T00:00:00Z'}}]
+        rows.append({'model': 'service.schedule', 'pk': str(uuid.uuid4()), 'fields': {
+            'facility': str(facility), 'opening_time': '18:00', 'closing_time': '09:00',
+            'created_at': '2026-01-01T00:00:00Z', 'updated_at': '2026-01-01T00:00:00Z'}})
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'snapshot.jsonl.gz')
+            with gzip.open(path, 'wt') as out:
+                out.writelines(json.dumps(row) + '\n' for row in rows)
+            with mock.patch.object(fastload, 'READ_CHUNK', 16):
+                self.assertEqual(len(list(fastload.iter_objects(gzip.open(path, 'rt')))), 3)
+                with self.assertRaisesMessage(fastload.FixtureError, 'Closing time must be later than opening time.'):
+                    fastload.load_fixtures([path], batch_size=2)
+        self.assertFalse(User.objects.filter(username='owner').exists())
+
+    def test_rebuild_is_refused_for_another_database(self):
+        with self.assertRaisesMessage(CommandError, '--rebuild only works with the default database.'):
+            call_command('fast_loaddata', 'populate', database='other', rebuild=True, stdout=io.StringIO())
+        self.assertFalse(User.objects.exists())
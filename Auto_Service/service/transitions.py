@@ -0,0 +1,170 @@
+"""
+Technician status transitions (start / complete) as compare-and-set UPDATEs.
+
+``transition`` reads the requested appointments with one query and moves
+them with one conditional ``UPDATE ... WHERE status = <expected>`` per target
+status, so a single start or completion costs two statements and two
+technicians (or two browser tabs) can never both apply the same transition:
+the loser's UPDATE matches no row and is reported as a conflict. Many
+appointments are handled the same way in one call, which backs the batch
+endpoint technicians use to close out a day.
+
+The UPDATEs bypass the Appointment signal handlers in models.py, so their
+effects are applied here in bulk instead: analytics and technician stats,
+the vehicles' last service date, the slot cache, live events, audit events,
+and one ``bulk_notify`` for the customers of completed appointments. The
+facility-day load counters need nothing: starting or completing an
+appointment keeps its place in the day (see service/capacity.py).
+"""
+import uuid
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .audit import log_event
+from .models import SLOT_FIELDS, Appointment, Notification, Vehicle
+
+# target status -> (status it must currently have, timestamp column recorded)
+TRANSITIONS = {
+    'IN_PROGRESS': ('SCHEDULED', 'actual_start_time'),
+    'COMPLETED': ('IN_PROGRESS', 'actual_end_time'),
+}
+CONFLICT_MESSAGES = {
+    'IN_PROGRESS': 'Only scheduled appointments can be started.',
+    'COMPLETED': 'Only in-progress appointments can be completed.',
+}
+MAX_BATCH = 100
+
+APPLIED, CONFLICT, NOT_FOUND, INVALID = 'applied', 'conflict', 'not_found', 'invalid'
+
+
+def _result(appointment_id, target, outcome, error=None):
+    result = {'id': str(appointment_id), 'status': target, 'result': outcome}
+    if error:
+        result['error'] = error
+    return result
+
+
+def _update(target, planned, technician_id, now):
+    """Move ``planned`` ``[(appointment_id, comment)]`` to ``target``; returns the ids actually changed"""
+    expected, timestamp = TRANSITIONS[target]
+    ids = [appointment_id for appointment_id, _ in planned]
+    values = {'status': target, timestamp: now, 'updated_at': now}
+    comments = [When(pk=appointment_id, then=Value(comment)) for appointment_id, comment in planned if comment]
+    if comments:
+        values['notes'] = Case(*comments, default=F('notes'), output_field=Appointment._meta.get_field('notes'))
+    changed = Appointment.objects.filter(
+        pk__in=ids, assigned_technician_id=technician_id, status=expected,
+    ).update(**values)
+    if changed == len(ids):
+        return set(ids)
+    # another request moved some of them first: the rows carrying this call's timestamp are ours
+    return set(Appointment.objects.filter(pk__in=ids, status=target, **{timestamp: now})
+               .values_list('pk', flat=True))
+
+
+def transition(base_user, items, now=None):
+    """Apply ``items`` ``[(appointment_id, target status, comment)]`` for the technician ``base_user``.
+
+    Returns one result dict per item, in order, whose ``result`` is ``applied``, ``conflict`` (the
+    appointment is not in the status the transition starts from), ``not_found`` (not this
+    technician's appointment) or ``invalid``. Items are applied in lifecycle order, so one batch may
+    start and complete the same appointment.
+    """
+    from .analytics import APPOINTMENT_FIELDS
+
+    now = now or timezone.now()
+    results = [None] * len(items)
+    parsed = []
+    for index, (appointment_id, target, comment) in enumerate(items):
+        if not isinstance(target, str) or target not in TRANSITIONS:
+            results[index] = _result(appointment_id, target, INVALID, 'Unknown target status.')
+            continue
+        try:
+            parsed.append((index, uuid.UUID(str(appointment_id)), target, (comment or '').strip()))
+        except ValueError:
+            results[index] = _result(appointment_id, target, INVALID, 'Malformed appointment id.')
+
+    appointments = {
+        appt.pk: appt for appt in Appointment.objects.filter(
+            pk__in={appointment_id for _, appointment_id, _, _ in parsed}, assigned_technician__base_user=base_user,
+        ).select_related('service_type', 'customer').only(
+            *APPOINTMENT_FIELDS, 'customer_id', 'vehicle_id', 'actual_start_time', 'notes', 'updated_at',
+            'service_type__name', 'service_type__duration_minutes', 'service_type__facility_id',
+            'customer__base_user_id',
+        )
+    } if parsed else {}
+    before = {pk: appt.get_state(APPOINTMENT_FIELDS + SLOT_FIELDS) for pk, appt in appointments.items()}
+
+    # plan against the statuses as read, in the order given
+    status = {pk: appt.status for pk, appt in appointments.items()}
+    planned = defaultdict(list)
+    for index, appointment_id, target, comment in parsed:
+        if appointment_id not in appointments:
+            results[index] = _result(appointment_id, target, NOT_FOUND, 'Appointment not found.')
+        elif status[appointment_id] != TRANSITIONS[target][0]:
+            results[index] = _result(appointment_id, target, CONFLICT, CONFLICT_MESSAGES[target])
+        else:
+            status[appointment_id] = target
+            planned[target].append((index, appointment_id, comment))
+    if not planned:
+        return results
+
+    technician_id = next(iter(appointments.values())).assigned_technician_id
+    with transaction.atomic():
+        for target in TRANSITIONS:
+            if not planned[target]:
+                continue
+            changed = _update(target, [(pk, comment) for _, pk, comment in planned[target]], technician_id, now)
+            for index, appointment_id, comment in planned[target]:
+                if appointment_id not in changed:
+                    results[index] = _result(appointment_id, target, CONFLICT, CONFLICT_MESSAGES[target])
+                    continue
+                appt = appointments[appointment_id]
+                appt.status, appt.updated_at = target, now
+                setattr(appt, TRANSITIONS[target][1], now)
+                if comment:
+                    appt.notes = comment
+                results[index] = _result(appointment_id, target, APPLIED)
+        moved = [appt for pk, appt in appointments.items() if appt.status != before[pk]['status']]
+        if moved:
+            _after_transition(moved, before, {pk: comment for _, pk, comment in planned['COMPLETED']})
+    for appt in moved:
+        if appt.status == 'COMPLETED':
+            log_event('APPOINTMENT_COMPLETED', f'{appt.service_type.name} completed', user=base_user,
+                      facility=appt.service_type.facility_id, appointment=appt)
+    return results
+
+
+def _after_transition(moved, before, comments):
+    """What the Appointment post_save handlers would have done for ``moved``"""
+    from .analytics import APPOINTMENT_FIELDS, record_appointment_changes
+    from .events import publish_appointment
+    from .notifications import bulk_notify
+    from .slots import invalidate_appointment
+
+    record_appointment_changes([(before[appt.pk], appt.get_state(APPOINTMENT_FIELDS)) for appt in moved],
+                               {appt.service_type_id: appt.service_type for appt in moved})
+
+    completed = [appt for appt in moved if appt.status == 'COMPLETED']
+    served = defaultdict(list)
+    for appt in completed:
+        served[timezone.localdate(appt.actual_end_time)].append(appt.vehicle_id)
+    for day, vehicle_ids in served.items():
+        # a later service date written concurrently is never overwritten (see update_vehicle_last_service)
+        Vehicle.objects.filter(Q(last_service_date__isnull=True) | Q(last_service_date__lt=day),
+                               pk__in=vehicle_ids).update(last_service_date=day)
+
+    for appt in moved:
+        invalidate_appointment(before[appt.pk], appt.get_state(SLOT_FIELDS), appt.service_type)
+        publish_appointment(appt)
+
+    if completed:
+        bulk_notify([Notification(
+            user_id=appt.customer.base_user_id, type='STATUS_UPDATE', title='Service Completed',
+            message=(f'Your appointment "{appt.service_type.name}" has been completed. '
+                     f'{"Technician note: " + comments[appt.pk] if comments.get(appt.pk) else ""}'),
+            related_appointment_id=appt.pk,
+        ) for appt in completed])
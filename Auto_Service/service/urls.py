@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# The ASGI profile serves the high-frequency JSON endpoints from async views
+api = async_views if getattr(settings, 'ASYNC_API_VIEWS', False) else views
 
 app_name = 'service'
 
@@ -38,12 +42,22 @@ urlpatterns = [
     path('admin/analytics/', views.admin_analytics, name='admin_analytics'),
     path('admin/users/', views.admin_users, name='admin_users'),
     path('admin/facilities/manage/', views.admin_facilities, name='admin_facilities'),
+    path('admin/exports/appointments/', views.admin_export, {'kind': 'appointments'}, name='export_appointments'),
+    path('admin/exports/revenue/', views.admin_export, {'kind': 'revenue'}, name='export_revenue'),
+    path('admin/exports/reviews/', views.admin_export, {'kind': 'reviews'}, name='export_reviews'),
     
     # API endpoints for AJAX requests
-    path('api/facility-schedule/<uuid:facility_id>/', views.api_facility_schedule, name='api_facility_schedule'),
-    path('api/appointment/<uuid:appointment_id>/start/', views.api_appointment_start, name='api_appointment_start'),
-    path('api/appointment/<uuid:appointment_id>/complete/', views.api_appointment_complete, name='api_appointment_complete'),
-    path('api/technician-schedule/<uuid:technician_id>/', views.api_technician_schedule, name='api_technician_schedule'),
-    path('api/mark-notification-read/<uuid:notification_id>/', views.api_mark_notification_read, name='api_mark_notification_read'),
+    path('api/facility-schedule/<uuid:facility_id>/', api.api_facility_schedule, name='api_facility_schedule'),
+    path('api/facility-slots/<uuid:facility_id>/', views.api_facility_slots, name='api_facility_slots'),
+    path('api/appointment/<uuid:appointment_id>/start/', api.api_appointment_start, name='api_appointment_start'),
+    path('api/appointment/<uuid:appointment_id>/complete/', api.api_appointment_complete, name='api_appointment_complete'),
+    path('api/appointments/transition/', views.api_appointment_transition, name='api_appointment_transition'),
+    path('api/technician-schedule/<uuid:technician_id>/', api.api_technician_schedule, name='api_technician_schedule'),
+    path('api/mark-notification-read/<uuid:notification_id>/', api.api_mark_notification_read, name='api_mark_notification_read'),
     path('api/notification/<uuid:notification_id>/dismiss/', views.api_notification_dismiss, name='api_notification_dismiss'),
+    path('api/notifications/', views.api_notifications, name='api_notifications'),
+    path('api/messages/', views.api_messages, name='api_messages'),
+    path('api/appointments/', views.api_appointments, name='api_appointments'),
+    path('api/vehicles/<uuid:vehicle_id>/service-history/', views.api_service_history, name='api_service_history'),
+    path('api/events/', api.events_stream, name='events'),
 ] 
\ No newline at end of file
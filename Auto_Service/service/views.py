@@ -5,24 +5,26 @@ from django.contrib import messages
 from django.utils import timezone
 from .models import (
     Facility, ServiceType, Employee, Customer, Appointment, Vehicle,
-    Review, BaseUser, TechnicianAvailability, RepairShop, Notification
+    Review, BaseUser, TechnicianAvailability, RepairShop, Notification, Analytics
 )
 from .forms import UserRegistrationForm, LoginForm, AppointmentForm, VehicleForm
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_POST
 import json
-from django.db import models
+from datetime import date
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from . import assignment, capacity, events, exports, slots, transitions
+from .audit import log_event
+from .notifications import mark_read
+from .pagination import InvalidCursor, page_size, paginate
 
 def get_base_context(request):
     """Get base context data for all views"""
-    context = {}
-    try:
-        context['repair_shop'] = RepairShop.objects.first()
-    except RepairShop.DoesNotExist:
-        context['repair_shop'] = None
-        
+    context = {'repair_shop': RepairShop.cached()}
+
     if request.user.is_authenticated:
-        context['unread_notifications_count'] = request.user.baseuser.notifications.filter(is_read=False).count()
+        context['unread_notifications_count'] = request.user.baseuser.unread_notifications
     return context
 
 def landing_page(request):
@@ -39,16 +41,10 @@ def landing_page(request):
         rating__gte=4  # Only show reviews with 4 or 5 stars
     ).order_by('-created_at')[:3]  # Get latest 3 high-rated reviews
     
-    try:
-        repair_shop = RepairShop.objects.first()
-    except RepairShop.DoesNotExist:
-        repair_shop = None
-    
     context = {
         'facilities': facilities,
         'featured_services': featured_services,
         'featured_reviews': featured_reviews,
-        'repair_shop': repair_shop,
     }
     context.update(get_base_context(request))
     return render(request, 'service/landing_page.html', context)
@@ -91,6 +87,7 @@ def signup_view(request):
                 address=form.cleaned_data.get('address', '')
             )
             Customer.objects.create(base_user=base_user)
+            log_event('USER_REGISTERED', f'{user.username} signed up', user=base_user)
             login(request, user)
             return redirect('service:dashboard')
     else:
@@ -110,16 +107,7 @@ def dashboard(request):
 
     if base_user.user_type == 'CUSTOMER':
         customer = get_object_or_404(Customer, base_user=base_user)
-        vehicles = customer.vehicles.all()
-        # Back-fill last_service_date for any vehicle that still has null (legacy data)
-        for v in vehicles:
-            if v.last_service_date is None:
-                last_completed = v.appointments.filter(status='COMPLETED').aggregate(
-                    last_date=models.Max('scheduled_date')
-                )['last_date']
-                if last_completed:
-                    v.last_service_date = last_completed
-                    v.save(update_fields=['last_service_date'])
+        vehicles = list(customer.vehicles.all())
         appointments = Appointment.objects.filter(vehicle__owner=customer)
         # Include both scheduled appointments in the future as well as services that have already started but
         # are not yet completed so the customer always sees every upcoming service slot.
@@ -127,15 +115,17 @@ def dashboard(request):
             status__in=['SCHEDULED', 'IN_PROGRESS'],
             scheduled_date__gte=today
         ).distinct().count()
-        vehicles_count = vehicles.count()
+        vehicles_count = len(vehicles)
         total_services_count = appointments.count()
         # Fetch **all** upcoming appointments (future scheduled + currently in-progress) across every vehicle
         # owned by the customer.
         upcoming_appointments = appointments.filter(
             status__in=['SCHEDULED', 'IN_PROGRESS'],
             scheduled_date__gte=today
-        ).order_by('scheduled_date', 'scheduled_time').distinct()
-        recent_reviews = Review.objects.filter(appointment__customer=customer).order_by('-created_at')[:5]
+        ).select_related('service_type', 'vehicle').order_by('scheduled_date', 'scheduled_time').distinct()
+        recent_reviews = Review.objects.filter(appointment__customer=customer).select_related(
+            'appointment__service_type'
+        ).order_by('-created_at')[:5]
 
         context.update({
             'vehicles': vehicles,
@@ -148,7 +138,7 @@ def dashboard(request):
         })
 
     elif base_user.user_type == 'TECHNICIAN':
-        employee = get_object_or_404(Employee, base_user=base_user)
+        employee = get_object_or_404(Employee.objects.select_related('stats'), base_user=base_user)
         appointments = Appointment.objects.filter(assigned_technician=employee)
         today_appointments = appointments.filter(scheduled_date=today).exclude(status='CANCELLED')
         upcoming_appointments = appointments.filter(status='SCHEDULED', scheduled_date__gt=today)
@@ -157,6 +147,8 @@ def dashboard(request):
             'today_appointments': today_appointments,
             'today_appointments_count': today_appointments.count(),
             'upcoming_appointments': upcoming_appointments,
+            'completion_rate': employee.completion_rate,
+            'average_rating': round(employee.average_rating, 1),
         })
 
     elif base_user.user_type == 'SECRETARY':
@@ -175,7 +167,7 @@ def dashboard(request):
 
 def facility_list(request):
     """Display list of all facilities"""
-    facilities = Facility.objects.filter(is_active=True)
+    facilities = Facility.objects.filter(is_active=True).prefetch_related('equipment')
     context = {
         'facilities': facilities,
     }
@@ -184,13 +176,15 @@ def facility_list(request):
 
 def facility_detail(request, facility_id):
     """Display detailed information about a specific facility"""
-    facility = get_object_or_404(Facility, id=facility_id)
+    facility = get_object_or_404(
+        Facility.objects.select_related('schedule').prefetch_related('service_types', 'equipment'), id=facility_id
+    )
     services = ServiceType.objects.filter(facility=facility)
     technicians = Employee.objects.filter(
         facility=facility,
         base_user__user_type='TECHNICIAN',
         is_active=True
-    )
+    ).select_related('base_user__user', 'stats')
     
     context = {
         'facility': facility,
@@ -214,9 +208,25 @@ def create_appointment(request):
             appointment = form.save(commit=False)
             customer = get_object_or_404(Customer, base_user=request.user.baseuser)
             appointment.customer = customer
-            appointment.save()
-            messages.success(request, 'Appointment scheduled successfully!')
-            return redirect('service:dashboard')
+            service_type = appointment.service_type
+            with transaction.atomic():
+                # One conditional increment enforces max_daily_appointments and holds the facility-day's counter
+                # row until commit, so the bay check below runs against data no other booking can change
+                booked = (capacity.claim(service_type.facility_id, appointment.scheduled_date) and
+                          slots.is_free(service_type, appointment.scheduled_date, appointment.scheduled_time))
+                if booked:
+                    assignment.assign(appointment)
+                    appointment._day_load_claimed = True
+                    appointment.save()
+                else:
+                    transaction.set_rollback(True)  # hand the claimed unit back
+            if booked:
+                log_event('APPOINTMENT_SCHEDULED',
+                          f'{service_type.name} on {appointment.scheduled_date} at {appointment.scheduled_time:%H:%M}',
+                          user=request.user.baseuser, facility=service_type.facility_id, appointment=appointment)
+                messages.success(request, 'Appointment scheduled successfully!')
+                return redirect('service:dashboard')
+            form.add_error('scheduled_time', 'This time is not available. Please pick one of the free slots.')
     else:
         form = AppointmentForm()
 
@@ -226,7 +236,9 @@ def create_appointment(request):
 
         if facility_id:
             # Limit the service dropdown to this facility's services only
-            form.fields['service_type'].queryset = ServiceType.objects.filter(facility_id=facility_id)
+            form.fields['service_type'].queryset = ServiceType.objects.filter(
+                facility_id=facility_id
+            ).select_related('facility')
 
         if service_id and ServiceType.objects.filter(id=service_id).exists():
             form.initial['service_type'] = service_id
@@ -248,6 +260,8 @@ def vehicle_register(request):
             customer = get_object_or_404(Customer, base_user=request.user.baseuser)
             vehicle.owner = customer
             vehicle.save()
+            log_event('VEHICLE_REGISTERED', f'{vehicle.make} {vehicle.model} ({vehicle.license_plate})',
+                      user=request.user.baseuser, vehicle_id=str(vehicle.pk))
             return redirect('service:dashboard')
     else:
         form = VehicleForm()
@@ -255,12 +269,91 @@ def vehicle_register(request):
     context.update(get_base_context(request))
     return render(request, 'service/vehicle_register.html', context)
 
+# ---------------------- Paginated lists ----------------------
+# Keyset orderings (service/pagination.py); each ends in the primary key so the position is unique
+NOTIFICATION_ORDER = ('-created_at', '-id')
+MESSAGE_ORDER = ('-created_at', '-id')
+UPCOMING_ORDER = ('scheduled_date', 'scheduled_time', 'id')
+PAST_ORDER = ('-scheduled_date', '-scheduled_time', '-id')
+
+def _page(request, queryset, ordering, param='cursor'):
+    """Keyset page for an HTML list; a stale or tampered cursor falls back to the first page"""
+    try:
+        return paginate(queryset, ordering, request.GET.get(param))
+    except InvalidCursor:
+        return paginate(queryset, ordering)
+
+def _json_page(request, queryset, ordering, serialize):
+    """``{'results': [...], 'next_cursor': ...}`` for ?cursor= and ?limit=; 400 for a bad cursor"""
+    try:
+        page = paginate(queryset, ordering, request.GET.get('cursor'), page_size(request.GET.get('limit')))
+    except InvalidCursor as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    return JsonResponse({'results': [serialize(item) for item in page], 'next_cursor': page.next_cursor})
+
+def _appointment_lists(base_user):
+    """``(upcoming, past)`` appointment querysets of a technician or customer"""
+    today = timezone.localdate()
+    if base_user.user_type == 'TECHNICIAN':
+        employee = get_object_or_404(Employee, base_user=base_user)
+        mine = Appointment.objects.filter(assigned_technician=employee).select_related('service_type', 'vehicle')
+        upcoming = mine.filter(status__in=['SCHEDULED', 'IN_PROGRESS'], scheduled_date__gte=today)
+        past = mine.filter(status='COMPLETED')
+    else:
+        customer = get_object_or_404(Customer, base_user=base_user)
+        mine = Appointment.objects.filter(vehicle__owner=customer).select_related('service_type', 'vehicle')
+        # Same logic as for the dashboard – show both scheduled and in-progress future services.
+        upcoming = mine.filter(status__in=['SCHEDULED', 'IN_PROGRESS'], scheduled_date__gte=today)
+        # Any appointment that is not a future scheduled / in-progress service is considered past (completed, cancelled, or overdue).
+        past = mine.exclude(status__in=['SCHEDULED', 'IN_PROGRESS'], scheduled_date__gte=today)
+    return upcoming, past
+
+def _appointment_json(appt):
+    return {
+        'id': str(appt.id),
+        'service_type': appt.service_type.name,
+        'vehicle': str(appt.vehicle),
+        'scheduled_date': appt.scheduled_date.isoformat(),
+        'scheduled_time': appt.scheduled_time.strftime('%H:%M'),
+        'status': appt.status,
+    }
+
+def _notification_json(notification):
+    return {
+        'id': str(notification.id),
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'related_appointment_id': notification.related_appointment_id and str(notification.related_appointment_id),
+    }
+
+def _message_json(message):
+    return {
+        'id': str(message.id),
+        'sender': message.sender.user.get_full_name() or message.sender.user.username,
+        'subject': message.subject,
+        'content': message.content,
+        'priority': message.priority,
+        'is_read': message.is_read,
+        'created_at': message.created_at.isoformat(),
+    }
+
+def _service_history_json(appt):
+    return dict(_appointment_json(appt), facility=appt.service_type.facility.name)
+
+def _service_history(request, vehicle_id):
+    customer = get_object_or_404(Customer, base_user=request.user.baseuser)
+    vehicle = get_object_or_404(Vehicle, id=vehicle_id, owner=customer)
+    vehicle.owner = customer  # the template compares against the owner; no second customer lookup
+    return vehicle, Appointment.objects.filter(vehicle=vehicle).select_related('service_type__facility', 'vehicle')
+
 @login_required
 def notifications(request):
-    """Display user notifications"""
-    user_notifications = request.user.baseuser.notifications.all()
+    """Display user notifications, newest first, one keyset page at a time"""
     context = {
-        'notifications': user_notifications,
+        'notifications': _page(request, request.user.baseuser.notifications.all(), NOTIFICATION_ORDER),
     }
     context.update(get_base_context(request))
     return render(request, 'service/notifications.html', context)
@@ -270,60 +363,25 @@ def appointments(request):
     """Display appointments list for the current user.
     For technicians: shows their non-cancelled appointments ordered by date.
     For customers: separates upcoming vs past services.
+    Both lists are paginated independently (?upcoming= / ?past= cursors).
     """
     base_user = request.user.baseuser
-
-    if base_user.user_type == 'TECHNICIAN':
-        employee = get_object_or_404(Employee, base_user=base_user)
-        today = timezone.localdate()
-        upcoming = Appointment.objects.filter(
-            assigned_technician=employee,
-            status__in=['SCHEDULED', 'IN_PROGRESS'],
-            scheduled_date__gte=today
-        ).order_by('scheduled_date', 'scheduled_time')
-
-        past = Appointment.objects.filter(
-            assigned_technician=employee,
-            status='COMPLETED'
-        ).order_by('-scheduled_date', '-scheduled_time')
-
-        context = {
-            'upcoming_appointments': upcoming,
-            'past_appointments': past,
-            'is_technician': True,
-        }
-
-    else:
-        customer = get_object_or_404(Customer, base_user=base_user)
-        today = timezone.localdate()
-        all_qs = Appointment.objects.filter(vehicle__owner=customer).select_related('service_type', 'vehicle')
-
-        # Same logic as for the dashboard – show both scheduled and in-progress future services.
-        upcoming = all_qs.filter(
-            status__in=['SCHEDULED', 'IN_PROGRESS'],
-            scheduled_date__gte=today
-        ).order_by('scheduled_date', 'scheduled_time').distinct()
-        # Any appointment that is not a future scheduled / in-progress service is considered past (completed, cancelled, or overdue).
-        past = all_qs.exclude(
-            status__in=['SCHEDULED', 'IN_PROGRESS'],
-            scheduled_date__gte=today
-        ).order_by('-scheduled_date', '-scheduled_time').distinct()
-
-        context = {
-            'upcoming_appointments': upcoming,
-            'past_appointments': past,
-            'is_technician': False,
-        }
-
+    upcoming, past = _appointment_lists(base_user)
+    context = {
+        'upcoming_appointments': _page(request, upcoming, UPCOMING_ORDER, 'upcoming'),
+        'past_appointments': _page(request, past, PAST_ORDER, 'past'),
+        'is_technician': base_user.user_type == 'TECHNICIAN',
+    }
     context.update(get_base_context(request))
     return render(request, 'service/appointments.html', context)
 
 @login_required
 def messages_view(request):
     """Display user messages"""
-    messages_qs = request.user.baseuser.received_messages.all()
+    messages_qs = request.user.baseuser.received_messages.select_related('sender__user')
     context = {
-        'messages': messages_qs,
+        # not 'messages': that name belongs to the flash messages base.html renders
+        'received_messages': _page(request, messages_qs, MESSAGE_ORDER),
     }
     context.update(get_base_context(request))
     return render(request, 'service/messages.html', context)
@@ -331,12 +389,10 @@ def messages_view(request):
 @login_required
 def vehicle_detail(request, vehicle_id):
     """Display detailed information about a vehicle"""
-    customer = get_object_or_404(Customer, base_user=request.user.baseuser)
-    vehicle = get_object_or_404(Vehicle, id=vehicle_id, owner=customer)
-    service_history = Appointment.objects.filter(vehicle=vehicle).order_by('-scheduled_date')
+    vehicle, service_history = _service_history(request, vehicle_id)
     context = {
         'vehicle': vehicle,
-        'service_history': service_history,
+        'service_history': _page(request, service_history, PAST_ORDER),
     }
     context.update(get_base_context(request))
     return render(request, 'service/vehicle_detail.html', context)
@@ -345,7 +401,8 @@ def vehicle_detail(request, vehicle_id):
 def appointment_detail(request, appointment_id):
     """Display appointment details"""
     customer = get_object_or_404(Customer, base_user=request.user.baseuser)
-    appointment = get_object_or_404(Appointment, id=appointment_id, customer=customer)
+    appointment = get_object_or_404(Appointment.objects.select_related('service_type'), id=appointment_id,
+                                    customer=customer)
     context = {'appointment': appointment}
     context.update(get_base_context(request))
     return render(request, 'service/appointment_detail.html', context)
@@ -354,14 +411,21 @@ def appointment_detail(request, appointment_id):
 def appointment_cancel(request, appointment_id):
     """Cancel an appointment"""
     customer = get_object_or_404(Customer, base_user=request.user.baseuser)
-    appointment = get_object_or_404(Appointment, id=appointment_id, customer=customer)
-    
-    if appointment.status != 'SCHEDULED':
-        messages.error(request, 'Only scheduled appointments can be cancelled.')
-    else:
-        appointment.status = 'CANCELLED'
-        appointment.save()
+    with transaction.atomic():
+        # Locked so two cancel requests cannot both release the appointment's place in the day's load counter
+        appointment = get_object_or_404(Appointment.objects.select_for_update(of=('self',))
+                                        .select_related('service_type'), id=appointment_id, customer=customer)
+        cancelled = appointment.status == 'SCHEDULED'
+        if cancelled:
+            appointment.status = 'CANCELLED'
+            appointment.save()
+
+    if cancelled:
+        log_event('APPOINTMENT_CANCELLED', f'{appointment.service_type.name} on {appointment.scheduled_date}',
+                  user=request.user.baseuser, facility=appointment.service_type.facility_id, appointment=appointment)
         messages.success(request, 'Appointment cancelled successfully.')
+    else:
+        messages.error(request, 'Only scheduled appointments can be cancelled.')
     
     return redirect('service:dashboard')
 
@@ -385,6 +449,8 @@ def review_create(request, appointment_id):
                 technician_rating=technician_rating,
                 technician_comment=technician_comment
             )
+            log_event('REVIEW_SUBMITTED', f'{rating}-star review', user=customer.base_user_id,
+                      appointment=appointment, rating=rating)
             messages.success(request, 'Thank you for your review!')
             return redirect('service:appointment_detail', appointment_id=appointment_id)
         else:
@@ -430,6 +496,24 @@ def admin_facilities(request):
     context.update(get_base_context(request))
     return render(request, 'service/admin/facilities.html', context)
 
+@login_required
+def admin_export(request, kind):
+    """Stream an export as CSV or JSONL (?format=, ?from= / ?to= dates, ?facility=, ?status= repeated or comma-separated)"""
+    if request.user.baseuser.user_type not in ['ADMIN', 'OWNER', 'MANAGER']:
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    fmt = request.GET.get('format', 'csv')
+    statuses = [status for value in request.GET.getlist('status') for status in value.split(',')]
+    try:
+        rows = exports.export_queryset(kind, request.GET.get('from'), request.GET.get('to'),
+                                       request.GET.get('facility'), statuses)
+        lines = exports.export_lines(kind, rows, fmt)
+    except exports.ExportError as exc:
+        return JsonResponse({'error': str(exc)}, status=400)
+    response = StreamingHttpResponse(lines, content_type=f'{exports.FORMATS[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{timezone.localdate():%Y-%m-%d}.{fmt}"'
+    return response
+
 @login_required
 def api_facility_schedule(request, facility_id):
     """API endpoint for facility schedule"""
@@ -441,6 +525,33 @@ def api_facility_schedule(request, facility_id):
         'is_open_weekends': schedule.is_open_weekends,
     })
 
+@login_required
+def api_facility_slots(request, facility_id):
+    """Free start times for ?service_type=<id> over ?days= days from ?start= (ISO date, default today)"""
+    facility = get_object_or_404(Facility, id=facility_id)
+    try:
+        service_type = ServiceType.objects.select_related('facility').get(
+            id=request.GET.get('service_type'), facility=facility
+        )
+    except (ServiceType.DoesNotExist, ValidationError):
+        return JsonResponse({'error': 'service_type must be a service offered by this facility.'}, status=400)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else timezone.localdate()
+        days = int(request.GET.get('days', 7))
+    except ValueError:
+        return JsonResponse({'error': 'start must be YYYY-MM-DD and days a number.'}, status=400)
+    if not 1 <= days <= slots.MAX_DAYS:
+        return JsonResponse({'error': f'days must be between 1 and {slots.MAX_DAYS}.'}, status=400)
+
+    free = slots.free_slots(service_type, start, days)
+    return JsonResponse({
+        'facility_id': str(facility.id),
+        'service_type_id': str(service_type.id),
+        'duration_minutes': service_type.duration_minutes,
+        'step_minutes': slots.step_minutes(),
+        'days': [{'date': day.isoformat(), 'slots': times} for day, times in free.items()],
+    })
+
 @login_required
 def api_technician_schedule(request, technician_id):
     """API endpoint for technician schedule"""
@@ -460,9 +571,9 @@ def api_technician_schedule(request, technician_id):
 @login_required
 def api_mark_notification_read(request, notification_id):
     """API endpoint to mark a notification as read"""
-    notification = get_object_or_404(Notification, id=notification_id, user=request.user.baseuser)
-    notification.is_read = True
-    notification.save()
+    if not mark_read(request.user.baseuser, [notification_id]):
+        # already read, or not this user's notification
+        get_object_or_404(Notification.objects.only('id'), id=notification_id, user=request.user.baseuser)
     return JsonResponse({'status': 'success'})
 
 @login_required
@@ -475,8 +586,57 @@ def api_notification_dismiss(request, notification_id):
         'success': True
     })
 
+@login_required
+def api_notifications(request):
+    """The user's notifications, newest first (?cursor= from the previous page, ?limit=)"""
+    return _json_page(request, request.user.baseuser.notifications.all(), NOTIFICATION_ORDER, _notification_json)
+
+@login_required
+def api_messages(request):
+    """The user's received messages, newest first (?cursor=, ?limit=)"""
+    messages_qs = request.user.baseuser.received_messages.select_related('sender__user')
+    return _json_page(request, messages_qs, MESSAGE_ORDER, _message_json)
+
+@login_required
+def api_appointments(request):
+    """?list=upcoming (soonest first, default) or ?list=past (latest first) appointments (?cursor=, ?limit=)"""
+    upcoming, past = _appointment_lists(request.user.baseuser)
+    which = request.GET.get('list', 'upcoming')
+    if which not in ('upcoming', 'past'):
+        return JsonResponse({'error': 'list must be "upcoming" or "past".'}, status=400)
+    if which == 'upcoming':
+        return _json_page(request, upcoming, UPCOMING_ORDER, _appointment_json)
+    return _json_page(request, past, PAST_ORDER, _appointment_json)
+
+@login_required
+def api_service_history(request, vehicle_id):
+    """A vehicle's appointments, latest first (?cursor=, ?limit=)"""
+    _, service_history = _service_history(request, vehicle_id)
+    return _json_page(request, service_history, PAST_ORDER, _service_history_json)
+
+@login_required
+def events_stream(request):
+    """Server-sent events: the user's new notifications and appointment status changes"""
+    listener = events.Listener(request.user.baseuser, request.headers.get('Last-Event-ID'))
+    return events.event_stream_response(events.stream(listener))
+
 # ---------------------- Appointment state change APIs ----------------------
 
+def json_body(request):
+    try:
+        payload = json.loads(request.body.decode()) if request.body else {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        payload = {}
+    return payload if isinstance(payload, dict) else {}
+
+def transition_response(result):
+    """JSON response of a single-appointment transition, as the start / complete endpoints always answered"""
+    if result['result'] == transitions.APPLIED:
+        return JsonResponse({'success': True})
+    if result['result'] == transitions.NOT_FOUND:
+        raise Http404(result['error'])
+    return JsonResponse({'error': result['error']}, status=400)
+
 @login_required
 @require_POST
 def api_appointment_start(request, appointment_id):
@@ -484,51 +644,34 @@ def api_appointment_start(request, appointment_id):
     if request.user.baseuser.user_type != 'TECHNICIAN':
         return JsonResponse({'error': 'Forbidden'}, status=403)
 
-    appt = get_object_or_404(Appointment, id=appointment_id,
-                             assigned_technician__base_user=request.user.baseuser)
-
-    if appt.status != 'SCHEDULED':
-        return JsonResponse({'error': 'Only scheduled appointments can be started.'}, status=400)
-
-    appt.status = 'IN_PROGRESS'
-    appt.actual_start_time = timezone.now()
-    appt.save()
-    return JsonResponse({'success': True})
+    result, = transitions.transition(request.user.baseuser, [(appointment_id, 'IN_PROGRESS', '')])
+    return transition_response(result)
 
 @login_required
 @require_POST
 def api_appointment_complete(request, appointment_id):
-    """Technician completes an appointment (moves to COMPLETED)"""
+    """Technician completes an appointment (moves to COMPLETED); an optional comment is kept as its notes"""
     if request.user.baseuser.user_type != 'TECHNICIAN':
         return JsonResponse({'error': 'Forbidden'}, status=403)
 
-    appt = get_object_or_404(Appointment, id=appointment_id,
-                             assigned_technician__base_user=request.user.baseuser)
-
-    if appt.status != 'IN_PROGRESS':
-        return JsonResponse({'error': 'Only in-progress appointments can be completed.'}, status=400)
+    comment = str(json_body(request).get('comment') or '')
+    result, = transitions.transition(request.user.baseuser, [(appointment_id, 'COMPLETED', comment)])
+    return transition_response(result)
 
-    appt.status = 'COMPLETED'
-    appt.actual_end_time = timezone.now()
-
-    # Parse optional comment from request body
-    try:
-        payload = json.loads(request.body.decode()) if request.body else {}
-    except json.JSONDecodeError:
-        payload = {}
+@login_required
+@require_POST
+def api_appointment_transition(request):
+    """Technician starts / completes many appointments: {"transitions": [{"id", "status", "comment"}, ...]}"""
+    if request.user.baseuser.user_type != 'TECHNICIAN':
+        return JsonResponse({'error': 'Forbidden'}, status=403)
 
-    comment = payload.get('comment', '').strip()
-    if comment:
-        appt.notes = comment  # reuse notes field for technician comment
-    appt.save()
-
-    # Send notification to customer
-    Notification.objects.create(
-        user=appt.customer.base_user,
-        type='STATUS_UPDATE',
-        title='Service Completed',
-        message=f'Your appointment "{appt.service_type.name}" has been completed. {"Technician note: " + comment if comment else ""}',
-        related_appointment=appt
-    )
+    items = json_body(request).get('transitions')
+    if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+        return JsonResponse({'error': 'transitions must be a non-empty list of objects.'}, status=400)
+    if len(items) > transitions.MAX_BATCH:
+        return JsonResponse({'error': f'At most {transitions.MAX_BATCH} transitions per request.'}, status=400)
 
-    return JsonResponse({'success': True})
+    results = transitions.transition(request.user.baseuser, [
+        (item.get('id'), item.get('status'), str(item.get('comment') or '')) for item in items
+    ])
+    return JsonResponse({'results': results})